@@ -1,7 +1,13 @@
+import os
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+
+from desastres import dispersion, exportar, graficos, ingesta, motores, perfilado, precalentamiento, recarga, tablas
+from desastres.cache_resultados import cache_compartida, normalizar_filtro
+from desastres.datos import MEDIDAS, TODOS_DESASTRES, TODOS_PAISES, TODOS_SUBGRUPOS
+from desastres.secciones import (
+    medir, medir_ejecucion, memo, mostrar_perfil, mostrar_tiempos, perfilado_solicitado,
+)
 
 # ----------------------------------------------------------------
 # 1) CONFIGURACIÓN DE LA PÁGINA
@@ -15,110 +21,96 @@ st.markdown("**Descripción:** Este dashboard ofrece una visión global y dinám
 # ----------------------------------------------------------------
 # 2) CARGA Y LIMPIEZA DE DATOS
 # ----------------------------------------------------------------
-@st.cache_data
-def cargar_datos():
-    """Carga y limpia los datos del archivo Excel."""
-    try:
-        file_path = "data/emdat-country-profiles_2025_01_27.xlsx"
-        df = pd.read_excel(file_path, sheet_name='EM-DAT Version 2025-01-27')
-
-        # Limpiar nombres de columnas
-        df.columns = df.columns.str.strip()
-
-        # Seleccionar columnas necesarias
-        columnas_necesarias = [
-            'Year', 'Country', 'ISO', 'Disaster Group', 'Disaster Subgroup',
-            'Disaster Type', 'Disaster Subtype', 'Total Events', 'Total Affected',
-            'Total Deaths', 'Total Damage (USD, original)', 'Total Damage (USD, adjusted)',
-            'CPI'
-        ]
-        df = df[[col for col in columnas_necesarias if col in df.columns]]
-
-        # Eliminar filas con NaN en columnas clave
-        df = df.dropna(subset=['Year', 'Disaster Type', 'ISO', 'Country', 'Total Events'])
-
-        # Convertir tipos de datos
-        df['Year'] = df['Year'].astype(int)
-        df['Total Events'] = df['Total Events'].astype(int)
-        df['Total Affected'] = pd.to_numeric(df['Total Affected'], errors='coerce')
-        df['Total Deaths'] = pd.to_numeric(df['Total Deaths'], errors='coerce')
-        df['Total Damage (USD, original)'] = pd.to_numeric(df['Total Damage (USD, original)'], errors='coerce')
-        df['Total Damage (USD, adjusted)'] = pd.to_numeric(df['Total Damage (USD, adjusted)'], errors='coerce')
-        df['CPI'] = pd.to_numeric(df['CPI'], errors='coerce')
-
-        return df
-
-    except Exception as e:
-        st.error(f"Error al cargar los datos: {str(e)}")
-        return None
-
-# Cargar datos
-df = cargar_datos()
-if df is None:
-    st.stop()
+def motor_vigente(publicacion=None):
+    """Motor de una publicación del almacén o, sin publicación, el del Excel vigente.
+
+    Se carga una vez por proceso y sin Streamlit (ver ``motores.motor_compartido``),
+    así que también lo puede cargar el hilo de precalentamiento.
+    """
+    if publicacion is None and recarga.ACTIVADA:
+        return recarga.compartida(motores.crear_motor).motor
+    return motores.motor_compartido(publicacion)
+
+# Versión de EM-DAT: las publicaciones del almacén (python -m desastres.ingesta) o, sin almacén, el Excel
+lista_publicaciones = ingesta.publicaciones()
+publicacion = None
+if lista_publicaciones:
+    col_publicacion, _ = st.columns((1, 4))
+    publicacion = col_publicacion.selectbox("Versión de EM-DAT:", lista_publicaciones,
+                                            help="Publicaciones de EM-DAT del almacén (la más reciente primero)")
+
+@st.cache_resource
+def precalentar():
+    """Hilo de precalentamiento, uno por proceso: carga los datos y calcula los filtros más pedidos."""
+    # La carga empieza en el hilo; la ejecución del script espera la misma carga en motor_vigente
+    publicacion_defecto = lista_publicaciones[0] if lista_publicaciones else None
+    return precalentamiento.iniciar(lambda: motor_vigente(publicacion_defecto))
+
+estado_precalentamiento = precalentar() if precalentamiento.ACTIVADO else None
+
+# Cargar datos (con ?perfilado=1 cada paso es una etapa del perfil de carga)
+with perfilado.perfilar("carga", activar=perfilado_solicitado()) as perfil_carga:
+    with perfilado.etapa("motor", motor=motores.MOTOR, publicacion=publicacion) as registro:
+        try:
+            motor = motor_vigente(publicacion)
+        except Exception as e:
+            st.error(f"Error al cargar los datos: {str(e)}")
+            st.stop()
+        registro['filas_salida'] = motor.filas_totales
+    version = motor.version
+# El perfil de carga se muestra solo en esta ejecución completa, no en las del fragmento
+st.session_state["_perfil_carga_pendiente"] = True
+
+# Aviso cuando la recarga cambió la versión de los datos desde la última ejecución de la sesión
+version_sesion = st.session_state.get("_version_datos")
+if version_sesion is not None and version_sesion[0] == publicacion and version_sesion[1] != version:
+    st.toast(f"Datos actualizados a la versión {version}.")
+st.session_state["_version_datos"] = (publicacion, version)
 
 # ----------------------------------------------------------------
 # 3) FILTROS
 # ----------------------------------------------------------------
-with st.spinner("Actualizando reporte..."):
+def seccion_filtros():
+    """Muestra los filtros y devuelve (países, año inicio, año fin, tipos de desastre, subgrupos).
+
+    País, tipo y subgrupo son de selección múltiple; sin selección significa "Todos".
+    """
+    # Las opciones solo dependen de la versión de los datos
+    hosp_df, lista_anios, lista_tipos, lista_subgrupos = memo(
+        "opciones", (version,), motor.opciones
+    )
+
+    # Rango por defecto 2000-2024, o los extremos si la publicación no los incluye
+    inicio_defecto = lista_anios.index(2000) if 2000 in lista_anios else 0
+    fin_defecto = lista_anios.index(2024) if 2024 in lista_anios else len(lista_anios) - 1
+
     # Crear columnas para los filtros
-    col1, col2, col3, col4 = st.columns(4)
+    col1, col2, col3, col4, col5 = st.columns((3, 1, 1, 2, 2))
 
     with col1:
-        hosp_df = sorted(df['Country'].unique())
-        hosp = st.selectbox("País:", ["Todos los países"] + hosp_df, help="Filtrar por país específico")
+        hosp = st.multiselect("País:", hosp_df, placeholder=TODOS_PAISES,
+                              help="Filtrar por uno o varios países (por ejemplo, una región)")
 
     with col2:
-        lista_anios = sorted(df['Year'].unique())
-        anio_inicio = st.selectbox("Fecha inicio:", lista_anios, index=lista_anios.index(2000), help="Selecciona el año inicial")
+        anio_inicio = st.selectbox("Fecha inicio:", lista_anios, index=inicio_defecto, help="Selecciona el año inicial")
 
     with col3:
-        anio_fin = st.selectbox("Fecha final:", lista_anios, index=lista_anios.index(2024), help="Selecciona el año final")
+        anio_fin = st.selectbox("Fecha final:", lista_anios, index=fin_defecto, help="Selecciona el año final")
 
     with col4:
-        lista_tipos = ['Todos los desastres'] + sorted(df['Disaster Type'].unique())
-        tipo_desastre = st.selectbox("Tipo de desastre (opcional):", lista_tipos, index=0, help="Selecciona el tipo de desastre")
-
-    # Función para filtrar datos
-    def filtrar_df(df, pais, anio_inicio, anio_fin, tipo_desastre):
-        df_filtrado = df.copy()
-        if pais != "Todos los países":
-            df_filtrado = df_filtrado[df_filtrado['Country'] == pais]
-        df_filtrado = df_filtrado[(df_filtrado['Year'] >= anio_inicio) & (df_filtrado['Year'] <= anio_fin)]
-        if tipo_desastre != "Todos los desastres":
-            df_filtrado = df_filtrado[df_filtrado['Disaster Type'] == tipo_desastre]
-        return df_filtrado
-
-    # Filtrar datos según los filtros seleccionados
-    df_filtrado = filtrar_df(df, hosp, anio_inicio, anio_fin, tipo_desastre)
-#------------------------------------------------------------------------------------------------------------
-    # Métricas
-    # 1) Calcular métricas del rango seleccionado
-total_eventos = df_filtrado['Total Events'].sum()
-total_afectados = df_filtrado['Total Affected'].sum()
-total_muertes = df_filtrado['Total Deaths'].sum()
-total_danos = df_filtrado['Total Damage (USD, original)'].sum() / 1e6
-
-# 2) Calcular métricas del rango anterior (por ejemplo, hasta el año anterior)
-if anio_fin > anio_inicio:
-    df_filtrado_prev = filtrar_df(df, hosp, anio_inicio, anio_fin - 1, tipo_desastre)
-    prev_eventos = df_filtrado_prev['Total Events'].sum()
-    prev_afectados = df_filtrado_prev['Total Affected'].sum()
-    prev_muertes = df_filtrado_prev['Total Deaths'].sum()
-    prev_danos = df_filtrado_prev['Total Damage (USD, original)'].sum() / 1e6
-else:
-    # Si no hay período anterior, asumimos 0 para evitar errores
-    prev_eventos = 0
-    prev_afectados = 0
-    prev_muertes = 0
-    prev_danos = 0
-
-# 3) Calcular deltas
-delta_eventos = total_eventos - prev_eventos
-delta_afectados = total_afectados - prev_afectados
-delta_muertes = total_muertes - prev_muertes
-delta_danos = total_danos - prev_danos
+        subgrupos = st.multiselect("Subgrupo (opcional):", lista_subgrupos, placeholder=TODOS_SUBGRUPOS,
+                                   help="Selecciona uno o varios subgrupos de desastre")
 
+    with col5:
+        tipo_desastre = st.multiselect("Tipo de desastre (opcional):", lista_tipos, placeholder=TODOS_DESASTRES,
+                                       help="Selecciona uno o varios tipos de desastre")
+
+    return hosp, anio_inicio, anio_fin, tipo_desastre, subgrupos
+
+
+# ----------------------------------------------------------------
+# 4) MÉTRICAS
+# ----------------------------------------------------------------
 # Función para forzar el cero a verde (colocando un valor negativo muy pequeño)
 def force_green_if_zero(delta_value):
     if delta_value == 0:
@@ -127,329 +119,309 @@ def force_green_if_zero(delta_value):
     else:
         return delta_value
 
-# 4) Mostrar métricas con flechas
-m1, m2, m3, m4 = st.columns((1, 1, 1, 1))
 
-m1.metric(
-    label="Total de Eventos",
-    value=f"{total_eventos:,}",
-    delta=f"{force_green_if_zero(delta_eventos):+,.0f}",
-    delta_color="inverse"  # Rojo si sube, verde si baja o ~0
-)
+def seccion_metricas(filtro):
+    with medir("metricas"):
+        # 1) Calcular métricas del rango seleccionado (y del rango anterior, hasta el año anterior)
+        totales, totales_prev = motor.metricas(filtro)
+        total_eventos = totales['Total Events']
+        total_afectados = totales['Total Affected']
+        total_muertes = totales['Total Deaths']
+        total_danos = totales['Total Damage (USD, original)'] / 1e6
+
+        # 2) Métricas del rango anterior (0 si no hay período anterior)
+        prev_eventos = totales_prev['Total Events']
+        prev_afectados = totales_prev['Total Affected']
+        prev_muertes = totales_prev['Total Deaths']
+        prev_danos = totales_prev['Total Damage (USD, original)'] / 1e6
+
+        # 3) Calcular deltas
+        delta_eventos = total_eventos - prev_eventos
+        delta_afectados = total_afectados - prev_afectados
+        delta_muertes = total_muertes - prev_muertes
+        delta_danos = total_danos - prev_danos
+
+    # 4) Mostrar métricas con flechas
+    m1, m2, m3, m4 = st.columns((1, 1, 1, 1))
+
+    m1.metric(
+        label="Total de Eventos",
+        value=f"{total_eventos:,}",
+        delta=f"{force_green_if_zero(delta_eventos):+,.0f}",
+        delta_color="inverse"  # Rojo si sube, verde si baja o ~0
+    )
 
-m2.metric(
-    label="Personas Afectadas",
-    value=f"{int(total_afectados):,}",
-    delta=f"{force_green_if_zero(delta_afectados):+,.0f}",
-    delta_color="inverse"
-)
+    m2.metric(
+        label="Personas Afectadas",
+        value=f"{int(total_afectados):,}",
+        delta=f"{force_green_if_zero(delta_afectados):+,.0f}",
+        delta_color="inverse"
+    )
 
-m3.metric(
-    label="Muertes Totales",
-    value=f"{int(total_muertes):,}",
-    delta=f"{force_green_if_zero(delta_muertes):+,.0f}",
-    delta_color="inverse"
-)
+    m3.metric(
+        label="Muertes Totales",
+        value=f"{int(total_muertes):,}",
+        delta=f"{force_green_if_zero(delta_muertes):+,.0f}",
+        delta_color="inverse"
+    )
 
-m4.metric(
-    label="Daños Totales (Millones USD)",
-    value=f"{total_danos:.2f}",
-    delta=f"{force_green_if_zero(delta_danos):+.2f}",
-    delta_color="inverse"
-)
-# 5) descripcion de metricas
-st.caption(
-    "Estas métricas ofrecen una visión rápida del impacto de los desastres en términos de frecuencia (eventos), "
-    "magnitud humana (personas afectadas y muertes) y costos económicos (daños). Al compararlas con el período anterior, "
-    "se pueden identificar tendencias de incremento o disminución"
-)
+    m4.metric(
+        label="Daños Totales (Millones USD)",
+        value=f"{total_danos:.2f}",
+        delta=f"{force_green_if_zero(delta_danos):+.2f}",
+        delta_color="inverse"
+    )
+    # 5) descripcion de metricas
+    st.caption(
+        "Estas métricas ofrecen una visión rápida del impacto de los desastres en términos de frecuencia (eventos), "
+        "magnitud humana (personas afectadas y muertes) y costos económicos (daños). Al compararlas con el período anterior, "
+        "se pueden identificar tendencias de incremento o disminución"
+    )
 
 
 # ----------------------------------------------------------------
-# 4) GRÁFICOS
+# 5) GRÁFICOS
 # ----------------------------------------------------------------
-g1, g2, g3 = st.columns((1, 1, 1)) # Columnas agrupadas para los gráficos 1, 2 y 3
-col1, col2 = st.columns([3, 2])    # Columnas agrupadas para los graficos 4 y 5
-
-# Gráfico 1: Distribución de Tipos de Desastres
-df_group_tipo = df_filtrado.groupby('Disaster Type', as_index=False)['Total Events'].sum().sort_values('Total Events', ascending=False)
-fig1 = px.bar(
-    df_group_tipo,
-    x='Disaster Type',
-    y='Total Events',
-    title="Distribución de Tipos de Desastres",
-    template='seaborn'
-)
-fig1.update_traces(marker_color='#264653')
-fig1.update_layout(margin=dict(l=0, r=10, b=10, t=30), yaxis_title=None, xaxis_title=None)
-with g1:
-    st.plotly_chart(fig1.update_layout(xaxis={'fixedrange': True}, yaxis={'fixedrange': True}), use_container_width=True, config={'displayModeBar': False})
-    st.caption("Análisis: Esta gráfica permite identificar cuáles son los tipos de desastres más frecuentes, facilitando el enfoque en estrategias de prevención y asignación de recursos.")
-
-
-# Gráfico 2: Daños Económicos por Tipo de Desastre
-df_group_danos = df_filtrado.groupby('Disaster Type', as_index=False)['Total Damage (USD, original)'].sum().sort_values('Total Damage (USD, original)', ascending=False)
-fig2 = px.pie(
-    df_group_danos,
-    names='Disaster Type',
-    values='Total Damage (USD, original)',
-    hole=0.9,
-    title="Daños Económicos por Tipo de Desastre",
-    template='seaborn'
-)
-# Actualizar trazas para formatear los valores como dólares
-fig2.update_traces(
-    texttemplate='$%{value:,.0f}',
-    hovertemplate='%{label}: $%{value:,.0f}<extra></extra>'
-)
-fig2.update_layout(margin=dict(l=0, r=10, b=10, t=30))
-with g2:
-    st.plotly_chart(fig2, use_container_width=True)
-    st.caption("Análisis: Esta gráfica circular muestra la distribución de los daños económicos entre los distintos tipos de desastres, permitiendo identificar cuáles generan mayor impacto económico.")
-
-
-# Gráfico 3: Evolución de Eventos por Año
-df_group_tiempo = df_filtrado.groupby('Year', as_index=False)['Total Events'].sum()
-fig3 = px.line(
-    df_group_tiempo,
-    x='Year',
-    y='Total Events',
-    title="Evolución de Eventos por Año",
-    template='seaborn'
-)
-fig3.update_traces(line_color='#7A9E9F')
-fig3.update_layout(margin=dict(l=0, r=10, b=10, t=30), yaxis_title=None, xaxis_title=None)
-with g3:
-    st.plotly_chart(fig3.update_layout(xaxis={'fixedrange': True}, yaxis={'fixedrange': True}), use_container_width=True, config={'displayModeBar': False})
-    st.caption("Análisis: Esta gráfica muestra la evolución en el tiempo de la cantidad total de eventos, permitiendo identificar tendencias y detectar años con mayor actividad de desastres para un análisis histórico y predictivo.")
-
-
-# Gráfico 4: Total de Afectados por Año y Subgrupo de Desastre
-# (1) Agrupar datos totales por año para las barras
-df_year_total = df_filtrado.groupby('Year', as_index=False)['Total Affected'].sum()
-
-# (2) Verificar existencia de la columna "Disaster Subgroup" o usar "Disaster Subtype"
-if 'Disaster Subgroup' in df_filtrado.columns:
-    grouping_column = 'Disaster Subgroup'
-elif 'Disaster Type' in df_filtrado.columns:
-    grouping_column = 'Disaster Type'
-else:
-    st.error("No se encontró una columna válida para el subgrupo de desastres.")
-    st.stop()
-
-# (3) Agrupar datos por año y por la columna seleccionada para las líneas
-df_subgroup = df_filtrado.groupby(['Year', grouping_column], as_index=False)['Total Affected'].sum()
-
-# (4) Crear figura combinada
-fig_combined = go.Figure()
-
-# (5) Agregar el rastro de barras para el total
-fig_combined.add_trace(
-    go.Bar(
-        x=df_year_total['Year'],
-        y=df_year_total['Total Affected'],
-        name='Total Afectados',
-        marker_color='lightgray',
-        opacity=0.6  # Para que las líneas se vean mejor
-    )
-)
+def mostrar_figura(nombre, fig, **kwargs):
+    """``st.plotly_chart`` como etapa del perfilado (incluye la serialización de Streamlit)."""
+    with perfilado.etapa(f"plotly_chart:{nombre}") as registro:
+        st.plotly_chart(fig, use_container_width=True, **kwargs)
+    if perfilado.activo():
+        registro['bytes'] = len(fig.to_json())
+
+
+def figura(nombre, deps, construir, adelgazada=False):
+    """Figura memorizada en la sesión y, entre sesiones, en la caché de figuras adelgazadas."""
+    return memo(f"grafico_{nombre}", deps,
+                lambda: graficos.figura_cacheada(nombre, deps, construir, adelgazada=adelgazada))
+
+
+def seccion_graficos(deps, datos, anio_inicio, anio_fin):
+    """Gráficos 1 a 7; ``deps`` identifica el filtro y ``datos`` da las filas y agregados."""
+    fig1 = figura("tipos", deps, lambda: graficos.grafico_tipos(datos.agregados()))
+    fig2 = figura("danos", deps, lambda: graficos.grafico_danos(datos.agregados()))
+    fig3 = figura("evolucion", deps, lambda: graficos.grafico_evolucion(datos.agregados()))
+    fig_combined = figura("afectados", deps, lambda: graficos.grafico_afectados(datos.agregados()))
+    fig_sunburst = figura("muertes", deps, lambda: graficos.grafico_muertes(datos.agregados()))
+    fig_scatter, info_scatter = figura("dispersion", deps, lambda: graficos.grafico_dispersion(datos.filas()),
+                                       adelgazada=True)
+    # El título del mapa muestra los años tal como se eligieron
+    fig_mapa = figura("mapa", deps + (anio_inicio, anio_fin),
+                      lambda: graficos.grafico_mapa(datos.agregados(), anio_inicio, anio_fin))
+
+    g1, g2, g3 = st.columns((1, 1, 1)) # Columnas agrupadas para los gráficos 1, 2 y 3
+    col1, col2 = st.columns([3, 2])    # Columnas agrupadas para los graficos 4 y 5
+
+    with g1:
+        mostrar_figura("tipos", fig1, config={'displayModeBar': False})
+        st.caption("Análisis: Esta gráfica permite identificar cuáles son los tipos de desastres más frecuentes, facilitando el enfoque en estrategias de prevención y asignación de recursos.")
+
+    with g2:
+        mostrar_figura("danos", fig2)
+        st.caption("Análisis: Esta gráfica circular muestra la distribución de los daños económicos entre los distintos tipos de desastres, permitiendo identificar cuáles generan mayor impacto económico.")
+
+    with g3:
+        mostrar_figura("evolucion", fig3, config={'displayModeBar': False})
+        st.caption("Análisis: Esta gráfica muestra la evolución en el tiempo de la cantidad total de eventos, permitiendo identificar tendencias y detectar años con mayor actividad de desastres para un análisis histórico y predictivo.")
 
-# (6) Agregar un rastro de línea por cada subgrupo
-for subgroup in df_subgroup[grouping_column].unique():
-    df_temp = df_subgroup[df_subgroup[grouping_column] == subgroup]
-    fig_combined.add_trace(
-        go.Scatter(
-            x=df_temp['Year'],
-            y=df_temp['Total Affected'],
-            mode='lines+markers',
-            name=subgroup
-        )
-    )
+    with col1:
+        mostrar_figura("afectados", fig_combined, config={'displayModeBar': False})
+        st.caption("Análisis: Esta gráfica combinada muestra el total de afectados por año con barras y, adicionalmente, desglosa la información por subgrupo (o tipo) de desastre mediante líneas. Esto permite identificar tendencias generales y evaluar la contribución específica de cada subgrupo en distintos períodos.")
 
-# (7) Ajustar diseño
-fig_combined.update_layout(
-    title='Total de Afectados por Año y Subgrupo de Desastre',
-    xaxis_title='Año',
-    yaxis_title='Total de Afectados',
-    barmode='group',  # las barras se agrupan
-    template='seaborn',
-    legend_title='Subgrupo de Desastre',
-    hovermode='x unified'
-)
+    with col2:
+        mostrar_figura("muertes", fig_sunburst)
+        st.caption("Análisis: Esta visualización sunburst permite identificar, de forma jerárquica, cuáles subgrupos y tipos de desastres han generado la mayor cantidad de muertes, facilitando la detección de eventos con mayor impacto letal.")
+
+    mostrar_figura("dispersion", fig_scatter, config={'displayModeBar': False})
+    st.caption("Análisis: Este gráfico de dispersión ilustra la relación entre el número de personas afectadas y los daños económicos. El tamaño de cada punto refleja el número de eventos y el color diferencia el tipo de desastre, facilitando la identificación de patrones y outliers para evaluar correlaciones entre los indicadores.")
+    st.caption(
+        f"Se muestran {info_scatter.puntos:,} puntos de {info_scatter.filas:,} registros "
+        f"(reducción: {info_scatter.metodo}, {info_scatter.atipicos:,} atípicos conservados, "
+        f"{'WebGL' if info_scatter.webgl else 'SVG'}, {info_scatter.bytes / 1024:,.0f} KB)."
+    )
 
-with col1:
-    st.plotly_chart(fig_combined.update_layout(xaxis={'fixedrange': True}, yaxis={'fixedrange': True}), use_container_width=True, config={'displayModeBar': False})
-    st.caption("Análisis: Esta gráfica combinada muestra el total de afectados por año con barras y, adicionalmente, desglosa la información por subgrupo (o tipo) de desastre mediante líneas. Esto permite identificar tendencias generales y evaluar la contribución específica de cada subgrupo en distintos períodos.")
-
-
-# Gráfico 5 Sunburst: Muertes Totales por Subgrupo y Tipo
-# 1) Agrupar datos 
-df_sunburst = df_filtrado.groupby(
-    ['Disaster Subgroup', 'Disaster Type'], 
-    as_index=False
-)['Total Deaths'].sum()
-
-# 2) Crear el Sunburst con color continuo
-fig_sunburst = px.sunburst(
-    df_sunburst,
-    path=['Disaster Subgroup', 'Disaster Type'],       # Jerarquía de anillos
-    values='Total Deaths',             # Tamaño de cada sector
-    color='Total Deaths',              # Campo numérico para el gradiente
-    color_continuous_scale=px.colors.sequential.Plasma,# Escala de color (morado->amarillo)
-    hover_data=['Total Deaths'],       # Datos en el hover
-    title='Muertes Totales por Subgrupo y Tipo de Desastre'
-)
+    mostrar_figura("mapa", fig_mapa, config=graficos.CONFIG_MAPA)
+    st.caption("Análisis: Este mapa muestra la distribución geográfica del total de eventos de desastres por país, utilizando una escala de color divergente y destacando elementos geográficos para una visualización clara y tradicional.")
 
-# 3) Mostrarlo en Streamlit
-with col2:
-    st.plotly_chart(fig_sunburst, use_container_width=True)
-    st.caption("Análisis: Esta visualización sunburst permite identificar, de forma jerárquica, cuáles subgrupos y tipos de desastres han generado la mayor cantidad de muertes, facilitando la detección de eventos con mayor impacto letal.")
-
-
-# Grafico 6: 
-fig_scatter = px.scatter(
-    df_filtrado,
-    x='Total Affected',
-    y='Total Damage (USD, original)',
-    color='Disaster Type',
-    size='Total Events',
-    hover_data=['Year', 'Country'],
-    title="Relación entre Personas Afectadas y Daños Económicos"
-)
 
-st.plotly_chart(fig_scatter.update_layout(xaxis={'fixedrange': True}, yaxis={'fixedrange': True}), use_container_width=True, config={'displayModeBar': False})
-st.caption("Análisis: Este gráfico de dispersión ilustra la relación entre el número de personas afectadas y los daños económicos. El tamaño de cada punto refleja el número de eventos y el color diferencia el tipo de desastre, facilitando la identificación de patrones y outliers para evaluar correlaciones entre los indicadores.")
-
-# Grafico 7: Mapa Global de Desastres
-
-# Agrupar datos por código ISO y sumar los eventos
-df_mapa = df_filtrado.groupby('ISO', as_index=False)['Total Events'].sum()
-
-# Crear un diccionario que mapea cada código ISO al nombre del país (usando datos filtrados)
-country_mapping = df_filtrado.drop_duplicates('ISO').set_index('ISO')['Country'].to_dict()
-# Agregar la columna "Country" a df_mapa
-df_mapa['Country'] = df_mapa['ISO'].map(country_mapping)
-
-# Mínimo y máximo de eventos (para range_color)
-min_events = df_mapa['Total Events'].min()
-max_events = df_mapa['Total Events'].max()
-
-# Definir una escala continua de 0 (blanco) a 1 (rojo oscuro)
-color_scale = [
-    [0.0, 'rgb(255,255,255)'],   # Blanco
-    [0.1, 'rgb(255,255,240)'],
-    [0.2, 'rgb(255,255,224)'],
-    [0.3, 'rgb(255,255,0)'],
-    [0.4, 'rgb(255,215,0)'],
-    [0.5, 'rgb(255,165,0)'],
-    [0.6, 'rgb(255,140,0)'],
-    [0.7, 'rgb(255,69,0)'],
-    [0.8, 'rgb(178,34,34)'],
-    [1.0, 'rgb(139,0,0)']        # Rojo oscuro
-]
-
-titulo_mapa = f"Distribución Global de Desastres ({anio_inicio} - {anio_fin})"
-
-# Crear el mapa
-fig_mapa = px.choropleth(
-    df_mapa,
-    locations='ISO',              # Debe coincidir con la columna ISO
-    color='Total Events',
-    hover_name='Country',         # Ahora se muestra el nombre del país
-    color_continuous_scale=color_scale,
-    range_color=(min_events, max_events),
-    title=titulo_mapa,
-    projection='natural earth'
-    # Si tus ISO son de 3 letras (ej. USA, COL, MEX), activa locationmode:
-    # locationmode='ISO-3'
-)
+# ----------------------------------------------------------------
+# 6) TABLAS
+# ----------------------------------------------------------------
+# Solo se envía al navegador la página visible; el orden y la paginación se hacen en el servidor
+def controles_orden(nombre, columnas, orden_defecto):
+    """Columna y sentido del orden de una tabla: ``(orden, descendente)``."""
+    c1, c2 = st.columns((3, 1))
+    orden = c1.selectbox("Ordenar por:", columnas, index=columnas.index(orden_defecto), key=f"orden_{nombre}")
+    descendente = c2.toggle("Descendente", value=True, key=f"descendente_{nombre}")
+    return orden, descendente
+
+
+def pagina_elegida(nombre, estado):
+    """Página elegida (desde 0); vuelve a la primera si cambia ``estado`` (filtro y orden)."""
+    clave = f"pagina_{nombre}"
+    if st.session_state.get(f"_estado_{clave}") != estado:
+        st.session_state[f"_estado_{clave}"] = estado
+        st.session_state[clave] = 1
+    return st.session_state.get(clave, 1) - 1
+
+
+def controles_pagina(nombre, pagina):
+    """Selector de página y filas mostradas, debajo de la tabla."""
+    clave = f"pagina_{nombre}"
+    # La página pedida pudo quedar fuera de rango y se ajustó al construir la tabla
+    st.session_state[clave] = pagina.pagina + 1
+    c1, c2 = st.columns((1, 3))
+    c1.number_input("Página:", min_value=1, max_value=pagina.paginas, step=1, key=clave)
+    if pagina.total:
+        c2.caption(f"Filas {pagina.desde + 1:,}–{pagina.desde + len(pagina.filas):,} de {pagina.total:,} "
+                   f"(página {pagina.pagina + 1:,} de {pagina.paginas:,}).")
+    else:
+        c2.caption("No hay filas para los filtros seleccionados.")
 
-# Ajustes del mapa
-fig_mapa.update_geos(
-    showland=True,
-    landcolor="whitesmoke",
-    showcoastlines=True,
-    showframe=False,
-    showcountries=True
-)
 
-fig_mapa.update_layout(
-    margin=dict(l=10, r=10, b=10, t=40)
-)
+@st.fragment
+def tabla_resumen(deps, datos):
+    """Tabla 1; cambiar el orden o la página solo vuelve a ejecutar esta tabla."""
+    orden, descendente = controles_orden("resumen", ['Country', *MEDIDAS], 'Total Events')
+    pagina = pagina_elegida("resumen", deps + (orden, descendente))
+    fig_tabla, pagina = figura(
+        "tabla_resumen", deps + (orden, descendente, pagina, tablas.TAM_PAGINA),
+        lambda: graficos.tabla_resumen(graficos.pagina_resumen(datos.agregados(), orden, descendente, pagina)),
+    )
+    mostrar_figura("tabla_resumen", fig_tabla)
+    controles_pagina("resumen", pagina)
+
+
+@st.fragment
+def tabla_detalle(deps, datos):
+    """Tabla 2; cambiar el orden o la página solo vuelve a ejecutar esta tabla."""
+    orden, descendente = controles_orden("detalle", graficos.COLUMNAS_DETALLE, 'Year')
+    pagina = pagina_elegida("detalle", deps + (orden, descendente))
+    fig_detalle, pagina = figura(
+        "tabla_detalle", deps + (orden, descendente, pagina, tablas.TAM_PAGINA),
+        lambda: graficos.tabla_detalle(motor.pagina_detalle(datos.filtro, orden, descendente, pagina)),
+    )
+    mostrar_figura("tabla_detalle", fig_detalle)
+    controles_pagina("detalle", pagina)
+
+
+def seccion_tablas(deps, datos):
+    cw1, cw2 = st.columns((2.5, 1.7))
+    with cw1:
+        tabla_resumen(deps, datos)
+        st.caption("Análisis: Esta tabla resume la cantidad total de eventos, personas afectadas, muertes y daños económicos por país, permitiendo identificar los países más vulnerables y priorizar esfuerzos de prevención y respuesta ante desastres.")
+    with cw2:
+        tabla_detalle(deps, datos)
+        st.caption("Análisis: Este detalle muestra primero los desastres más recientes, facilitando la identificación rápida de eventos recientes y su impacto en términos de número de eventos y personas afectadas. Se puede ordenar por cualquier columna y recorrer por páginas.")
+
+
+@st.fragment
+def seccion_descarga(datos):
+    """Descarga de los datos del filtro; elegir qué descargar solo vuelve a ejecutar esta sección."""
+    with st.expander("Descargar datos del filtro"):
+        c1, c2, c3 = st.columns((2, 1, 1))
+        que = c1.radio("Datos:", list(exportar.DATOS), format_func=exportar.DATOS.get, horizontal=True,
+                       key="descarga_datos")
+        formato = c2.radio("Formato:", list(exportar.FORMATOS), format_func=str.upper, horizontal=True,
+                           key="descarga_formato")
+        filtro = datos.filtro
+        clave = (version, filtro, que, formato)
+        generada = st.session_state.get("_descarga")
+
+        if c3.button("Preparar descarga", key="descarga"):
+            if generada is not None:
+                exportar.eliminar(generada[1])
+            st.session_state.pop("_descarga", None)
+            agregados = None if que == 'filas' else cache_compartida().obtener_o_calcular(
+                ("agregados", version, filtro), lambda: motor.agregar(filtro)
+            )
+            try:
+                generada = (clave, exportar.exportar(motor, filtro, que, formato, agregados))
+            except ValueError as e:
+                # La exportación supera el tamaño que sirve Streamlit
+                st.error(str(e))
+                return
+            st.session_state["_descarga"] = generada
+
+        # El archivo se descarga desde app/static/, leído del disco por partes
+        if generada is not None and generada[0] == clave and os.path.exists(generada[1]):
+            nombre = os.path.basename(generada[1])
+            c3.markdown(f'<a href="{exportar.url_descarga(generada[1])}" download="{nombre}">Descargar</a>',
+                        unsafe_allow_html=True)
+        st.caption("Las filas se escriben por bloques en un archivo en disco, que se descarga sin cargarlo en "
+                   f"memoria (hasta {exportar.MAX_BYTES / 2**20:,.0f} MB; el enlace vence a los "
+                   f"{exportar.MINUTOS_VIGENCIA:g} minutos).")
+
+
+class DatosFiltro:
+    """Filas filtradas y agregados de un filtro, calculados solo si alguna sección los pide."""
+
+    def __init__(self, filtro):
+        self.filtro = filtro
+        self._filas = None
+        self._agregados = None
+
+    def filas(self):
+        if self._filas is None:
+            with medir("filtrar", filas_entrada=motor.filas_totales) as registro:
+                self._filas = motor.filas(self.filtro, dispersion.COLUMNAS)
+                registro['filas_salida'] = len(self._filas)
+        return self._filas
+
+    def agregados(self):
+        # Agregaciones compartidas entre sesiones mediante la caché de resultados
+        # (clave: versión de los datos + filtro normalizado)
+        if self._agregados is None:
+            with medir("agregar"):
+                try:
+                    self._agregados = cache_compartida().obtener_o_calcular(
+                        ("agregados", version, self.filtro), lambda: motor.agregar(self.filtro)
+                    )
+                except ValueError as e:
+                    # Datos sin una columna de subgrupo válida (ver desastres.agregados)
+                    st.error(str(e))
+                    st.stop()
+        return self._agregados
 
-# Mostrar en Streamlit
-st.plotly_chart(fig_mapa, use_container_width=True)
-st.caption("Análisis: Este mapa muestra la distribución geográfica del total de eventos de desastres por país, utilizando una escala de color divergente y destacando elementos geográficos para una visualización clara y tradicional.")
 
- 
 # ----------------------------------------------------------------
-# 5) TABLAS
+# 7) TABLERO (se vuelve a ejecutar solo al cambiar un filtro)
 # ----------------------------------------------------------------
-cw1, cw2 = st.columns((2.5, 1.7))
-
-# Tabla 1: Resumen de Desastres por País
-tabla_resumen = df_filtrado.groupby('Country', as_index=False).agg({
-    'Total Events': 'sum',
-    'Total Affected': 'sum',
-    'Total Deaths': 'sum',
-    'Total Damage (USD, original)': 'sum'
-}).sort_values('Total Events', ascending=False)
-
-fig_tabla = go.Figure(
-    data=[go.Table(
-        header=dict(
-            values=list(tabla_resumen.columns),
-            fill_color=None,
-            font=dict(color='black', size=12),
-            align='left'
-        ),
-        cells=dict(
-            values=[tabla_resumen[col] for col in tabla_resumen.columns],
-            fill_color=None,
-            font=dict(color='black', size=12),
-            align='left'
-        )
-    )]
-)
-fig_tabla.update_layout(
-    title_text="Resumen de Desastres por País",
-    title_x=0,
-    margin=dict(l=0, r=10, b=10, t=30),
-    height=480
-)
-with cw1:
-    st.plotly_chart(fig_tabla, use_container_width=True)
-    st.caption("Análisis: Esta tabla resume la cantidad total de eventos, personas afectadas, muertes y daños económicos por país, permitiendo identificar los países más vulnerables y priorizar esfuerzos de prevención y respuesta ante desastres.")
-
-
-# Tabla 2: Detalle de Desastres Recientes
-tabla_detalle = df_filtrado[['Country', 'Disaster Type', 'Year', 'Total Events', 'Total Affected']].sort_values('Year', ascending=False).head(10)
-
-fig_detalle = go.Figure(
-    data=[go.Table(
-        header=dict(
-            values=list(tabla_detalle.columns),
-            fill_color=None,
-            font=dict(color='black', size=12),
-            align='left'
-        ),
-        cells=dict(
-            values=[tabla_detalle[col] for col in tabla_detalle.columns],
-            fill_color=None,
-            font=dict(color='black', size=12),
-            align='left'
-        )
-    )]
-)
-fig_detalle.update_layout(
-    title_text="Detalle de Desastres Recientes",
-    title_x=0,
-    margin=dict(l=0, r=10, b=10, t=30),
-    height=480
-)
-with cw2:
-    st.plotly_chart(fig_detalle, use_container_width=True)
-    st.caption("Análisis: Este detalle muestra los 10 desastres más recientes, facilitando la identificación rápida de eventos recientes y su impacto en términos de número de eventos y personas afectadas.")
+@st.fragment
+def tablero():
+    # Si se recargaron los datos, la página completa se vuelve a ejecutar con el motor nuevo
+    if motor_vigente(publicacion) is not motor:
+        st.rerun()
+    with perfilado.perfilar("tablero", activar=perfilado_solicitado()) as perfil, medir_ejecucion("tablero"):
+        with st.spinner("Actualizando reporte..."):
+            hosp, anio_inicio, anio_fin, tipo_desastre, subgrupos = seccion_filtros()
+            filtro = normalizar_filtro(hosp, anio_inicio, anio_fin, tipo_desastre,
+                                       motor.anio_min, motor.anio_max, subgrupos)
+            deps = (version, filtro)
+            datos = DatosFiltro(filtro)
+
+        seccion_metricas(filtro)
+        seccion_graficos(deps, datos, anio_inicio, anio_fin)
+        seccion_tablas(deps, datos)
+        seccion_descarga(datos)
+
+    # Tiempos de servidor (?tiempos=1), perfilado por etapas (?perfilado=1)
+    # y métricas de la caché de resultados (?metricas=1)
+    if st.query_params.get("tiempos"):
+        mostrar_tiempos()
+        if estado_precalentamiento is not None:
+            st.caption(estado_precalentamiento.resumen())
+    # La carga solo se perfila en las ejecuciones completas de la página: en las
+    # del fragmento el perfil de carga sería el de la última ejecución completa
+    carga = perfil_carga if st.session_state.pop("_perfil_carga_pendiente", False) else None
+    mostrar_perfil(carga, perfil)
+    cache = cache_compartida()
+    cache.escribir_metricas()
+    if st.query_params.get("metricas"):
+        st.code(cache.metricas_prometheus(), language=None)
+
+
+tablero()
 
 # ----------------------------------------------------------------
 # 6) BARRA LATERAL - DOCUMENTACIÓN Y ACERCA DE
@@ -479,11 +451,11 @@ with st.expander("Documentación y Acerca de"):
     st.write("\n***") # Separador visual
 
     st.write("**Fuente de Datos:**")
-    st.markdown("""
+    st.markdown(f"""
         Este dashboard utiliza datos del **EM-DAT (Emergency Events Database)**,  gestionado por el Centro para la Investigación sobre Epidemiología de Desastres (CRED).
 
         **Fuente Específica:**  EM-DAT Public Database <br>
-        **Versión:** Version 2025-01-27
+        **Versión:** Version {publicacion or '2025-01-27'}
 
         **Limitaciones de los Datos:**
         * EM-DAT se basa en datos reportados y puede haber **subregistro** de eventos, especialmente en regiones con menor capacidad de reporte o para desastres de menor escala.
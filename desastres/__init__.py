@@ -0,0 +1 @@
+"""Lógica reutilizable del dashboard de desastres de origen natural."""
@@ -0,0 +1,186 @@
+"""Agregaciones de los datos filtrados para gráficos y tablas.
+
+En lugar de agrupar el DataFrame filtrado una vez por gráfico, :func:`agregar`
+recorre las filas una sola vez para obtener las sumas por (País, Tipo de
+desastre, Año) y construye la entrada de cada gráfico re-agrupando ese resumen
+con ``np.bincount``, que trabaja sobre códigos enteros y no vuelve a tocar las
+columnas de texto.
+
+En EM-DAT el código ISO depende del país y el subgrupo depende del tipo de
+desastre, por eso no forman parte de la clave del resumen: se toman de la
+primera fila de cada país y de cada tipo.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from desastres import perfilado
+from desastres.datos import MEDIDAS
+
+
+@dataclass(frozen=True)
+class AgregadosFiltro:
+    """Entradas de todos los gráficos y tablas para un filtro."""
+
+    eventos_por_tipo: pd.DataFrame            # Gráfico 1
+    danos_por_tipo: pd.DataFrame              # Gráfico 2
+    eventos_por_anio: pd.DataFrame            # Gráfico 3
+    afectados_por_anio: pd.DataFrame          # Gráfico 4 (barras)
+    afectados_por_anio_subgrupo: pd.DataFrame  # Gráfico 4 (líneas)
+    columna_subgrupo: str
+    muertes_subgrupo_tipo: pd.DataFrame       # Gráfico 5
+    eventos_por_iso: pd.DataFrame             # Gráfico 7
+    resumen_paises: pd.DataFrame              # Tabla 1
+
+
+@dataclass(frozen=True)
+class ResumenFino:
+    """Sumas de las medidas por (País, Tipo de desastre, Año).
+
+    ``pais``, ``tipo`` y ``anio`` son códigos enteros sobre ``paises``,
+    ``tipos`` y ``anios``; ``medidas`` tiene un arreglo por medida alineado
+    con esos códigos.
+    """
+
+    pais: np.ndarray
+    tipo: np.ndarray
+    anio: np.ndarray
+    medidas: dict
+    paises: pd.Index
+    tipos: pd.Index
+    anios: pd.Index
+    iso_por_pais: np.ndarray
+    subgrupo_por_tipo: pd.Series
+
+
+def columna_subgrupo(df):
+    """Columna usada para desglosar el gráfico 4 ("Disaster Subgroup" o "Disaster Type")."""
+    if 'Disaster Subgroup' in df.columns:
+        return 'Disaster Subgroup'
+    if 'Disaster Type' in df.columns:
+        return 'Disaster Type'
+    raise ValueError("No se encontró una columna válida para el subgrupo de desastres.")
+
+
+def _primer_valor(codigos, n, valores):
+    """Valor de ``valores`` en la primera fila de cada código ``0..n-1``."""
+    primera = np.full(n, len(codigos), dtype=np.int64)
+    np.minimum.at(primera, codigos, np.arange(len(codigos)))
+    return valores[primera]
+
+
+def resumen_fino(df_filtrado):
+    """Sumas de las medidas por (País, Tipo de desastre, Año) en una sola pasada."""
+    cod_pais, paises = pd.factorize(df_filtrado['Country'], sort=True)
+    cod_tipo, tipos = pd.factorize(df_filtrado['Disaster Type'], sort=True)
+    cod_anio, anios = pd.factorize(df_filtrado['Year'], sort=True)
+
+    clave = (cod_pais.astype(np.int64) * len(tipos) + cod_tipo) * len(anios) + cod_anio
+    claves, grupo = np.unique(clave, return_inverse=True)
+
+    medidas = {}
+    for medida in MEDIDAS:
+        columna = df_filtrado[medida]
+        valores = np.nan_to_num(columna.to_numpy(dtype=np.float64, na_value=np.nan), nan=0.0)
+        suma = np.bincount(grupo, weights=valores, minlength=len(claves))
+        # Los conteos enteros se mantienen enteros
+        medidas[medida] = suma.astype(np.int64) if pd.api.types.is_integer_dtype(columna.dtype) else suma
+
+    subgrupo = columna_subgrupo(df_filtrado)
+    return ResumenFino(
+        pais=claves // (len(tipos) * len(anios)),
+        tipo=(claves // len(anios)) % len(tipos),
+        anio=claves % len(anios),
+        medidas=medidas,
+        paises=pd.Index(paises),
+        tipos=pd.Index(tipos),
+        anios=pd.Index(anios),
+        iso_por_pais=_primer_valor(cod_pais, len(paises), np.asarray(df_filtrado['ISO'], dtype=object)),
+        subgrupo_por_tipo=pd.Series(
+            _primer_valor(cod_tipo, len(tipos), np.asarray(df_filtrado[subgrupo], dtype=object))
+        ),
+    )
+
+
+def _reagrupar(codigos, n, medidas):
+    """Suma cada arreglo de ``medidas`` por ``codigos``; devuelve los códigos presentes y sus sumas."""
+    presentes = np.flatnonzero(np.bincount(codigos, minlength=n))
+    sumas = {}
+    for medida, valores in medidas.items():
+        suma = np.bincount(codigos, weights=valores, minlength=n)[presentes]
+        sumas[medida] = suma.astype(valores.dtype)
+    return presentes, sumas
+
+
+def _tabla(etiquetas, sumas):
+    return pd.DataFrame({**etiquetas, **sumas})
+
+
+def agregar(df_filtrado):
+    """Calcula todas las agregaciones del dashboard a partir del DataFrame filtrado."""
+    with perfilado.etapa("agregar.resumen_fino", filas_entrada=len(df_filtrado)) as registro:
+        resumen = resumen_fino(df_filtrado)
+        registro['filas_salida'] = len(resumen.pais)
+    with perfilado.etapa("agregar.reagrupar"):
+        return _reagrupar_todo(resumen, columna_subgrupo(df_filtrado))
+
+
+def _reagrupar_todo(resumen, subgrupo):
+    """Entradas de cada gráfico y tabla a partir del resumen por (País, Tipo, Año)."""
+    n_tipos, n_anios = len(resumen.tipos), len(resumen.anios)
+
+    def medidas(*nombres, filas=slice(None)):
+        return {nombre: resumen.medidas[nombre][filas] for nombre in nombres}
+
+    # Por tipo de desastre (gráficos 1 y 2)
+    tipos, por_tipo = _reagrupar(resumen.tipo, n_tipos, medidas('Total Events', 'Total Damage (USD, original)'))
+    etiquetas_tipo = {'Disaster Type': resumen.tipos[tipos]}
+
+    # Por año (gráficos 3 y 4)
+    anios, por_anio = _reagrupar(resumen.anio, n_anios, medidas('Total Events', 'Total Affected'))
+    etiquetas_anio = {'Year': resumen.anios[anios]}
+
+    # Subgrupo de cada fila del resumen; los nulos se descartan, como en groupby
+    cod_sub_tipo, subgrupos = pd.factorize(resumen.subgrupo_por_tipo, sort=True)
+    cod_sub = cod_sub_tipo[resumen.tipo]
+    validos = cod_sub >= 0
+    n_sub = len(subgrupos)
+
+    # Por año y subgrupo (gráfico 4)
+    clave = resumen.anio[validos] * n_sub + cod_sub[validos]
+    claves, por_anio_sub = _reagrupar(clave, n_anios * n_sub, medidas('Total Affected', filas=validos))
+    etiquetas_anio_sub = {'Year': resumen.anios[claves // n_sub], subgrupo: subgrupos[claves % n_sub]}
+
+    # Por subgrupo y tipo (gráfico 5)
+    clave = cod_sub[validos] * n_tipos + resumen.tipo[validos]
+    claves, por_sub_tipo = _reagrupar(clave, n_sub * n_tipos, medidas('Total Deaths', filas=validos))
+    etiquetas_sub_tipo = {
+        'Disaster Subgroup': subgrupos[claves // n_tipos],
+        'Disaster Type': resumen.tipos[claves % n_tipos],
+    }
+
+    # Por ISO (gráfico 7), con el nombre del país
+    cod_iso, isos = pd.factorize(resumen.iso_por_pais, sort=True)
+    claves, por_iso = _reagrupar(cod_iso[resumen.pais], len(isos), medidas('Total Events'))
+    pais_por_iso = _primer_valor(cod_iso, len(isos), np.asarray(resumen.paises, dtype=object))
+    eventos_por_iso = _tabla({'ISO': isos[claves]}, por_iso)
+    eventos_por_iso['Country'] = pais_por_iso[claves]
+
+    # Por país (tabla 1)
+    paises, por_pais = _reagrupar(resumen.pais, len(resumen.paises), medidas(*MEDIDAS))
+
+    return AgregadosFiltro(
+        eventos_por_tipo=_tabla(etiquetas_tipo, {'Total Events': por_tipo['Total Events']})
+        .sort_values('Total Events', ascending=False, kind='stable'),
+        danos_por_tipo=_tabla(etiquetas_tipo, {'Total Damage (USD, original)': por_tipo['Total Damage (USD, original)']})
+        .sort_values('Total Damage (USD, original)', ascending=False, kind='stable'),
+        eventos_por_anio=_tabla(etiquetas_anio, {'Total Events': por_anio['Total Events']}),
+        afectados_por_anio=_tabla(etiquetas_anio, {'Total Affected': por_anio['Total Affected']}),
+        afectados_por_anio_subgrupo=_tabla(etiquetas_anio_sub, por_anio_sub),
+        columna_subgrupo=subgrupo,
+        muertes_subgrupo_tipo=_tabla(etiquetas_sub_tipo, por_sub_tipo),
+        eventos_por_iso=eventos_por_iso,
+        resumen_paises=_tabla({'Country': resumen.paises[paises]}, por_pais)
+        .sort_values('Total Events', ascending=False, kind='stable'),
+    )
@@ -0,0 +1,245 @@
+"""Caché LRU de resultados compartida entre todas las sesiones del proceso.
+
+Streamlit solo cachea ``cargar_datos``; cada clic recalculaba filtros y
+agregaciones aunque otro usuario acabara de pedir exactamente el mismo filtro.
+:class:`CacheResultados` guarda esos resultados con una clave formada por la
+versión de los datos y el filtro normalizado, y desaloja las entradas menos
+usadas cuando se supera el número máximo de entradas o de bytes.
+
+Los contadores se pueden consultar con :meth:`CacheResultados.estadisticas` o
+en formato de texto de Prometheus con :meth:`CacheResultados.metricas_prometheus`.
+"""
+import dataclasses
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from desastres.config import entero_env, flotante_env, texto_env
+from desastres.datos import TODOS_DESASTRES, TODOS_PAISES, TODOS_SUBGRUPOS, como_seleccion
+
+MAX_ENTRADAS = entero_env("DESASTRES_CACHE_MAX_ENTRADAS", 256)
+MAX_BYTES = entero_env("DESASTRES_CACHE_MAX_MB", 256) * 1024 * 1024
+ARCHIVO_METRICAS = texto_env("DESASTRES_CACHE_METRICAS_ARCHIVO")
+# Segundos mínimos entre dos escrituras del archivo de métricas (se pide en cada ejecución del dashboard)
+INTERVALO_METRICAS = flotante_env("DESASTRES_CACHE_METRICAS_SEGUNDOS", 15.0)
+
+_AUSENTE = object()
+
+
+def estimar_bytes(valor):
+    """Estimación de la memoria ocupada por un resultado."""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, (bytes, bytearray, str)):
+        return len(valor)
+    if dataclasses.is_dataclass(valor) and not isinstance(valor, type):
+        return sum(estimar_bytes(getattr(valor, campo.name)) for campo in dataclasses.fields(valor))
+    if isinstance(valor, dict):
+        return sum(estimar_bytes(k) + estimar_bytes(v) for k, v in valor.items())
+    if isinstance(valor, (list, tuple)):
+        return sum(estimar_bytes(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+class Filtro(NamedTuple):
+    """Filtro normalizado; una selección vacía significa "todos"."""
+
+    paises: tuple
+    anio_inicio: int
+    anio_fin: int
+    tipos: tuple
+    subgrupos: tuple = ()
+
+
+def normalizar_filtro(pais, anio_inicio, anio_fin, tipo_desastre, anio_min=None, anio_max=None, subgrupo=None):
+    """:class:`Filtro` canónico, para usarlo como clave de caché.
+
+    País, tipo y subgrupo pueden ser un valor, una colección de valores o
+    "Todos"; se guardan como tuplas ordenadas (vacías para "Todos"). Los años
+    se recortan al rango de los datos (si se indica) y todos los rangos vacíos
+    se representan igual, porque producen el mismo resultado.
+    """
+    anio_inicio, anio_fin = int(anio_inicio), int(anio_fin)
+    if anio_min is not None:
+        anio_inicio = max(anio_inicio, int(anio_min))
+    if anio_max is not None:
+        anio_fin = min(anio_fin, int(anio_max))
+    if anio_inicio > anio_fin:
+        anio_inicio, anio_fin = 0, -1
+    return Filtro(
+        como_seleccion(pais, TODOS_PAISES), anio_inicio, anio_fin,
+        como_seleccion(tipo_desastre, TODOS_DESASTRES), como_seleccion(subgrupo, TODOS_SUBGRUPOS),
+    )
+
+
+def _menciona(clave, valor):
+    if isinstance(clave, tuple):
+        return any(_menciona(parte, valor) for parte in clave)
+    return clave == valor
+
+
+class CacheResultados:
+    """Caché LRU segura entre hilos, acotada por número de entradas y por bytes."""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS, max_bytes=MAX_BYTES):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()   # clave -> (valor, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self._metricas_escritas = None   # time.monotonic() de la última escritura del archivo de métricas
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, clave):
+        return clave in self._entradas
+
+    def obtener(self, clave, defecto=None, contar=True):
+        """Devuelve el valor cacheado (y lo marca como usado) o ``defecto``.
+
+        Con ``contar=False`` no suma un acierto ni un fallo (para volver a
+        mirar una clave cuyo fallo ya se contó).
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave, _AUSENTE)
+            if entrada is _AUSENTE:
+                self.fallos += contar
+                return defecto
+            self._entradas.move_to_end(clave)
+            self.aciertos += contar
+            return entrada[0]
+
+    def guardar(self, clave, valor, tam=None):
+        """Guarda un valor; si no cabe dentro del límite de bytes no se cachea."""
+        tam = estimar_bytes(valor) if tam is None else tam
+        if tam > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= anterior[1]
+            self._entradas[clave] = (valor, tam)
+            self._bytes += tam
+            self._desalojar()
+
+    def obtener_o_calcular(self, clave, funcion):
+        """Devuelve el valor cacheado o lo calcula con ``funcion()`` y lo guarda."""
+        valor = self.obtener(clave, _AUSENTE)
+        if valor is _AUSENTE:
+            valor = funcion()
+            self.guardar(clave, valor)
+        return valor
+
+    def invalidar(self, predicado):
+        """Elimina las entradas cuya clave cumple ``predicado``; devuelve cuántas."""
+        with self._lock:
+            claves = [clave for clave in self._entradas if predicado(clave)]
+            for clave in claves:
+                self._bytes -= self._entradas.pop(clave)[1]
+            return len(claves)
+
+    def invalidar_version(self, version):
+        """Elimina las entradas de una versión de los datos; devuelve cuántas.
+
+        La versión va en la clave, directamente o dentro de una tupla (por
+        ejemplo, las dependencias de una figura).
+        """
+        return self.invalidar(lambda clave: _menciona(clave, version))
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def _desalojar(self):
+        while self._entradas and (len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes):
+            _, (_, tam) = self._entradas.popitem(last=False)
+            self._bytes -= tam
+            self.desalojos += 1
+
+    # ------------------------------------------------------------
+    def estadisticas(self):
+        """Contadores y ocupación actual de la caché."""
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'max_entradas': self.max_entradas,
+                'max_bytes': self.max_bytes,
+            }
+
+    def metricas_prometheus(self, prefijo="desastres_cache_resultados"):
+        """Estadísticas en el formato de texto de Prometheus."""
+        e = self.estadisticas()
+        lineas = []
+        for nombre, tipo, valor in (
+            ("aciertos_total", "counter", e['aciertos']),
+            ("fallos_total", "counter", e['fallos']),
+            ("desalojos_total", "counter", e['desalojos']),
+            ("entradas", "gauge", e['entradas']),
+            ("bytes", "gauge", e['bytes']),
+            ("max_entradas", "gauge", e['max_entradas']),
+            ("max_bytes", "gauge", e['max_bytes']),
+        ):
+            lineas.append(f"# TYPE {prefijo}_{nombre} {tipo}")
+            lineas.append(f"{prefijo}_{nombre} {valor}")
+        return "\n".join(lineas) + "\n"
+
+    def escribir_metricas(self, ruta=ARCHIVO_METRICAS, intervalo=INTERVALO_METRICAS):
+        """Escribe las métricas en un archivo para el colector de textfiles de Prometheus.
+
+        Varias sesiones lo piden a la vez: se escribe como mucho una vez cada
+        ``intervalo`` segundos, en un temporal propio que luego se renombra.
+        Devuelve ``True`` si lo escribió.
+        """
+        if not ruta:
+            return False
+        with self._lock:
+            ahora = time.monotonic()
+            if self._metricas_escritas is not None and ahora - self._metricas_escritas < intervalo:
+                return False
+            self._metricas_escritas = ahora
+        descriptor, temporal = tempfile.mkstemp(prefix=f".{os.path.basename(ruta)}.", suffix=".tmp",
+                                                dir=os.path.dirname(ruta) or ".")
+        try:
+            with os.fdopen(descriptor, "w") as f:
+                f.write(self.metricas_prometheus())
+            # mkstemp lo crea solo para el dueño; el colector puede correr con otro usuario
+            os.chmod(temporal, 0o644)
+            os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        return True
+
+
+_cache_compartida = None
+_lock_cache = threading.Lock()
+
+
+def cache_compartida():
+    """Instancia única de la caché para todo el proceso (todas las sesiones)."""
+    global _cache_compartida
+    with _lock_cache:
+        if _cache_compartida is None:
+            _cache_compartida = CacheResultados()
+        return _cache_compartida
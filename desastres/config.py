@@ -0,0 +1,36 @@
+"""Lectura de la configuración del dashboard desde variables de entorno."""
+import os
+
+
+def bool_env(nombre, defecto=False):
+    """Lee una variable de entorno booleana ("1", "true", "si" activan la opción)."""
+    valor = os.environ.get(nombre)
+    if valor is None or valor.strip() == "":
+        return defecto
+    return valor.strip().lower() in ("1", "true", "si", "sí", "yes", "on")
+
+
+def entero_env(nombre, defecto):
+    """Lee una variable de entorno entera; si no es válida devuelve el valor por defecto."""
+    try:
+        return int(os.environ[nombre])
+    except (KeyError, ValueError):
+        return defecto
+
+
+def flotante_env(nombre, defecto):
+    """Lee una variable de entorno numérica; si no es válida devuelve el valor por defecto."""
+    try:
+        return float(os.environ[nombre])
+    except (KeyError, ValueError):
+        return defecto
+
+
+def texto_env(nombre, defecto=""):
+    """Lee una variable de entorno de texto."""
+    valor = os.environ.get(nombre)
+    return defecto if valor is None or valor.strip() == "" else valor.strip()
+
+
+# Modo de tipos compactos para el DataFrame cargado (activado por defecto)
+TIPOS_COMPACTOS = bool_env("DESASTRES_TIPOS_COMPACTOS", True)
@@ -0,0 +1,209 @@
+"""Cubo denso País × Tipo de desastre × Año con sumas acumuladas.
+
+El cubo se construye una sola vez después de cargar los datos. Cada medida se
+guarda como un arreglo ``(países + 1, tipos + 1, años + 1)``: la última fila y
+la última columna contienen los totales de "Todos los países" y "Todos los
+desastres", y el eje de años guarda sumas acumuladas con un cero inicial. Así,
+el total de cualquier rango de años es la resta de dos posiciones del arreglo.
+Con selección múltiple de países o tipos se suman las posiciones elegidas.
+
+El subgrupo no es un eje del cubo: en EM-DAT cada tipo de desastre pertenece a
+un solo subgrupo, así que un filtro por subgrupo equivale a un filtro por los
+tipos de ese subgrupo.
+
+Verificación contra el filtrado con pandas::
+
+    python -m desastres.cubo --verificar
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from desastres.datos import (
+    MEDIDAS, TODOS_DESASTRES, TODOS_PAISES, TODOS_SUBGRUPOS, cargar_datos_limpios, compactar_tipos, como_seleccion,
+)
+from desastres.filtros import IndiceFiltros, filtrar_df, selecciones_multiples
+
+
+class CuboDesastres:
+    """Totales de las medidas por país, tipo de desastre y rango de años."""
+
+    def __init__(self, paises, tipos, anio_min, anio_max, acumulados, subgrupo_por_tipo=None):
+        self.paises = list(paises)
+        self.tipos = list(tipos)
+        self.anio_min = int(anio_min)
+        self.anio_max = int(anio_max)
+        self.acumulados = acumulados
+        # {tipo: subgrupo}, o None si algún tipo tiene más de un subgrupo
+        self.subgrupo_por_tipo = subgrupo_por_tipo
+        self._pos_pais = {pais: i for i, pais in enumerate(self.paises)}
+        self._pos_tipo = {tipo: i for i, tipo in enumerate(self.tipos)}
+        # Posiciones reservadas para "Todos"
+        self._pos_pais[TODOS_PAISES] = len(self.paises)
+        self._pos_tipo[TODOS_DESASTRES] = len(self.tipos)
+
+    @classmethod
+    def desde_df(cls, df):
+        """Construye el cubo a partir del DataFrame limpio."""
+        cod_pais, paises = pd.factorize(df['Country'], sort=True)
+        cod_tipo, tipos = pd.factorize(df['Disaster Type'], sort=True)
+        anios = df['Year'].to_numpy(dtype=np.int64)
+        anio_min, anio_max = (int(anios.min()), int(anios.max())) if len(anios) else (0, -1)
+        cod_anio = anios - anio_min
+        forma = (len(paises), len(tipos), anio_max - anio_min + 1)
+
+        acumulados = {}
+        for medida in MEDIDAS:
+            entero = medida == 'Total Events'
+            valores = df[medida].to_numpy(dtype=np.float64, na_value=np.nan)
+            valores = np.nan_to_num(valores, nan=0.0)
+            denso = np.zeros(forma, dtype=np.int64 if entero else np.float64)
+            np.add.at(denso, (cod_pais, cod_tipo, cod_anio), valores.astype(denso.dtype))
+
+            # Agregar los totales de "Todos los desastres" y "Todos los países"
+            denso = np.concatenate([denso, denso.sum(axis=1, keepdims=True)], axis=1)
+            denso = np.concatenate([denso, denso.sum(axis=0, keepdims=True)], axis=0)
+
+            # Sumas acumuladas a lo largo del año, con un cero al inicio
+            acumulado = np.zeros(denso.shape[:2] + (denso.shape[2] + 1,), dtype=denso.dtype)
+            np.cumsum(denso, axis=2, out=acumulado[:, :, 1:])
+            acumulados[medida] = acumulado
+
+        subgrupo_por_tipo = None
+        if 'Disaster Subgroup' in df.columns:
+            pares = pd.DataFrame({
+                'tipo': np.asarray(df['Disaster Type'], dtype=object),
+                'subgrupo': np.asarray(df['Disaster Subgroup'], dtype=object),
+            }).dropna().drop_duplicates()
+            if not pares['tipo'].duplicated().any():
+                subgrupo_por_tipo = dict(zip(pares['tipo'], pares['subgrupo']))
+
+        return cls(paises, tipos, anio_min, anio_max, acumulados, subgrupo_por_tipo)
+
+    def _ceros(self):
+        return {medida: acumulado.dtype.type(0) for medida, acumulado in self.acumulados.items()}
+
+    def _posiciones(self, seleccion, posiciones, todos):
+        """Posiciones de la selección en un eje (la de "Todos" si está vacía)."""
+        if not seleccion:
+            return [posiciones[todos]]
+        return [posiciones[v] for v in seleccion if v in posiciones]
+
+    def totales(self, pais, anio_inicio, anio_fin, tipo_desastre, subgrupo=None):
+        """Suma de cada medida para un filtro, con la misma semántica que ``filtrar_df``.
+
+        Devuelve un diccionario ``{medida: total}``. Si ningún país o tipo
+        seleccionado existe, o el rango de años está vacío, todos los totales
+        son cero.
+        """
+        tipos = como_seleccion(tipo_desastre, TODOS_DESASTRES)
+        subgrupos = como_seleccion(subgrupo, TODOS_SUBGRUPOS)
+        if subgrupos:
+            if self.subgrupo_por_tipo is None:
+                raise ValueError("Hay tipos de desastre con más de un subgrupo: no se puede filtrar por subgrupo.")
+            del_subgrupo = [t for t in self.tipos if self.subgrupo_por_tipo.get(t) in subgrupos]
+            tipos = tuple(t for t in del_subgrupo if not tipos or t in tipos)
+            if not tipos:
+                return self._ceros()
+
+        i = self._posiciones(como_seleccion(pais, TODOS_PAISES), self._pos_pais, TODOS_PAISES)
+        j = self._posiciones(tipos, self._pos_tipo, TODOS_DESASTRES)
+        desde = max(int(anio_inicio), self.anio_min) - self.anio_min
+        hasta = min(int(anio_fin), self.anio_max) - self.anio_min + 1
+        if not i or not j or desde >= hasta:
+            return self._ceros()
+        if len(i) == 1 and len(j) == 1:
+            return {
+                medida: acumulado[i[0], j[0], hasta] - acumulado[i[0], j[0], desde]
+                for medida, acumulado in self.acumulados.items()
+            }
+        celdas = np.ix_(i, j)
+        return {
+            medida: (acumulado[:, :, hasta][celdas] - acumulado[:, :, desde][celdas]).sum()
+            for medida, acumulado in self.acumulados.items()
+        }
+
+    def nbytes(self):
+        """Memoria ocupada por los arreglos del cubo."""
+        return sum(acumulado.nbytes for acumulado in self.acumulados.values())
+
+
+# ----------------------------------------------------------------
+# LÍNEA DE COMANDOS
+# ----------------------------------------------------------------
+def _como_dict(agrupado):
+    return {clave: fila for clave, fila in zip(agrupado.index.tolist(), agrupado.to_dict('records'))}
+
+
+def _verificar(df, cubo):
+    """Compara el cubo con sumas de pandas para todos los países y tipos."""
+    anios = sorted(df['Year'].unique())
+    rangos = [(anios[0], anios[-1]), (2000, 2024), (2010, 2015), (2024, 2024), (2015, 2010)]
+    paises = [TODOS_PAISES] + sorted(df['Country'].unique())
+    tipos = [TODOS_DESASTRES] + sorted(df['Disaster Type'].unique())
+    errores = 0
+    for anio_inicio, anio_fin in rangos:
+        sel = df[(df['Year'] >= anio_inicio) & (df['Year'] <= anio_fin)]
+        por_grupo = _como_dict(sel.groupby(['Country', 'Disaster Type'], observed=True)[MEDIDAS].sum())
+        por_pais = _como_dict(sel.groupby('Country', observed=True)[MEDIDAS].sum())
+        por_tipo = _como_dict(sel.groupby('Disaster Type', observed=True)[MEDIDAS].sum())
+        for pais in paises:
+            for tipo in tipos:
+                if pais == TODOS_PAISES and tipo == TODOS_DESASTRES:
+                    esperado = sel[MEDIDAS].sum().to_dict()
+                elif pais == TODOS_PAISES:
+                    esperado = por_tipo.get(tipo)
+                elif tipo == TODOS_DESASTRES:
+                    esperado = por_pais.get(pais)
+                else:
+                    esperado = por_grupo.get((pais, tipo))
+                obtenido = cubo.totales(pais, anio_inicio, anio_fin, tipo)
+                for medida in MEDIDAS:
+                    valor = 0 if esperado is None else esperado[medida]
+                    if float(valor) != float(obtenido[medida]):
+                        errores += 1
+    return errores, len(rangos) * len(paises) * len(tipos)
+
+
+def _verificar_multiples(df, cubo, cantidad=300):
+    """Compara el cubo con sumas de pandas en selecciones múltiples aleatorias."""
+    indice = IndiceFiltros(df)
+    rangos = [(cubo.anio_min, cubo.anio_max), (2010, 2015)]
+    errores = combinaciones = 0
+    for anio_inicio, anio_fin in rangos:
+        for combinacion in selecciones_multiples(indice, anio_inicio, anio_fin, cantidad):
+            esperado = filtrar_df(df, *combinacion)[MEDIDAS].sum()
+            obtenido = cubo.totales(*combinacion)
+            errores += sum(float(esperado[m]) != float(obtenido[m]) for m in MEDIDAS)
+            combinaciones += 1
+    return errores, combinaciones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cubo de totales del dashboard de desastres.")
+    parser.add_argument("--verificar", action="store_true", help="Compara el cubo con sumas de pandas")
+    args = parser.parse_args(argv)
+
+    df = compactar_tipos(cargar_datos_limpios())
+    inicio = time.perf_counter()
+    cubo = CuboDesastres.desde_df(df)
+    print(f"Cubo {len(cubo.paises)} países × {len(cubo.tipos)} tipos × "
+          f"{cubo.anio_max - cubo.anio_min + 1} años: {cubo.nbytes():,} bytes, "
+          f"construido en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    if args.verificar:
+        for verificar, descripcion in ((_verificar, "combinaciones de filtros"),
+                                       (_verificar_multiples, "selecciones múltiples")):
+            errores, combinaciones = verificar(df, cubo)
+            if errores:
+                print(f"{errores} totales distintos en {combinaciones} {descripcion}", file=sys.stderr)
+                return 1
+            print(f"Totales idénticos en {combinaciones} {descripcion}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
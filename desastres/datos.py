@@ -0,0 +1,352 @@
+"""Carga, limpieza y caché en disco de los datos de EM-DAT.
+
+La lectura del Excel con openpyxl es la parte más lenta del arranque, por eso
+el DataFrame limpio se guarda una sola vez en un archivo Parquet dentro de
+``data/.cache``. El nombre del archivo incluye un hash del Excel de origen y de
+la lista de columnas, de modo que cualquier cambio en cualquiera de los dos
+genera automáticamente una caché nueva.
+
+Uso desde la línea de comandos (por ejemplo, al construir la imagen)::
+
+    python -m desastres.datos --construir-cache
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------
+# 1) CONSTANTES
+# ----------------------------------------------------------------
+RUTA_DATOS = "data/emdat-country-profiles_2025_01_27.xlsx"
+HOJA_DATOS = "EM-DAT Version 2025-01-27"
+DIR_CACHE = "data/.cache"
+
+COLUMNAS_NECESARIAS = [
+    'Year', 'Country', 'ISO', 'Disaster Group', 'Disaster Subgroup',
+    'Disaster Type', 'Disaster Subtype', 'Total Events', 'Total Affected',
+    'Total Deaths', 'Total Damage (USD, original)', 'Total Damage (USD, adjusted)',
+    'CPI'
+]
+
+# Valores de los filtros que significan "sin filtrar"
+TODOS_PAISES = "Todos los países"
+TODOS_DESASTRES = "Todos los desastres"
+TODOS_SUBGRUPOS = "Todos los subgrupos"
+
+# Medidas que se suman en métricas, gráficos y tablas
+MEDIDAS = ['Total Events', 'Total Affected', 'Total Deaths', 'Total Damage (USD, original)']
+
+# Columnas de dimensión que se guardan como categóricas en el modo compacto
+COLUMNAS_CATEGORICAS = [
+    'Country', 'ISO', 'Disaster Group', 'Disaster Subgroup', 'Disaster Type', 'Disaster Subtype'
+]
+
+# Conteos que admiten nulos y se guardan como enteros anulables en el modo compacto
+COLUMNAS_ENTERAS_ANULABLES = ['Total Affected', 'Total Deaths']
+
+# Se incrementa cuando cambia la lógica de limpieza para invalidar las cachés
+VERSION_LIMPIEZA = 1
+
+
+# ----------------------------------------------------------------
+# 2) LECTURA Y LIMPIEZA
+# ----------------------------------------------------------------
+def limpiar_datos(df):
+    """Selecciona las columnas necesarias y normaliza sus tipos."""
+    # Limpiar nombres de columnas
+    df.columns = df.columns.str.strip()
+
+    # Seleccionar columnas necesarias
+    df = df[[col for col in COLUMNAS_NECESARIAS if col in df.columns]]
+
+    # Eliminar filas con NaN en columnas clave
+    df = df.dropna(subset=['Year', 'Disaster Type', 'ISO', 'Country', 'Total Events'])
+
+    # Convertir tipos de datos
+    df['Year'] = df['Year'].astype(int)
+    df['Total Events'] = df['Total Events'].astype(int)
+    df['Total Affected'] = pd.to_numeric(df['Total Affected'], errors='coerce')
+    df['Total Deaths'] = pd.to_numeric(df['Total Deaths'], errors='coerce')
+    df['Total Damage (USD, original)'] = pd.to_numeric(df['Total Damage (USD, original)'], errors='coerce')
+    df['Total Damage (USD, adjusted)'] = pd.to_numeric(df['Total Damage (USD, adjusted)'], errors='coerce')
+    df['CPI'] = pd.to_numeric(df['CPI'], errors='coerce')
+
+    return df
+
+
+def como_seleccion(valor, todos=None):
+    """Selección canónica de un filtro: tupla ordenada de valores, o ``()`` para todos.
+
+    Acepta un valor suelto, una colección de valores (selección múltiple),
+    ``None`` o el valor que significa "sin filtrar" (``todos``).
+    """
+    if valor is None:
+        return ()
+    valores = {valor} if isinstance(valor, str) else {str(v) for v in valor}
+    if todos in valores:
+        return ()
+    return tuple(sorted(valores))
+
+
+def leer_excel(ruta=RUTA_DATOS, hoja=HOJA_DATOS):
+    """Lee el Excel de EM-DAT y devuelve el DataFrame limpio."""
+    df = pd.read_excel(ruta, sheet_name=hoja)
+    return limpiar_datos(df)
+
+
+def _entero_mas_estrecho(serie, anulable=False):
+    """Devuelve el tipo entero más pequeño que contiene todos los valores de la serie."""
+    tipos = ['int8', 'int16', 'int32', 'int64']
+    minimo, maximo = serie.min(), serie.max()
+    for tipo in tipos:
+        info = np.iinfo(tipo)
+        if pd.isna(minimo) or (info.min <= minimo and maximo <= info.max):
+            return tipo.capitalize() if anulable else tipo
+    return 'Int64' if anulable else 'int64'
+
+
+def compactar_tipos(df):
+    """Convierte el DataFrame limpio a una representación compacta en memoria.
+
+    Las columnas de dimensión pasan a categóricas, ``Year`` y ``Total Events`` al
+    entero más estrecho posible y los conteos con nulos a enteros anulables. Las
+    sumas de pandas sobre estos tipos se acumulan en 64 bits, así que los totales
+    no cambian.
+    """
+    df = df.copy()
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in ['Year', 'Total Events']:
+        df[col] = df[col].astype(_entero_mas_estrecho(df[col]))
+    for col in COLUMNAS_ENTERAS_ANULABLES:
+        # Solo se convierte si todos los valores son enteros
+        valores = df[col].dropna()
+        if (valores % 1 == 0).all():
+            df[col] = df[col].astype(_entero_mas_estrecho(df[col], anulable=True))
+    return df
+
+
+def memoria_df(df):
+    """Memoria ocupada por el DataFrame en bytes, incluyendo el contenido de los objetos."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def resumen_dashboard(df, pais, anio_inicio, anio_fin, tipo_desastre):
+    """Calcula los totales y agrupaciones que muestra el dashboard para un filtro.
+
+    Sirve para comprobar que dos representaciones del mismo DataFrame producen
+    exactamente los mismos números en métricas y gráficos.
+    """
+    mascara = (df['Year'] >= anio_inicio) & (df['Year'] <= anio_fin)
+    if pais != TODOS_PAISES:
+        mascara &= df['Country'] == pais
+    if tipo_desastre != TODOS_DESASTRES:
+        mascara &= df['Disaster Type'] == tipo_desastre
+    sel = df[mascara]
+
+    medidas = MEDIDAS
+    resumen = {'metricas': [float(sel[m].sum()) for m in medidas]}
+    agrupaciones = {
+        'tipo': (['Disaster Type'], medidas),
+        'anio': (['Year'], ['Total Events', 'Total Affected']),
+        'anio_subgrupo': (['Year', 'Disaster Subgroup'], ['Total Affected']),
+        'subgrupo_tipo': (['Disaster Subgroup', 'Disaster Type'], ['Total Deaths']),
+        'iso': (['ISO'], ['Total Events']),
+        'pais': (['Country'], medidas),
+    }
+    for nombre, (claves, columnas) in agrupaciones.items():
+        agrupado = sel.groupby(claves, observed=True)[columnas].sum()
+        agrupado.index = agrupado.index.map(lambda v: tuple(map(str, v)) if isinstance(v, tuple) else str(v))
+        resumen[nombre] = {k: [float(x) for x in fila] for k, fila in zip(agrupado.index, agrupado.to_numpy())}
+    resumen['dispersion'] = sorted(
+        map(tuple, sel[['Total Affected', 'Total Damage (USD, original)', 'Total Events']].astype('float64').fillna(-1).to_numpy())
+    )
+    return resumen
+
+
+def comparar_representaciones(df_a, df_b, combinaciones):
+    """Devuelve la lista de combinaciones de filtros cuyos números difieren."""
+    return [
+        combinacion for combinacion in combinaciones
+        if resumen_dashboard(df_a, *combinacion) != resumen_dashboard(df_b, *combinacion)
+    ]
+
+
+# ----------------------------------------------------------------
+# 3) CACHÉ COLUMNAR EN DISCO
+# ----------------------------------------------------------------
+def parquet_disponible():
+    """Indica si hay un motor de Parquet instalado (pyarrow)."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def hash_archivo(ruta, tam_bloque=1 << 20):
+    """Calcula el SHA-256 del contenido de un archivo."""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def version_datos(ruta=RUTA_DATOS, hoja=HOJA_DATOS):
+    """Identificador corto de la versión de los datos.
+
+    Combina el hash del archivo de origen, la hoja, la lista de columnas y la
+    versión de la limpieza.
+    """
+    h = hashlib.sha256()
+    h.update(hash_archivo(ruta).encode())
+    h.update(hoja.encode())
+    h.update("|".join(COLUMNAS_NECESARIAS).encode())
+    h.update(str(VERSION_LIMPIEZA).encode())
+    return h.hexdigest()[:16]
+
+
+def ruta_cache(version, dir_cache=DIR_CACHE):
+    """Ruta del archivo Parquet de caché para una versión de los datos."""
+    return os.path.join(dir_cache, f"emdat_{version}.parquet")
+
+
+def eliminar_cache(version, dir_cache=DIR_CACHE):
+    """Borra la caché Parquet de una versión, si existe."""
+    try:
+        os.remove(ruta_cache(version, dir_cache))
+    except FileNotFoundError:
+        pass
+
+
+def _eliminar_caches_antiguas(vigente, dir_cache=DIR_CACHE):
+    for nombre in os.listdir(dir_cache):
+        ruta = os.path.join(dir_cache, nombre)
+        if nombre.startswith("emdat_") and nombre.endswith(".parquet") and ruta != vigente:
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+
+def construir_cache(ruta=RUTA_DATOS, hoja=HOJA_DATOS, dir_cache=DIR_CACHE, version=None, limpiar=True):
+    """Lee el Excel, lo limpia y escribe la caché Parquet.
+
+    La escritura se hace en un archivo temporal que luego se renombra, para que
+    otro proceso nunca lea una caché a medio escribir. Con ``limpiar=True`` se
+    borran las cachés de otras versiones; la recarga usa ``limpiar=False``
+    porque el motor anterior todavía lee la suya.
+    """
+    if version is None:
+        version = version_datos(ruta, hoja)
+    df = leer_excel(ruta, hoja)
+
+    os.makedirs(dir_cache, exist_ok=True)
+    destino = ruta_cache(version, dir_cache)
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    df.to_parquet(temporal, index=False)
+    os.replace(temporal, destino)
+    if limpiar:
+        _eliminar_caches_antiguas(destino, dir_cache)
+
+    return df
+
+
+def cargar_datos_limpios(ruta=RUTA_DATOS, hoja=HOJA_DATOS, dir_cache=DIR_CACHE, usar_cache=True, compacto=False,
+                         limpiar=True):
+    """Devuelve el DataFrame limpio, usando la caché Parquet si está vigente.
+
+    Si no hay caché para la versión actual del Excel se reconstruye (``limpiar``
+    como en :func:`construir_cache`). Si pyarrow no está instalado se lee
+    directamente el Excel. Con ``compacto=True`` se aplica
+    :func:`compactar_tipos` al resultado.
+    """
+    df = _cargar_sin_compactar(ruta, hoja, dir_cache, usar_cache, limpiar)
+    return compactar_tipos(df) if compacto else df
+
+
+def _cargar_sin_compactar(ruta, hoja, dir_cache, usar_cache, limpiar=True):
+    if not usar_cache or not parquet_disponible():
+        return leer_excel(ruta, hoja)
+
+    version = version_datos(ruta, hoja)
+    destino = ruta_cache(version, dir_cache)
+    if os.path.exists(destino):
+        try:
+            return pd.read_parquet(destino)
+        except Exception:
+            # Caché corrupta: se reconstruye
+            pass
+
+    try:
+        return construir_cache(ruta, hoja, dir_cache, version, limpiar)
+    except OSError:
+        # Directorio sin permisos de escritura: se sigue sin caché
+        return leer_excel(ruta, hoja)
+
+
+# ----------------------------------------------------------------
+# 4) LÍNEA DE COMANDOS
+# ----------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Utilidades de datos del dashboard de desastres.")
+    parser.add_argument("--ruta", default=RUTA_DATOS, help="Archivo Excel de EM-DAT")
+    parser.add_argument("--hoja", default=HOJA_DATOS, help="Hoja del Excel")
+    parser.add_argument("--dir-cache", default=DIR_CACHE, help="Directorio de la caché Parquet")
+    parser.add_argument("--construir-cache", action="store_true", help="Construye (o reconstruye) la caché Parquet")
+    parser.add_argument("--memoria", action="store_true",
+                        help="Compara la memoria del modo compacto y verifica que los números no cambian")
+    args = parser.parse_args(argv)
+
+    if args.memoria:
+        return _informe_memoria(args)
+
+    if not args.construir_cache:
+        parser.print_help()
+        return 0
+
+    if not parquet_disponible():
+        print("pyarrow no está instalado; no se puede construir la caché.", file=sys.stderr)
+        return 1
+
+    inicio = time.perf_counter()
+    version = version_datos(args.ruta, args.hoja)
+    df = construir_cache(args.ruta, args.hoja, args.dir_cache, version)
+    print(f"Caché {ruta_cache(version, args.dir_cache)}: {len(df):,} filas en {time.perf_counter() - inicio:.2f} s")
+    return 0
+
+
+def _informe_memoria(args):
+    df = cargar_datos_limpios(args.ruta, args.hoja, args.dir_cache)
+    compacto = compactar_tipos(df)
+
+    antes, despues = memoria_df(df), memoria_df(compacto)
+    print(f"{'Columna':<32}{'Antes':>12}{'Después':>12}  Tipo")
+    uso_antes = df.memory_usage(deep=True, index=False)
+    uso_despues = compacto.memory_usage(deep=True, index=False)
+    for col in df.columns:
+        print(f"{col:<32}{uso_antes[col]:>12,}{uso_despues[col]:>12,}  {df[col].dtype} -> {compacto[col].dtype}")
+    print(f"{'Total':<32}{antes:>12,}{despues:>12,}  ({despues / antes:.1%})")
+
+    # Verificar que métricas y gráficos dan los mismos números en todos los filtros
+    anios = (int(df['Year'].min()), int(df['Year'].max()))
+    combinaciones = [(TODOS_PAISES, 2000, 2024, TODOS_DESASTRES), (TODOS_PAISES, *anios, TODOS_DESASTRES)]
+    combinaciones += [(pais, *anios, TODOS_DESASTRES) for pais in sorted(df['Country'].unique())]
+    combinaciones += [(TODOS_PAISES, *anios, tipo) for tipo in sorted(df['Disaster Type'].unique())]
+    distintas = comparar_representaciones(df, compacto, combinaciones)
+    if distintas:
+        print(f"{len(distintas)} combinaciones con números distintos, por ejemplo: {distintas[0]}", file=sys.stderr)
+        return 1
+    print(f"Números idénticos en {len(combinaciones)} combinaciones de filtros.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
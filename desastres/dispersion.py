@@ -0,0 +1,173 @@
+"""Reducción de puntos del gráfico de dispersión (gráfico 6) en el servidor.
+
+Con "Todos los países" y un rango de años amplio el gráfico de dispersión
+enviaba al navegador todas las filas filtradas. :func:`reducir_dispersion`
+limita la cantidad de puntos trabajando en escala logarítmica, que es como se
+distribuyen personas afectadas y daños:
+
+* ``bins``: agrupa los puntos de cada tipo de desastre en una grilla
+  logarítmica y envía un punto por celda (tamaño = suma de eventos).
+* ``muestra``: muestreo aleatorio estratificado por tipo de desastre, con
+  semilla fija para que el gráfico no cambie entre ejecuciones.
+* ``ninguno``: no reduce.
+
+En todos los casos los valores atípicos (fuera de las vallas de Tukey en
+escala logarítmica, en cualquiera de los dos ejes) se conservan tal cual,
+hasta ``DESASTRES_DISPERSION_FRACCION_ATIPICOS`` de los puntos: si hay más se
+conservan los más alejados de las vallas y el resto se reduce con los demás.
+Un eje cuyo rango intercuartílico es 0 no marca atípicos (todo punto fuera
+de la mediana lo sería).
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from desastres.config import entero_env, flotante_env, texto_env
+
+X = 'Total Affected'
+Y = 'Total Damage (USD, original)'
+COLOR = 'Disaster Type'
+TAMANO = 'Total Events'
+HOVER = ['Year', 'Country']
+# Columnas que usa el gráfico
+COLUMNAS = [X, Y, COLOR, TAMANO, *HOVER]
+# Registros que representa cada punto agrupado (solo con ``bins``; vacío en los puntos originales)
+REGISTROS = 'Registros'
+
+METODOS = ('bins', 'muestra', 'ninguno')
+
+# Filas a partir de las cuales se usan trazas WebGL (scattergl)
+UMBRAL_WEBGL = entero_env("DESASTRES_DISPERSION_UMBRAL_WEBGL", 1000)
+# Puntos máximos que se envían al navegador
+MAX_PUNTOS = entero_env("DESASTRES_DISPERSION_MAX_PUNTOS", 1500)
+# Tamaño máximo del JSON de la figura
+MAX_BYTES = entero_env("DESASTRES_DISPERSION_MAX_BYTES", 400_000)
+METODO = texto_env("DESASTRES_DISPERSION_METODO", "bins")
+# Fracción de MAX_PUNTOS que pueden ser atípicos conservados tal cual
+FRACCION_ATIPICOS = flotante_env("DESASTRES_DISPERSION_FRACCION_ATIPICOS", 0.2)
+
+
+@dataclass(frozen=True)
+class InfoDispersion:
+    """Resumen de la reducción aplicada, para mostrarlo debajo del gráfico."""
+
+    filas: int          # filas filtradas
+    puntos: int         # puntos enviados al navegador
+    atipicos: int       # puntos atípicos conservados
+    metodo: str
+    webgl: bool
+    bytes: int = 0      # tamaño del JSON de la figura
+
+
+def _log(valores):
+    # Los ceros no tienen logaritmo; se tratan como 1
+    return np.log10(np.clip(valores, 1, None))
+
+
+def _atipicos(lx, ly, max_atipicos):
+    """Máscara de a lo sumo ``max_atipicos`` puntos fuera de las vallas de Tukey (1.5 × IQR) en algún eje.
+
+    Si hay más, se marcan los más alejados de las vallas (en IQR de su eje).
+    """
+    exceso = np.zeros(len(lx))
+    for valores in (lx, ly):
+        if len(valores) == 0:
+            continue
+        q1, q3 = np.percentile(valores, [25, 75])
+        iqr = q3 - q1
+        if iqr == 0:
+            continue
+        fuera = np.maximum(q1 - 1.5 * iqr - valores, valores - (q3 + 1.5 * iqr)) / iqr
+        exceso = np.maximum(exceso, fuera)
+    mascara = exceso > 0
+    if mascara.sum() > max_atipicos:
+        mascara = np.zeros(len(lx), dtype=bool)
+        mascara[np.argsort(-exceso, kind='stable')[:max_atipicos]] = True
+    return mascara
+
+
+def _agrupar_en_bins(df, lx, ly, max_puntos):
+    """Un punto por celda de una grilla logarítmica, por tipo de desastre."""
+    if len(df) == 0:
+        return pd.DataFrame(columns=[X, Y, COLOR, TAMANO, 'Year', REGISTROS])
+    n_tipos = max(df[COLOR].nunique(), 1)
+    lado = max(int(np.sqrt(max_puntos / n_tipos)), 1)
+
+    def celda(valores):
+        minimo, maximo = valores.min(), valores.max()
+        ancho = (maximo - minimo) / lado or 1.0
+        return np.minimum(((valores - minimo) / ancho).astype(np.int64), lado - 1)
+
+    agrupado = pd.DataFrame({
+        COLOR: np.asarray(df[COLOR], dtype=object),
+        'cx': celda(lx),
+        'cy': celda(ly),
+        'lx': lx,
+        'ly': ly,
+        TAMANO: df[TAMANO].to_numpy(dtype=np.int64),
+        'anio': df['Year'].to_numpy(dtype=np.int64),
+        'n': 1,
+    }).groupby([COLOR, 'cx', 'cy'], sort=False).agg(
+        lx=('lx', 'mean'), ly=('ly', 'mean'), eventos=(TAMANO, 'sum'),
+        anio_min=('anio', 'min'), anio_max=('anio', 'max'), n=('n', 'sum'),
+    ).reset_index()
+
+    anios = agrupado['anio_min'].astype(str)
+    rango = agrupado['anio_min'] != agrupado['anio_max']
+    anios[rango] = anios[rango] + "–" + agrupado.loc[rango, 'anio_max'].astype(str)
+    return pd.DataFrame({
+        X: 10 ** agrupado['lx'],
+        Y: 10 ** agrupado['ly'],
+        COLOR: agrupado[COLOR],
+        TAMANO: agrupado['eventos'],
+        'Year': anios,
+        REGISTROS: agrupado['n'],
+    })
+
+
+def _muestrear(df, max_puntos, semilla=0):
+    """Muestra aleatoria estratificada por tipo de desastre."""
+    fraccion = min(max_puntos / max(len(df), 1), 1.0)
+    return df.groupby(COLOR, group_keys=False, observed=True, sort=False).sample(frac=fraccion, random_state=semilla)
+
+
+def _normalizar(df):
+    """Columnas del gráfico con tipos simples (sin categóricas ni enteros anulables)."""
+    return pd.DataFrame({
+        X: df[X].to_numpy(dtype=np.float64, na_value=np.nan),
+        Y: df[Y].to_numpy(dtype=np.float64, na_value=np.nan),
+        COLOR: np.asarray(df[COLOR], dtype=object),
+        TAMANO: df[TAMANO].to_numpy(dtype=np.int64),
+        'Year': df['Year'].to_numpy(),
+        'Country': np.asarray(df['Country'], dtype=object),
+    })
+
+
+def reducir_dispersion(df_filtrado, max_puntos=MAX_PUNTOS, metodo=METODO):
+    """Devuelve ``(df_reducido, atipicos)`` con cerca de ``max_puntos`` puntos, atípicos incluidos.
+
+    Si el DataFrame ya tiene pocos puntos, o el método es ``ninguno``, se
+    devuelve sin cambios. Con ``bins`` los puntos agrupados no tienen país y
+    la columna ``REGISTROS`` indica cuántas filas representa cada uno.
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método de reducción desconocido: {metodo!r} (opciones: {', '.join(METODOS)})")
+    if metodo == 'ninguno' or len(df_filtrado) <= max_puntos:
+        return df_filtrado, 0
+
+    # Las filas sin valor en algún eje no se dibujan: no se envían
+    df = _normalizar(df_filtrado).dropna(subset=[X, Y])
+    if len(df) <= max_puntos:
+        return df, 0
+
+    lx, ly = _log(df[X].to_numpy()), _log(df[Y].to_numpy())
+    atipico = _atipicos(lx, ly, int(max_puntos * FRACCION_ATIPICOS))
+    normales = ~atipico
+    restantes = max(max_puntos - int(atipico.sum()), 1)
+
+    if metodo == 'bins':
+        reducido = _agrupar_en_bins(df[normales], lx[normales], ly[normales], restantes)
+    else:
+        reducido = _muestrear(df[normales], restantes)
+    return pd.concat([df[atipico], reducido], ignore_index=True), int(atipico.sum())
@@ -0,0 +1,269 @@
+"""Exportación por bloques de las filas filtradas y de las agregaciones.
+
+El dashboard ofrece descargar, para el filtro actual, las filas filtradas,
+el resumen por país (tabla 1) y la serie por año (gráficos 3 y 4), en CSV o
+Parquet. Las filas no se copian enteras antes de escribirlas: el motor las
+entrega en bloques de ``DESASTRES_EXPORTAR_FILAS`` filas (ver
+:meth:`~desastres.motores.MotorConsultas.bloques`) y cada bloque se escribe
+y se descarta antes de pedir el siguiente: una línea de CSV por fila o un
+*row group* de Parquet por bloque.
+
+El dashboard escribe el archivo en un directorio propio dentro de
+``static/exportaciones/`` (``DESASTRES_EXPORTAR_DIR``), con un nombre
+aleatorio, y el navegador lo descarga desde ``app/static/``: Streamlit lo
+envía leyéndolo del disco por partes, sin cargarlo en memoria. Así la memoria
+de una exportación queda acotada por el tamaño del bloque aunque se exporten
+"Todos" los países y años de datos escalados. Streamlit no sirve archivos de
+más de 200 MB (``DESASTRES_EXPORTAR_MAX_BYTES``): una exportación más grande
+se interrumpe con un error. Los archivos se borran a los
+``DESASTRES_EXPORTAR_MINUTOS`` minutos (30 por defecto).
+
+Desde la línea de comandos::
+
+    python -m desastres.exportar --salida filas.parquet
+    python -m desastres.exportar --datos resumen --formato csv --paises Chile Peru --salida resumen.csv
+    python -m desastres.exportar --medir --escala 100
+"""
+import argparse
+import multiprocessing
+import os
+import secrets
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from desastres import motores
+from desastres.cache_resultados import normalizar_filtro
+from desastres.config import entero_env, flotante_env, texto_env
+from desastres.datos import TODOS_DESASTRES
+
+# Filas por bloque: la memoria de una exportación crece con este valor, no con el filtro
+FILAS_POR_BLOQUE = entero_env("DESASTRES_EXPORTAR_FILAS", 50_000)
+# Formato: (tipo MIME, extensión)
+FORMATOS = {'csv': ('text/csv', '.csv'), 'parquet': ('application/vnd.apache.parquet', '.parquet')}
+# Datos que se pueden exportar y su nombre en el dashboard
+DATOS = {'filas': "Filas filtradas", 'resumen': "Resumen por país", 'anual': "Serie por año"}
+# Directorio de las exportaciones del dashboard y su URL (Streamlit sirve static/ en app/static/)
+DIR_EXPORTACIONES = texto_env("DESASTRES_EXPORTAR_DIR", "static/exportaciones")
+URL_EXPORTACIONES = texto_env("DESASTRES_EXPORTAR_URL", "app/static/exportaciones/")
+# Streamlit no sirve archivos estáticos de más de 200 MB
+MAX_BYTES = entero_env("DESASTRES_EXPORTAR_MAX_BYTES", 200 * 2**20)
+MINUTOS_VIGENCIA = flotante_env("DESASTRES_EXPORTAR_MINUTOS", 30.0)
+
+
+def serie_anual(agregados):
+    """Eventos y personas afectadas por año (gráficos 3 y 4) en una sola tabla."""
+    return agregados.eventos_por_anio.merge(agregados.afectados_por_anio, on='Year', how='outer')
+
+
+def _tabla_en_bloques(df, filas_por_bloque):
+    # Vistas de la tabla, sin copiarla
+    for inicio in range(0, max(len(df), 1), filas_por_bloque):
+        yield df.iloc[inicio:inicio + filas_por_bloque]
+
+
+def bloques(motor, filtro, datos, agregados=None, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Bloques (DataFrames) de ``datos`` para ``filtro``.
+
+    Para el resumen y la serie por año se usan ``agregados`` si se pasan (por
+    ejemplo, los de la caché de resultados) o se calculan con el motor.
+    """
+    if datos == 'filas':
+        return motor.bloques(filtro, filas_por_bloque)
+    if datos not in DATOS:
+        raise ValueError(f"Datos desconocidos: {datos!r} (opciones: {', '.join(DATOS)})")
+    agregados = agregados if agregados is not None else motor.agregar(filtro)
+    tabla = agregados.resumen_paises if datos == 'resumen' else serie_anual(agregados)
+    return _tabla_en_bloques(tabla, filas_por_bloque)
+
+
+def escribir(bloques, destino, formato, max_bytes=None):
+    """Escribe ``bloques`` en el archivo binario ``destino``; devuelve las filas escritas.
+
+    Si ``destino`` pasa de ``max_bytes`` se deja de escribir y se lanza ``ValueError``.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato!r} (opciones: {', '.join(FORMATOS)})")
+    filas = 0
+    escritor = None
+    try:
+        for i, bloque in enumerate(bloques):
+            if formato == 'csv':
+                destino.write(bloque.to_csv(index=False, header=i == 0).encode("utf-8"))
+            else:
+                tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(destino, tabla.schema)
+                # Un row group por bloque
+                escritor.write_table(tabla.cast(escritor.schema))
+            filas += len(bloque)
+            if max_bytes is not None and destino.tell() > max_bytes:
+                raise ValueError(f"La exportación supera {max_bytes / 2**20:,.0f} MB después de {filas:,} filas; "
+                                 f"reduzca el filtro o use python -m desastres.exportar")
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return filas
+
+
+def exportar(motor, filtro, datos, formato, agregados=None, filas_por_bloque=FILAS_POR_BLOQUE,
+             directorio=DIR_EXPORTACIONES, max_bytes=MAX_BYTES):
+    """Escribe la exportación en un subdirectorio nuevo de ``directorio``; devuelve la ruta del archivo.
+
+    Antes se borran las exportaciones vencidas (ver :func:`limpiar_vencidas`).
+    """
+    limpiar_vencidas(directorio)
+    ruta = os.path.join(directorio, secrets.token_urlsafe(16), nombre_archivo(datos, filtro, formato))
+    os.makedirs(os.path.dirname(ruta))
+    try:
+        with open(ruta, "wb") as destino:
+            escribir(bloques(motor, filtro, datos, agregados, filas_por_bloque), destino, formato, max_bytes)
+    except BaseException:
+        eliminar(ruta)
+        raise
+    return ruta
+
+
+def url_descarga(ruta, directorio=DIR_EXPORTACIONES, url=URL_EXPORTACIONES):
+    """URL (relativa a la página) de una exportación escrita por :func:`exportar`."""
+    return url + os.path.relpath(ruta, directorio).replace(os.sep, "/")
+
+
+def eliminar(ruta):
+    """Borra una exportación (su subdirectorio completo)."""
+    shutil.rmtree(os.path.dirname(ruta), ignore_errors=True)
+
+
+def limpiar_vencidas(directorio=DIR_EXPORTACIONES, minutos=MINUTOS_VIGENCIA):
+    """Borra las exportaciones de ``directorio`` escritas hace más de ``minutos``."""
+    if not os.path.isdir(directorio):
+        return
+    limite = time.time() - minutos * 60
+    for entrada in os.scandir(directorio):
+        if entrada.is_dir() and entrada.stat().st_mtime < limite:
+            shutil.rmtree(entrada.path, ignore_errors=True)
+
+
+def nombre_archivo(datos, filtro, formato):
+    """Nombre sugerido para la descarga, con el rango de años."""
+    return f"desastres_{datos}_{filtro.anio_inicio}-{filtro.anio_fin}{FORMATOS[formato][1]}"
+
+
+# ----------------------------------------------------------------
+# MEDICIÓN DE MEMORIA
+# ----------------------------------------------------------------
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _pico_memoria(funcion):
+    """``(resultado, MB)``: lo que más creció la memoria residente mientras corría ``funcion``."""
+    inicial = pico = _rss_mb()
+    terminado = threading.Event()
+
+    def muestrear():
+        nonlocal pico
+        while not terminado.wait(0.002):
+            pico = max(pico, _rss_mb())
+
+    hilo = threading.Thread(target=muestrear, daemon=True)
+    hilo.start()
+    try:
+        resultado = funcion()
+    finally:
+        terminado.set()
+        hilo.join()
+    return resultado, max(pico, _rss_mb()) - inicial
+
+
+def _trabajador(modo, formato, ruta_datos, filas_por_bloque, cola):
+    import pandas as pd
+
+    # Cada medición en su propio proceso: la memoria liberada por otra no enmascara el pico
+    motor = motores.MotorPandas(pd.read_parquet(ruta_datos))
+    filtro = normalizar_filtro([], motor.anio_min, motor.anio_max, [], motor.anio_min, motor.anio_max)
+    # Lo que Arrow retuvo al leer los datos ocultaría la memoria nueva
+    pa.default_memory_pool().release_unused()
+    inicio = time.perf_counter()
+    with tempfile.TemporaryFile() as destino:
+        if modo == 'bloques':
+            _, pico = _pico_memoria(lambda: escribir(motor.bloques(filtro, filas_por_bloque), destino, formato))
+        else:
+            filas = motor.filas(filtro)
+            escribir_todo = (lambda: destino.write(filas.to_csv(index=False).encode("utf-8"))) if formato == 'csv' \
+                else (lambda: filas.to_parquet(destino, index=False))
+            _, pico = _pico_memoria(escribir_todo)
+        tam = destino.seek(0, os.SEEK_END)
+    cola.put({'modo': modo, 'formato': formato, 'filas': motor.filas_totales, 'pico': pico,
+              'mb_archivo': tam / 2**20, 'segundos': time.perf_counter() - inicio})
+
+
+def medir(escala, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Memoria que agrega exportar "Todos" (datos ×``escala``) por bloques y de una vez, en cada formato."""
+    from desastres.pipeline import cargar
+    from desastres.rendimiento import escalar_datos
+
+    contexto = multiprocessing.get_context("spawn")
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_datos = os.path.join(directorio, "datos.parquet")
+        escalar_datos(cargar(), escala).to_parquet(ruta_datos, index=False)
+        for formato in FORMATOS:
+            for modo in ('bloques', 'completo'):
+                cola = contexto.Queue()
+                hijo = contexto.Process(target=_trabajador, args=(modo, formato, ruta_datos, filas_por_bloque, cola))
+                hijo.start()
+                resultados.append(cola.get())
+                hijo.join()
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta por bloques las filas filtradas o sus agregaciones.")
+    parser.add_argument("--datos", choices=list(DATOS), default='filas')
+    parser.add_argument("--formato", choices=list(FORMATOS), help="Por defecto, según la extensión de --salida")
+    parser.add_argument("--salida", help="Archivo de salida")
+    parser.add_argument("--paises", nargs="+", default=[], help="Países (por defecto, todos)")
+    parser.add_argument("--anio-inicio", type=int)
+    parser.add_argument("--anio-fin", type=int)
+    parser.add_argument("--tipo", nargs="+", default=[], help=f"Tipos de desastre (por defecto, {TODOS_DESASTRES})")
+    parser.add_argument("--subgrupo", nargs="+")
+    parser.add_argument("--motor", choices=motores.MOTORES, default=motores.MOTOR)
+    parser.add_argument("--publicacion", help="Publicación del almacén (por defecto, el Excel)")
+    parser.add_argument("--filas-por-bloque", type=int, default=FILAS_POR_BLOQUE)
+    parser.add_argument("--medir", action="store_true",
+                        help="compara la memoria de exportar todo por bloques y de una vez")
+    parser.add_argument("--escala", type=int, default=100, help="factor de filas sobre los datos reales (--medir)")
+    args = parser.parse_args(argv)
+
+    if args.medir:
+        print(f"Exportación de todas las filas (datos ×{args.escala}, bloques de {args.filas_por_bloque:,} filas)")
+        print(f"{'formato':<10}{'modo':<10}{'filas':>12}{'memoria MB':>12}{'archivo MB':>12}{'s':>8}")
+        for r in medir(args.escala, args.filas_por_bloque):
+            print(f"{r['formato']:<10}{r['modo']:<10}{r['filas']:>12,}{r['pico']:>12.1f}{r['mb_archivo']:>12.1f}"
+                  f"{r['segundos']:>8.1f}")
+        return 0
+    if not args.salida:
+        parser.error("falta --salida (o --medir)")
+
+    formato = args.formato or os.path.splitext(args.salida)[1].lstrip(".").lower()
+    if formato not in FORMATOS:
+        parser.error(f"no se reconoce el formato de {args.salida}; use --formato")
+    motor = motores.crear_motor(args.motor, publicacion=args.publicacion)
+    filtro = normalizar_filtro(args.paises, args.anio_inicio or motor.anio_min, args.anio_fin or motor.anio_max,
+                               args.tipo, motor.anio_min, motor.anio_max, args.subgrupo)
+    inicio = time.perf_counter()
+    with open(args.salida, "wb") as destino:
+        filas = escribir(bloques(motor, filtro, args.datos, filas_por_bloque=args.filas_por_bloque), destino, formato)
+    print(f"{filas:,} filas en {args.salida} en {time.perf_counter() - inicio:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
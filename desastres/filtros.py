@@ -0,0 +1,340 @@
+"""Filtrado de los datos por país, rango de años, tipo y subgrupo de desastre.
+
+País, tipo y subgrupo admiten selección múltiple: un valor, una colección de
+valores o "Todos" (ver :func:`desastres.datos.como_seleccion`).
+
+:func:`filtrar_df` es la implementación de referencia: copia el DataFrame y
+aplica hasta cuatro máscaras booleanas (``isin``) sobre todas las filas.
+:class:`IndiceFiltros` da el mismo resultado sin recorrer el DataFrame
+completo: ordena una sola vez las filas por (País, Tipo de desastre, Año) y
+resuelve los filtros de un solo valor con búsquedas binarias sobre ese orden
+(cuando la selección es un tramo contiguo se devuelve una vista sin copiar
+datos). En las selecciones múltiples, país y años se resuelven también con
+tramos de ese orden, y tipo y subgrupo con mapas de bits por valor,
+construidos al crear el índice: OR entre los valores de una dimensión y AND
+entre dimensiones, sin volver a comparar columnas de texto.
+
+Comparación de latencia en todas las combinaciones país × tipo y en
+selecciones múltiples aleatorias::
+
+    python -m desastres.filtros --benchmark
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from desastres.datos import (
+    TODOS_DESASTRES, TODOS_PAISES, TODOS_SUBGRUPOS, cargar_datos_limpios, compactar_tipos, como_seleccion,
+)
+
+
+def filtrar_df(df, pais, anio_inicio, anio_fin, tipo_desastre, subgrupo=None):
+    """Filtra el DataFrame con máscaras booleanas (implementación de referencia)."""
+    paises = como_seleccion(pais, TODOS_PAISES)
+    tipos = como_seleccion(tipo_desastre, TODOS_DESASTRES)
+    subgrupos = como_seleccion(subgrupo, TODOS_SUBGRUPOS)
+
+    df_filtrado = df.copy()
+    if paises:
+        df_filtrado = df_filtrado[df_filtrado['Country'].isin(paises)]
+    df_filtrado = df_filtrado[(df_filtrado['Year'] >= anio_inicio) & (df_filtrado['Year'] <= anio_fin)]
+    if tipos:
+        df_filtrado = df_filtrado[df_filtrado['Disaster Type'].isin(tipos)]
+    if subgrupos:
+        df_filtrado = df_filtrado[df_filtrado['Disaster Subgroup'].isin(subgrupos)]
+    return df_filtrado
+
+
+def _mapas_de_bits(codigos, n):
+    """Un mapa de bits empaquetado por código ``0..n-1`` (fila ``i`` = bit ``i``)."""
+    mapas = np.zeros((n, (len(codigos) + 7) // 8), dtype=np.uint8)
+    for codigo in range(n):
+        mapas[codigo] = np.packbits(codigos == codigo)
+    return mapas
+
+
+class IndiceFiltros:
+    """Índice ordenado por (País, Tipo de desastre, Año) para filtrar sin máscaras.
+
+    Cada fila recibe una clave entera ``grupo * años + año``, donde ``grupo``
+    identifica el par (país, tipo). Como las filas están ordenadas por esa
+    clave, las filas de un grupo dentro de un rango de años forman un tramo
+    contiguo que se localiza con ``np.searchsorted``.
+
+    Para la selección múltiple se guarda un mapa de bits por tipo y por
+    subgrupo (en el orden original de las filas); los países y los años salen
+    de los tramos.
+    """
+
+    def __init__(self, df):
+        self._asignar(df, self.calcular_estado(df))
+
+    @staticmethod
+    def calcular_estado(df):
+        """Arreglos y listas del índice (ver :meth:`desde_estado`)."""
+        cod_pais, paises = pd.factorize(df['Country'], sort=True)
+        cod_tipo, tipos = pd.factorize(df['Disaster Type'], sort=True)
+        anios = df['Year'].to_numpy(dtype=np.int64)
+        anio_min = int(anios.min()) if len(anios) else 0
+        anio_max = int(anios.max()) if len(anios) else -1
+        span = anio_max - anio_min + 1
+
+        # Orden estable: dentro de cada (país, tipo, año) se conserva el orden original
+        orden = np.lexsort((anios, cod_tipo, cod_pais))
+        grupo = cod_pais.astype(np.int64) * len(tipos) + cod_tipo
+
+        if 'Disaster Subgroup' in df.columns:
+            cod_subgrupo, subgrupos = pd.factorize(df['Disaster Subgroup'], sort=True)
+        else:
+            cod_subgrupo, subgrupos = np.full(len(df), -1), []
+        return {
+            'paises': list(paises),
+            'tipos': list(tipos),
+            'subgrupos': list(subgrupos),
+            'anio_min': anio_min,
+            'anio_max': anio_max,
+            'orden': orden,
+            'clave': (grupo * span + anios - anio_min)[orden],
+            # Posiciones donde el orden ordenado deja de seguir el orden original;
+            # un tramo sin rupturas se puede devolver como vista con el orden original
+            'rupturas': np.flatnonzero(np.diff(orden) < 0),
+            # Mapas de bits para la selección múltiple
+            'bits_tipo': _mapas_de_bits(cod_tipo, len(tipos)),
+            'bits_subgrupo': _mapas_de_bits(cod_subgrupo, len(subgrupos)),
+        }
+
+    @classmethod
+    def desde_estado(cls, df, estado, ordenado=None):
+        """Índice a partir de un estado ya calculado, sin recorrer los datos.
+
+        Los arreglos se usan tal cual (pueden ser de solo lectura, por ejemplo
+        mapeados desde disco). ``ordenado`` es ``df`` en el orden del índice;
+        si no se pasa se materializa.
+        """
+        indice = cls.__new__(cls)
+        indice._asignar(df, estado, ordenado)
+        return indice
+
+    def _asignar(self, df, estado, ordenado=None):
+        self.df = df
+        self.paises = list(estado['paises'])
+        self.tipos = list(estado['tipos'])
+        self.subgrupos = list(estado['subgrupos'])
+        self._pos_pais = {pais: i for i, pais in enumerate(self.paises)}
+        self._pos_tipo = {tipo: i for i, tipo in enumerate(self.tipos)}
+        self._pos_subgrupo = {subgrupo: i for i, subgrupo in enumerate(self.subgrupos)}
+        self.anio_min = int(estado['anio_min'])
+        self.anio_max = int(estado['anio_max'])
+        self._span = self.anio_max - self.anio_min + 1
+
+        self._orden = estado['orden']
+        self._clave = estado['clave']
+        self._rupturas = estado['rupturas']
+        self._bits_tipo = estado['bits_tipo']
+        self._bits_subgrupo = estado['bits_subgrupo']
+        self.ordenado = df.take(self._orden) if ordenado is None else ordenado
+
+    def estado(self):
+        """Estado del índice, para reconstruirlo con :meth:`desde_estado`."""
+        return {
+            'paises': self.paises, 'tipos': self.tipos, 'subgrupos': self.subgrupos,
+            'anio_min': self.anio_min, 'anio_max': self.anio_max,
+            'orden': self._orden, 'clave': self._clave, 'rupturas': self._rupturas,
+            'bits_tipo': self._bits_tipo, 'bits_subgrupo': self._bits_subgrupo,
+        }
+
+    def nbytes_mapas(self):
+        """Memoria ocupada por los mapas de bits."""
+        return self._bits_tipo.nbytes + self._bits_subgrupo.nbytes
+
+    # ------------------------------------------------------------
+    @staticmethod
+    def _codigos(seleccion, posiciones, total):
+        """Códigos de los valores seleccionados (todos si la selección está vacía)."""
+        if not seleccion:
+            return np.arange(total)
+        return np.array(sorted(posiciones[v] for v in seleccion if v in posiciones), dtype=np.int64)
+
+    def _grupos(self, pais, tipo_desastre):
+        """Identificadores de grupo (país, tipo) que cubre el filtro, en orden."""
+        cod_paises = self._codigos(como_seleccion(pais, TODOS_PAISES), self._pos_pais, len(self.paises))
+        cod_tipos = self._codigos(como_seleccion(tipo_desastre, TODOS_DESASTRES), self._pos_tipo, len(self.tipos))
+        return (cod_paises[:, None] * len(self.tipos) + cod_tipos[None, :]).ravel().astype(np.int64)
+
+    def tramos(self, pais, anio_inicio, anio_fin, tipo_desastre):
+        """Tramos ``(inicio, fin)`` del orden interno que cumplen el filtro.
+
+        Los tramos adyacentes se fusionan, de modo que un país con todos los
+        tipos y todos los años, o el filtro completo, devuelve un solo tramo.
+        """
+        desde = max(int(anio_inicio), self.anio_min) - self.anio_min
+        hasta = min(int(anio_fin), self.anio_max) - self.anio_min
+        grupos = self._grupos(pais, tipo_desastre)
+        if desde > hasta or len(grupos) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+
+        base = grupos * self._span
+        inicios = np.searchsorted(self._clave, base + desde, side='left')
+        fines = np.searchsorted(self._clave, base + hasta, side='right')
+        no_vacios = fines > inicios
+        inicios, fines = inicios[no_vacios], fines[no_vacios]
+        if len(inicios) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+
+        # Fusionar tramos contiguos
+        corte = np.flatnonzero(inicios[1:] != fines[:-1]) + 1
+        inicios = inicios[np.r_[0, corte]]
+        fines = fines[np.r_[corte - 1, len(fines) - 1]]
+        return np.column_stack([inicios, fines])
+
+    def _conserva_orden(self, inicio, fin):
+        """Indica si el tramo ``[inicio, fin)`` está en el mismo orden que el original."""
+        i = np.searchsorted(self._rupturas, inicio, side='left')
+        return i == len(self._rupturas) or self._rupturas[i] >= fin - 1
+
+    def _posiciones_ordenadas(self, tramos):
+        """Posiciones del orden interno que cubren ``tramos``, sin bucles de Python."""
+        largos = tramos[:, 1] - tramos[:, 0]
+        desplazamiento = np.repeat(tramos[:, 0] - np.r_[0, np.cumsum(largos)[:-1]], largos)
+        return np.arange(largos.sum()) + desplazamiento
+
+    @staticmethod
+    def _usa_mapas(pais, tipo_desastre, subgrupo):
+        """Las selecciones múltiples y los subgrupos usan los mapas de bits de tipo y subgrupo."""
+        return (len(como_seleccion(pais, TODOS_PAISES)) > 1 or len(como_seleccion(tipo_desastre, TODOS_DESASTRES)) > 1
+                or bool(como_seleccion(subgrupo, TODOS_SUBGRUPOS)))
+
+    def mapa_de_bits(self, pais, anio_inicio, anio_fin, tipo_desastre, subgrupo=None):
+        """Mapa de bits empaquetado (bit ``i`` = fila ``i`` del original) de las filas del filtro."""
+        # País y años: tramos del orden interno (todos los tipos de cada país)
+        en_tramos = np.zeros(len(self.df), dtype=bool)
+        tramos = self.tramos(pais, anio_inicio, anio_fin, TODOS_DESASTRES)
+        if len(tramos):
+            en_tramos[self._orden[self._posiciones_ordenadas(tramos)]] = True
+        bits = np.packbits(en_tramos)
+
+        # Tipo y subgrupo: OR dentro de cada dimensión, AND entre dimensiones
+        for seleccion, posiciones, mapas in (
+            (como_seleccion(tipo_desastre, TODOS_DESASTRES), self._pos_tipo, self._bits_tipo),
+            (como_seleccion(subgrupo, TODOS_SUBGRUPOS), self._pos_subgrupo, self._bits_subgrupo),
+        ):
+            if seleccion:
+                codigos = self._codigos(seleccion, posiciones, len(mapas))
+                bits &= np.bitwise_or.reduce(mapas[codigos], axis=0) if len(codigos) else 0
+        return bits
+
+    def posiciones(self, pais, anio_inicio, anio_fin, tipo_desastre, subgrupo=None):
+        """Posiciones (en el DataFrame original y en orden creciente) que cumplen el filtro."""
+        if self._usa_mapas(pais, tipo_desastre, subgrupo):
+            bits = self.mapa_de_bits(pais, anio_inicio, anio_fin, tipo_desastre, subgrupo)
+            return np.flatnonzero(np.unpackbits(bits, count=len(self.df)))
+        tramos = self.tramos(pais, anio_inicio, anio_fin, tipo_desastre)
+        if len(tramos) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(self._orden[self._posiciones_ordenadas(tramos)])
+
+    def filtrar(self, pais, anio_inicio, anio_fin, tipo_desastre, subgrupo=None):
+        """Misma firma y semántica que :func:`filtrar_df`.
+
+        Si la selección es todo el DataFrame se devuelve tal cual; si es un tramo
+        contiguo en el orden original se devuelve una vista; en otro caso se
+        materializan solo las filas seleccionadas.
+        """
+        if self._usa_mapas(pais, tipo_desastre, subgrupo):
+            return self.df.take(self.posiciones(pais, anio_inicio, anio_fin, tipo_desastre, subgrupo))
+        tramos = self.tramos(pais, anio_inicio, anio_fin, tipo_desastre)
+        if len(tramos) == 0:
+            return self.df.iloc[0:0]
+        if len(tramos) == 1:
+            inicio, fin = (int(x) for x in tramos[0])
+            if fin - inicio == len(self.df):
+                return self.df
+            if self._conserva_orden(inicio, fin):
+                return self.ordenado.iloc[inicio:fin]
+        return self.df.take(self.posiciones(pais, anio_inicio, anio_fin, tipo_desastre))
+
+
+# ----------------------------------------------------------------
+# LÍNEA DE COMANDOS
+# ----------------------------------------------------------------
+def _medir(funcion, combinaciones, repeticiones):
+    tiempos = []
+    for combinacion in combinaciones:
+        mejor = float('inf')
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion(*combinacion)
+            mejor = min(mejor, time.perf_counter() - inicio)
+        tiempos.append(mejor)
+    return np.array(tiempos) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Filtrado del dashboard de desastres.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Mide la latencia de ambos filtros en todas las combinaciones país × tipo")
+    parser.add_argument("--anio-inicio", type=int, default=2000)
+    parser.add_argument("--anio-fin", type=int, default=2024)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--multiples", type=int, default=200, help="Selecciones múltiples aleatorias a medir")
+    args = parser.parse_args(argv)
+
+    if not args.benchmark:
+        parser.print_help()
+        return 0
+
+    df = compactar_tipos(cargar_datos_limpios())
+    inicio = time.perf_counter()
+    indice = IndiceFiltros(df)
+    print(f"Índice construido en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    paises = [TODOS_PAISES] + indice.paises
+    tipos = [TODOS_DESASTRES] + indice.tipos
+    combinaciones = [(pais, args.anio_inicio, args.anio_fin, tipo) for pais in paises for tipo in tipos]
+
+    # Verificar que ambos caminos devuelven exactamente las mismas filas
+    for combinacion in combinaciones:
+        pd.testing.assert_frame_equal(filtrar_df(df, *combinacion), indice.filtrar(*combinacion))
+
+    print(f"{len(combinaciones)} combinaciones país × tipo, años {args.anio_inicio}-{args.anio_fin}")
+    _comparar(df, indice, combinaciones, args.repeticiones)
+
+    # Selecciones múltiples: regiones de países, grupos de tipos y subgrupos
+    multiples = selecciones_multiples(indice, args.anio_inicio, args.anio_fin, args.multiples)
+    for combinacion in multiples:
+        pd.testing.assert_frame_equal(filtrar_df(df, *combinacion), indice.filtrar(*combinacion))
+    print(f"\n{len(multiples)} selecciones múltiples aleatorias "
+          f"(mapas de bits: {indice.nbytes_mapas():,} bytes)")
+    _comparar(df, indice, multiples, args.repeticiones)
+    return 0
+
+
+def selecciones_multiples(indice, anio_inicio, anio_fin, cantidad, semilla=0):
+    """Combinaciones aleatorias de 2 a 40 países, 1 a 4 tipos y, a veces, subgrupos."""
+    rng = np.random.default_rng(semilla)
+    combinaciones = []
+    for _ in range(cantidad):
+        paises = list(rng.choice(indice.paises, size=rng.integers(2, 41), replace=False))
+        tipos = list(rng.choice(indice.tipos, size=rng.integers(1, 5), replace=False)) if rng.random() < 0.5 else []
+        subgrupos = []
+        if indice.subgrupos and rng.random() < 0.5:
+            subgrupos = list(rng.choice(indice.subgrupos, size=rng.integers(1, len(indice.subgrupos) + 1), replace=False))
+        combinaciones.append((paises, anio_inicio, anio_fin, tipos or TODOS_DESASTRES, subgrupos or None))
+    return combinaciones
+
+
+def _comparar(df, indice, combinaciones, repeticiones):
+    referencia = _medir(lambda *c: filtrar_df(df, *c), combinaciones, repeticiones)
+    con_indice = _medir(indice.filtrar, combinaciones, repeticiones)
+    print(f"{'':<14}{'media µs':>12}{'p50 µs':>12}{'p99 µs':>12}{'total ms':>12}")
+    for nombre, tiempos in (("filtrar_df", referencia), ("IndiceFiltros", con_indice)):
+        print(f"{nombre:<14}{tiempos.mean():>12.1f}{np.percentile(tiempos, 50):>12.1f}"
+              f"{np.percentile(tiempos, 99):>12.1f}{tiempos.sum() / 1000:>12.1f}")
+    print(f"Aceleración media: {referencia.mean() / con_indice.mean():.1f}×")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+"""Geometría de los países para el mapa, sin depender de la red.
+
+Con ``locations='ISO'`` Plotly dibuja el mapa con la geometría mundial que el
+navegador descarga de cdn.plot.ly, y si la red lo bloquea el mapa no carga.
+Este módulo guarda la geometría de los países en ``data/geometria/``
+(``DESASTRES_GEOMETRIA``) como GeoJSON con el código ISO-3 de cada país como
+``id``, en varios niveles de simplificación:
+
+* ``baja``: para el mundo completo,
+* ``media``: para regiones (la vista abarca menos de 60 grados),
+* ``alta``: para uno o pocos países cercanos (menos de 15 grados).
+
+plotly.js pide el TopoJSON mundial (``world_110m.json``) para cualquier mapa
+con ``locations``. Por eso también se escribe ese archivo, con los mismos
+países, en ``static/topojson/`` (``DESASTRES_TOPOJSON``). Streamlit lo sirve en
+``app/static/topojson/`` y el dashboard lo indica con la opción
+``topojsonURL``: el navegador lo descarga una vez y lo guarda en su caché. Los
+reportes HTML lo incluyen con :func:`script_topojson`.
+
+La vista del mundo completo se dibuja solo con ese TopoJSON: la figura no
+lleva geometría. Cuando el filtro abarca una región o pocos países, el mapa se
+acerca y la figura lleva la geometría de los países con datos, en el nivel que
+corresponde a su extensión; el resto de la vista sale de las capas base del
+TopoJSON. Los archivos se leen una sola vez por proceso.
+
+Los archivos incluidos en el repositorio salen de Natural Earth 1:110m
+("Admin 0 – Countries", dominio público), los mismos países que usa el mapa
+de Plotly. Se pueden regenerar, por ejemplo con más detalle a partir de la
+escala 1:50m o 1:10m (https://www.naturalearthdata.com)::
+
+    python -m desastres.geometria --construir ne_50m_admin_0_countries.geojson
+
+Si no están, el mapa usa la geometría de Plotly como antes.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from desastres.config import texto_env
+
+logger = logging.getLogger("desastres.geometria")
+
+DIR_GEOMETRIA = texto_env("DESASTRES_GEOMETRIA", "data/geometria")
+# Nivel: (tolerancia de Douglas-Peucker en grados, decimales de las coordenadas)
+NIVELES = {'baja': (0.2, 1), 'media': (0.04, 2), 'alta': (0.008, 3)}
+# Nivel según el lado mayor de la vista, en grados (de la vista más chica a la más grande)
+EXTENSION_NIVEL = (('alta', 15), ('media', 60), ('baja', 360))
+# Por debajo de esta extensión el mapa se acerca a los países; por encima se ve el mundo completo
+EXTENSION_ACERCAR = 120
+# TopoJSON que plotly.js pide para un mapa mundial (alcance "world", resolución 110) y desde dónde
+NOMBRE_TOPOJSON = "world_110m"
+DIR_TOPOJSON = texto_env("DESASTRES_TOPOJSON", "static/topojson")
+URL_TOPOJSON = texto_env("DESASTRES_TOPOJSON_URL", "app/static/topojson/")
+# Propiedades de Natural Earth con el código ISO-3, en orden de preferencia ("-99" significa sin código)
+CAMPOS_ISO = ('ISO_A3', 'ISO_A3_EH', 'ADM0_A3')
+
+
+def ruta_nivel(nivel, dir_geometria=DIR_GEOMETRIA):
+    return os.path.join(dir_geometria, f"paises_{nivel}.geojson")
+
+
+# ----------------------------------------------------------------
+# 1) SIMPLIFICACIÓN
+# ----------------------------------------------------------------
+def douglas_peucker(puntos, tolerancia):
+    """Máscara de los vértices de ``puntos`` (n×2) que se conservan con ``tolerancia``."""
+    n = len(puntos)
+    conservar = np.zeros(n, dtype=bool)
+    conservar[0] = conservar[-1] = True
+    pendientes = [(0, n - 1)]
+    while pendientes:
+        inicio, fin = pendientes.pop()
+        if fin - inicio < 2:
+            continue
+        a, b = puntos[inicio], puntos[fin]
+        tramo = puntos[inicio + 1:fin]
+        ab = b - a
+        largo = np.hypot(*ab)
+        if largo == 0:
+            distancias = np.hypot(*(tramo - a).T)
+        else:
+            distancias = np.abs(ab[0] * (tramo[:, 1] - a[1]) - ab[1] * (tramo[:, 0] - a[0])) / largo
+        mayor = int(np.argmax(distancias))
+        if distancias[mayor] > tolerancia:
+            medio = inicio + 1 + mayor
+            conservar[medio] = True
+            pendientes += [(inicio, medio), (medio, fin)]
+    return conservar
+
+
+def _simplificar_anillo(anillo, tolerancia, decimales):
+    puntos = np.asarray(anillo, dtype=np.float64)[:, :2]
+    if len(puntos) > 4:
+        # Un anillo cerrado empieza y termina en el mismo punto: se parte en el vértice más lejano
+        lejano = int(np.argmax(np.hypot(*(puntos - puntos[0]).T)))
+        mascara = np.concatenate([douglas_peucker(puntos[:lejano + 1], tolerancia)[:-1],
+                                  douglas_peucker(puntos[lejano:], tolerancia)])
+        puntos = puntos[mascara]
+    puntos = np.round(puntos, decimales)
+    # Sin vértices repetidos seguidos (aparecen al redondear)
+    puntos = puntos[np.r_[True, np.any(np.diff(puntos, axis=0) != 0, axis=1)]]
+    return puntos.tolist() if len(puntos) >= 4 else None
+
+
+def _simplificar_poligono(poligono, tolerancia, decimales):
+    exterior = _simplificar_anillo(poligono[0], tolerancia, decimales)
+    if exterior is None:
+        return None
+    huecos = [h for h in (_simplificar_anillo(anillo, tolerancia, decimales) for anillo in poligono[1:]) if h]
+    return [exterior, *huecos]
+
+
+def simplificar_geometria(geometria, tolerancia, decimales):
+    """Polygon o MultiPolygon simplificado; las islas que desaparecen se descartan.
+
+    Si desaparecerían todas, se conserva la mayor con menos simplificación.
+    """
+    poligonos = [geometria['coordinates']] if geometria['type'] == 'Polygon' else geometria['coordinates']
+    while True:
+        simplificados = [p for p in (_simplificar_poligono(p, tolerancia, decimales) for p in poligonos) if p]
+        if simplificados or tolerancia < 1e-6:
+            break
+        poligonos = [max(poligonos, key=lambda p: len(p[0]))]
+        tolerancia /= 4
+    if len(simplificados) == 1:
+        return {'type': 'Polygon', 'coordinates': simplificados[0]}
+    return {'type': 'MultiPolygon', 'coordinates': simplificados}
+
+
+def _caja(geometria):
+    poligonos = [geometria['coordinates']] if geometria['type'] == 'Polygon' else geometria['coordinates']
+    puntos = np.concatenate([np.asarray(p[0])[:, :2] for p in poligonos])
+    return [*puntos.min(axis=0).round(3).tolist(), *puntos.max(axis=0).round(3).tolist()]
+
+
+def iso_de(propiedades, campos=CAMPOS_ISO):
+    for campo in campos:
+        valor = propiedades.get(campo)
+        if valor and valor != "-99":
+            return valor
+    return None
+
+
+def topologia(features):
+    """TopoJSON de los países ``features`` (sin cuantizar ni arcos compartidos).
+
+    Tiene los objetos que usa plotly.js: ``countries`` (con el ISO-3 como
+    ``id``), ``land`` y ``coastlines`` con esos países, y el resto vacíos.
+    """
+    arcos = []
+
+    def anillo(coordenadas):
+        arcos.append(coordenadas)
+        return [len(arcos) - 1]
+
+    paises = []
+    for feature in features:
+        geometria = feature['geometry']
+        poligonos = [geometria['coordinates']] if geometria['type'] == 'Polygon' else geometria['coordinates']
+        paises.append({'type': 'MultiPolygon', 'id': feature['id'],
+                       'arcs': [[anillo(a) for a in poligono] for poligono in poligonos]})
+    vacio = {'type': 'GeometryCollection', 'geometries': []}
+    return {
+        'type': 'Topology',
+        'arcs': arcos,
+        'objects': {
+            'countries': {'type': 'GeometryCollection', 'geometries': paises},
+            'land': {'type': 'GeometryCollection', 'geometries': [{k: v for k, v in p.items() if k != 'id'}
+                                                                   for p in paises]},
+            'coastlines': {'type': 'MultiLineString', 'arcs': [[i] for i in range(len(arcos))]},
+            'ocean': vacio, 'lakes': vacio, 'rivers': vacio, 'subunits': vacio,
+        },
+    }
+
+
+def ruta_topojson(dir_topojson=DIR_TOPOJSON):
+    return os.path.join(dir_topojson, f"{NOMBRE_TOPOJSON}.json")
+
+
+def _escribir_json(destino, contenido):
+    with open(f"{destino}.tmp", "w", encoding="utf-8") as f:
+        json.dump(contenido, f, separators=(',', ':'))
+    os.replace(f"{destino}.tmp", destino)
+
+
+def construir(ruta_fuente, dir_geometria=DIR_GEOMETRIA, campos=CAMPOS_ISO, dir_topojson=DIR_TOPOJSON):
+    """Escribe un GeoJSON por nivel a partir de un GeoJSON de países, y el TopoJSON para plotly.js.
+
+    Devuelve ``{nivel o nombre del TopoJSON: bytes}``.
+    """
+    with open(ruta_fuente, encoding="utf-8") as f:
+        fuente = json.load(f)
+    paises = {}
+    for feature in fuente['features']:
+        iso = iso_de(feature.get('properties') or {}, campos)
+        geometria = feature.get('geometry')
+        if iso and geometria and geometria['type'] in ('Polygon', 'MultiPolygon'):
+            paises.setdefault(iso, geometria)
+
+    os.makedirs(dir_geometria, exist_ok=True)
+    tamanos = {}
+    for nivel, (tolerancia, decimales) in NIVELES.items():
+        features = []
+        for iso, geometria in sorted(paises.items()):
+            simplificada = simplificar_geometria(geometria, tolerancia, decimales)
+            features.append({'type': 'Feature', 'id': iso, 'bbox': _caja(simplificada),
+                             'properties': {}, 'geometry': simplificada})
+        destino = ruta_nivel(nivel, dir_geometria)
+        _escribir_json(destino, {'type': 'FeatureCollection', 'features': features})
+        tamanos[nivel] = os.path.getsize(destino)
+        if nivel == 'baja':
+            # Capas base de plotly.js (tierra, costas y fronteras), servidas sin pedirlas a la red
+            os.makedirs(dir_topojson, exist_ok=True)
+            _escribir_json(ruta_topojson(dir_topojson), topologia(features))
+            tamanos[NOMBRE_TOPOJSON] = os.path.getsize(ruta_topojson(dir_topojson))
+    return tamanos
+
+
+# ----------------------------------------------------------------
+# 2) GEOMETRÍA DE CADA MAPA
+# ----------------------------------------------------------------
+@lru_cache(maxsize=None)
+def cargar(nivel, dir_geometria=DIR_GEOMETRIA):
+    """``{iso: feature}`` de un nivel (se lee una vez por proceso), o ``None`` si no está."""
+    try:
+        with open(ruta_nivel(nivel, dir_geometria), encoding="utf-8") as f:
+            return {feature['id']: feature for feature in json.load(f)['features']}
+    except FileNotFoundError:
+        logger.warning("No hay geometría de países en %s; el mapa usará la de Plotly (requiere red)",
+                       dir_geometria)
+        return None
+
+
+@lru_cache(maxsize=None)
+def script_topojson(dir_topojson=DIR_TOPOJSON):
+    """JavaScript que registra el TopoJSON en ``window.PlotlyGeoAssets`` (para HTML sin servidor).
+
+    Con el TopoJSON ya registrado plotly.js no lo pide a ``topojsonURL``. Si
+    no está el archivo devuelve ``None``.
+    """
+    try:
+        with open(ruta_topojson(dir_topojson), encoding="utf-8") as f:
+            contenido = f.read()
+    except FileNotFoundError:
+        return None
+    return ("window.PlotlyGeoAssets = window.PlotlyGeoAssets || {topojson: {}};\n"
+            f"window.PlotlyGeoAssets.topojson[{json.dumps(NOMBRE_TOPOJSON)}] = {contenido};\n")
+
+
+@dataclass(frozen=True)
+class VistaMapa:
+    """Encuadre de un mapa y, si se acerca a los países, su geometría."""
+
+    nivel: str
+    datos: dict = None          # FeatureCollection de los países con datos (None: la del TopoJSON)
+    lon: tuple = None           # rango de longitudes (None: mundo completo)
+    lat: tuple = None
+
+
+def _coleccion(features):
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def vista_mapa(isos, dir_geometria=DIR_GEOMETRIA):
+    """:class:`VistaMapa` para los países ``isos``, o ``None`` si no hay geometría incluida."""
+    gruesa = cargar('baja', dir_geometria)
+    if gruesa is None:
+        return None
+    cajas = np.array([gruesa[iso]['bbox'] for iso in dict.fromkeys(isos) if iso in gruesa]).reshape(-1, 4)
+    lon = lat = None
+    extension = 360
+    if len(cajas):
+        lon_min, lat_min = cajas[:, :2].min(axis=0)
+        lon_max, lat_max = cajas[:, 2:].max(axis=0)
+        extension = max(lon_max - lon_min, lat_max - lat_min)
+        if extension < EXTENSION_ACERCAR:
+            # Margen alrededor de los países, y al menos 5 grados para los más chicos
+            margen = max(float(extension) * 0.15, 2.5)
+            lon = (max(float(lon_min) - margen, -180.0), min(float(lon_max) + margen, 180.0))
+            lat = (max(float(lat_min) - margen, -90.0), min(float(lat_max) + margen, 90.0))
+    nivel = next(n for n, maximo in EXTENSION_NIVEL if extension <= maximo)
+    if lon is None:
+        # El mundo completo sale del TopoJSON que el navegador ya tiene en caché
+        return VistaMapa(nivel)
+    paises = cargar(nivel, dir_geometria)
+    datos = [paises[iso] for iso in dict.fromkeys(isos) if iso in paises]
+    return VistaMapa(nivel, _coleccion(datos), lon, lat)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Geometría de los países para el mapa, sin red.")
+    parser.add_argument("--construir", metavar="GEOJSON", help="GeoJSON de países de Natural Earth")
+    parser.add_argument("--dir", default=DIR_GEOMETRIA, help="Directorio de salida")
+    parser.add_argument("--dir-topojson", default=DIR_TOPOJSON, help="Directorio del TopoJSON para plotly.js")
+    parser.add_argument("--campos-iso", nargs="+", default=list(CAMPOS_ISO),
+                        help="Propiedades con el código ISO-3, en orden de preferencia")
+    args = parser.parse_args(argv)
+    if not args.construir:
+        parser.print_help()
+        return 0
+    tamanos = construir(args.construir, args.dir, tuple(args.campos_iso), args.dir_topojson)
+    fuente = os.path.getsize(args.construir)
+    print(f"Fuente: {fuente / 1024:,.0f} KB")
+    for nivel, tam in tamanos.items():
+        ruta = ruta_topojson(args.dir_topojson) if nivel == NOMBRE_TOPOJSON else ruta_nivel(nivel, args.dir)
+        print(f"{nivel:<11}{tam / 1024:>10,.0f} KB  {ruta}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,542 @@
+"""Construcción de las figuras de Plotly del dashboard.
+
+Cada función recibe los datos ya agregados (o las filas filtradas, en los dos
+casos que las necesitan) y devuelve una figura lista para ``st.plotly_chart``.
+No dependen de Streamlit, así que se pueden memorizar o generar fuera del
+servidor.
+
+:func:`figura_cacheada` guarda cada figura ya construida en la caché de
+resultados compartida, con la clave (gráfico, versión de los datos, filtro),
+después de adelgazarla con :func:`adelgazar_figura`: la plantilla se recorta a
+los tipos de traza que usa la figura y los arreglos numéricos se envían con la
+precisión que se muestra. ``python -m desastres.graficos --informe`` muestra los
+bytes de cada figura antes y después.
+"""
+import argparse
+import itertools
+import json
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from desastres import dispersion, geometria, perfilado, tablas
+from desastres.agregados import agregar
+from desastres.cache_resultados import cache_compartida
+
+# Plotly Express recorre la plantilla registrada en plotly.io, un objeto compartido cuyos hijos se crean
+# al leerlos: dos hilos (sesiones y precalentamiento) que la recorren a la vez fallan con "Invalid value".
+# Cada llamada toma una copia registrada que ningún otro hilo está usando; se registra (como las de
+# plotly.io) sin validar, porque una plantilla que no está registrada se valida en cada figura (~20 ms)
+_PLANTILLAS = {nombre: pio.templates[nombre].to_plotly_json() for nombre in {pio.templates.default, 'seaborn'}}
+_copias_libres = {nombre: [] for nombre in _PLANTILLAS}
+_numeros_copia = itertools.count()
+_candado_copias = threading.Lock()
+
+
+@contextmanager
+def _copia_plantilla(nombre):
+    """Nombre registrado en plotly.io de una copia de ``nombre`` que nadie más usa mientras dura el bloque."""
+    with _candado_copias:
+        libres = _copias_libres[nombre]
+        if libres:
+            copia = libres.pop()
+        else:
+            copia = f"{nombre}_copia_{next(_numeros_copia)}"
+            pio.templates[copia] = go.layout.Template(_PLANTILLAS[nombre], _validate=False)
+    try:
+        yield copia
+    finally:
+        with _candado_copias:
+            _copias_libres[nombre].append(copia)
+
+
+def _px(grafico, *args, plantilla=pio.templates.default, **kwargs):
+    """Llama a ``grafico`` (una función de Plotly Express) con una copia propia de la plantilla."""
+    with _copia_plantilla(plantilla) as copia:
+        return grafico(*args, template=copia, **kwargs)
+
+
+# Escala continua de 0 (blanco) a 1 (rojo oscuro) para el mapa
+ESCALA_MAPA = [
+    [0.0, 'rgb(255,255,255)'],   # Blanco
+    [0.1, 'rgb(255,255,240)'],
+    [0.2, 'rgb(255,255,224)'],
+    [0.3, 'rgb(255,255,0)'],
+    [0.4, 'rgb(255,215,0)'],
+    [0.5, 'rgb(255,165,0)'],
+    [0.6, 'rgb(255,140,0)'],
+    [0.7, 'rgb(255,69,0)'],
+    [0.8, 'rgb(178,34,34)'],
+    [1.0, 'rgb(139,0,0)']        # Rojo oscuro
+]
+
+# Ajustes fijos del mapa (iguales para todos los filtros)
+GEO_MAPA = dict(
+    showland=True,
+    landcolor="whitesmoke",
+    showcoastlines=True,
+    showframe=False,
+    showcountries=True
+)
+# Opciones de plotly.js del mapa: el TopoJSON mundial se pide al servidor del dashboard, no al CDN de Plotly
+CONFIG_MAPA = {'topojsonURL': geometria.URL_TOPOJSON}
+
+COLUMNAS_DETALLE = ['Country', 'Disaster Type', 'Year', 'Total Events', 'Total Affected']
+
+
+def _fijar_ejes(fig):
+    """Desactiva el zoom de los ejes (gráficos sin barra de herramientas)."""
+    return fig.update_layout(xaxis={'fixedrange': True}, yaxis={'fixedrange': True})
+
+
+# Gráfico 1: Distribución de Tipos de Desastres
+def grafico_tipos(agregados):
+    fig = _px(
+        px.bar,
+        agregados.eventos_por_tipo,
+        x='Disaster Type',
+        y='Total Events',
+        title="Distribución de Tipos de Desastres",
+        plantilla='seaborn'
+    )
+    fig.update_traces(marker_color='#264653')
+    fig.update_layout(margin=dict(l=0, r=10, b=10, t=30), yaxis_title=None, xaxis_title=None)
+    return _fijar_ejes(fig)
+
+
+# Gráfico 2: Daños Económicos por Tipo de Desastre
+def grafico_danos(agregados):
+    fig = _px(
+        px.pie,
+        agregados.danos_por_tipo,
+        names='Disaster Type',
+        values='Total Damage (USD, original)',
+        hole=0.9,
+        title="Daños Económicos por Tipo de Desastre",
+        plantilla='seaborn'
+    )
+    # Formatear los valores como dólares
+    fig.update_traces(
+        texttemplate='$%{value:,.0f}',
+        hovertemplate='%{label}: $%{value:,.0f}<extra></extra>'
+    )
+    fig.update_layout(margin=dict(l=0, r=10, b=10, t=30))
+    return fig
+
+
+# Gráfico 3: Evolución de Eventos por Año
+def grafico_evolucion(agregados):
+    fig = _px(
+        px.line,
+        agregados.eventos_por_anio,
+        x='Year',
+        y='Total Events',
+        title="Evolución de Eventos por Año",
+        plantilla='seaborn'
+    )
+    fig.update_traces(line_color='#7A9E9F')
+    fig.update_layout(margin=dict(l=0, r=10, b=10, t=30), yaxis_title=None, xaxis_title=None)
+    return _fijar_ejes(fig)
+
+
+# Gráfico 4: Total de Afectados por Año y Subgrupo de Desastre
+def grafico_afectados(agregados):
+    df_year_total = agregados.afectados_por_anio
+    grouping_column = agregados.columna_subgrupo
+    df_subgroup = agregados.afectados_por_anio_subgrupo
+
+    fig = go.Figure()
+
+    # Barras con el total por año
+    fig.add_trace(
+        go.Bar(
+            x=df_year_total['Year'],
+            y=df_year_total['Total Affected'],
+            name='Total Afectados',
+            marker_color='lightgray',
+            opacity=0.6  # Para que las líneas se vean mejor
+        )
+    )
+
+    # Una línea por cada subgrupo
+    for subgroup in df_subgroup[grouping_column].unique():
+        df_temp = df_subgroup[df_subgroup[grouping_column] == subgroup]
+        fig.add_trace(
+            go.Scatter(
+                x=df_temp['Year'],
+                y=df_temp['Total Affected'],
+                mode='lines+markers',
+                name=subgroup
+            )
+        )
+
+    fig.update_layout(
+        title='Total de Afectados por Año y Subgrupo de Desastre',
+        xaxis_title='Año',
+        yaxis_title='Total de Afectados',
+        barmode='group',  # las barras se agrupan
+        template='seaborn',   # go.Figure copia la plantilla sin recorrerla
+        legend_title='Subgrupo de Desastre',
+        hovermode='x unified'
+    )
+    return _fijar_ejes(fig)
+
+
+# Gráfico 5 Sunburst: Muertes Totales por Subgrupo y Tipo
+def grafico_muertes(agregados):
+    return _px(
+        px.sunburst,
+        agregados.muertes_subgrupo_tipo,
+        path=['Disaster Subgroup', 'Disaster Type'],       # Jerarquía de anillos
+        values='Total Deaths',             # Tamaño de cada sector
+        color='Total Deaths',              # Campo numérico para el gradiente
+        color_continuous_scale=px.colors.sequential.Plasma,  # Escala de color (morado->amarillo)
+        hover_data=['Total Deaths'],       # Datos en el hover
+        title='Muertes Totales por Subgrupo y Tipo de Desastre'
+    )
+
+
+# Gráfico 6: Relación entre Personas Afectadas y Daños Económicos
+# Colores fijos por tipo, para que los puntos agrupados y los originales coincidan
+COLORES_DISPERSION = px.colors.qualitative.Plotly
+
+
+def grafico_dispersion(df_filtrado, max_puntos=dispersion.MAX_PUNTOS, metodo=dispersion.METODO,
+                       umbral_webgl=dispersion.UMBRAL_WEBGL, max_bytes=dispersion.MAX_BYTES, adelgazar=True):
+    """Devuelve ``(figura, InfoDispersion)``.
+
+    Por encima de ``umbral_webgl`` filas se usan trazas WebGL. Los puntos se
+    reducen en el servidor (ver :mod:`desastres.dispersion`) y, si el JSON de
+    la figura adelgazada supera ``max_bytes``, se reduce a la mitad hasta que
+    quepa. Para medirlo la figura se adelgaza aquí, así que se devuelve ya
+    adelgazada (ver :func:`figura_cacheada`); con ``adelgazar=False`` se mide
+    sobre una copia y se devuelve sin adelgazar.
+    """
+    webgl = len(df_filtrado) > umbral_webgl
+    # Colores en el orden de aparición de los tipos, como sin reducción
+    orden_tipos = list(pd.unique(np.asarray(df_filtrado['Disaster Type'], dtype=object)))
+    colores = {tipo: COLORES_DISPERSION[i % len(COLORES_DISPERSION)] for i, tipo in enumerate(orden_tipos)}
+    while True:
+        datos, atipicos = dispersion.reducir_dispersion(df_filtrado, max_puntos, metodo)
+        agrupados = datos[dispersion.REGISTROS].notna() if dispersion.REGISTROS in datos else None
+
+        def dispersion_px(df, hover_data):
+            return _px(
+                px.scatter,
+                df,
+                x='Total Affected',
+                y='Total Damage (USD, original)',
+                color='Disaster Type',
+                size='Total Events',
+                hover_data=hover_data,
+                category_orders={'Disaster Type': orden_tipos},
+                color_discrete_map=colores,
+                render_mode='webgl' if webgl else 'svg',
+                title="Relación entre Personas Afectadas y Daños Económicos"
+            )
+
+        if agrupados is None:
+            fig = dispersion_px(datos, ['Year', 'Country'])
+        else:
+            # Los puntos agrupados van en sus propias trazas: su hover muestra años y registros, no un país
+            fig = dispersion_px(datos[~agrupados], ['Year', 'Country'])
+            con_leyenda = {traza.name for traza in fig.data}
+            for traza in dispersion_px(datos[agrupados], ['Year', dispersion.REGISTROS]).data:
+                traza.showlegend = traza.name not in con_leyenda
+                fig.add_trace(traza)
+            # Misma escala de tamaños en las dos partes (la de px: el mayor mide size_max=20)
+            fig.update_traces(marker_sizeref=2.0 * datos['Total Events'].max() / 20 ** 2)
+        _fijar_ejes(fig)
+        # El presupuesto de bytes se mide sobre lo que se envía: la figura adelgazada
+        tam = len(adelgazar_figura(fig if adelgazar else go.Figure(fig)).to_json())
+        if tam <= max_bytes or metodo == 'ninguno' or len(datos) <= atipicos or max_puntos <= 50:
+            break
+        max_puntos //= 2
+
+    info = dispersion.InfoDispersion(
+        filas=len(df_filtrado), puntos=len(datos), atipicos=atipicos,
+        metodo=metodo if len(datos) < len(df_filtrado) else 'ninguno', webgl=webgl, bytes=tam,
+    )
+    return fig, info
+
+
+# Gráfico 7: Mapa Global de Desastres
+def grafico_mapa(agregados, anio_inicio, anio_fin):
+    df_mapa = agregados.eventos_por_iso
+
+    # Mínimo y máximo de eventos (para range_color)
+    min_events = df_mapa['Total Events'].min()
+    max_events = df_mapa['Total Events'].max()
+
+    # Encuadre y, si el mapa se acerca, geometría de los países con datos (ver desastres.geometria)
+    vista = geometria.vista_mapa(df_mapa['ISO'].dropna().tolist())
+
+    fig = _px(
+        px.choropleth,
+        df_mapa,
+        locations='ISO',              # Debe coincidir con la columna ISO
+        geojson=vista.datos if vista else None,
+        color='Total Events',
+        hover_name='Country',         # Se muestra el nombre del país
+        color_continuous_scale=ESCALA_MAPA,
+        range_color=(min_events, max_events),
+        title=f"Distribución Global de Desastres ({anio_inicio} - {anio_fin})",
+        projection='natural earth'
+    )
+
+    # Ajustes del mapa: las capas base salen del TopoJSON servido en CONFIG_MAPA
+    fig.update_geos(**GEO_MAPA)
+    if vista is not None and vista.lon is not None:
+        fig.update_geos(lonaxis_range=vista.lon, lataxis_range=vista.lat)
+    fig.update_layout(
+        margin=dict(l=10, r=10, b=10, t=40)
+    )
+    return fig
+
+
+def _tabla(df, titulo, alto=480):
+    fig = go.Figure(
+        data=[go.Table(
+            header=dict(
+                values=list(df.columns),
+                fill_color=None,
+                font=dict(color='black', size=12),
+                align='left'
+            ),
+            cells=dict(
+                values=[df[col] for col in df.columns],
+                fill_color=None,
+                font=dict(color='black', size=12),
+                align='left'
+            )
+        )]
+    )
+    fig.update_layout(
+        title_text=titulo,
+        title_x=0,
+        margin=dict(l=0, r=10, b=10, t=30),
+        height=alto
+    )
+    return fig
+
+
+def _tabla_pagina(pagina, titulo):
+    """Figura con las filas de una :class:`~desastres.tablas.Pagina` y la misma página."""
+    # Alto justo para las filas de la página (encabezado y celdas de unos 28 px)
+    return _tabla(pagina.filas, titulo, alto=min(480, 60 + 28 * (pagina.tam + 1))), pagina
+
+
+# Tabla 1: Resumen de Desastres por País
+def pagina_resumen(agregados, orden='Total Events', descendente=True, pagina=0, tam=tablas.TAM_PAGINA):
+    return tablas.paginar(agregados.resumen_paises, orden, descendente, pagina, tam)
+
+
+def tabla_resumen(pagina):
+    """``(figura, pagina)`` de una página de :func:`pagina_resumen`."""
+    return _tabla_pagina(pagina, "Resumen de Desastres por País")
+
+
+# Tabla 2: Detalle de Desastres Recientes
+def tabla_detalle(pagina):
+    """``(figura, pagina)`` de una página del detalle (ver ``MotorConsultas.pagina_detalle``)."""
+    return _tabla_pagina(pagina, "Detalle de Desastres Recientes")
+
+
+# ------------------------------------------------------------
+# Adelgazamiento y caché de figuras
+# ------------------------------------------------------------
+@lru_cache(maxsize=64)
+def _plantilla_recortada(layout_json, tipos):
+    """Plantilla con el layout original y solo los estilos de ``tipos`` de traza.
+
+    Se construye una vez por plantilla y combinación de tipos, y se reutiliza
+    en todas las figuras.
+    """
+    plantilla = json.loads(layout_json)
+    datos = plantilla.get('data', {})
+    return go.layout.Template(layout=plantilla.get('layout', {}),
+                              data={tipo: datos[tipo] for tipo in tipos if tipo in datos})
+
+
+# Por debajo de este valor float32 conserva las unidades y un decimal (su paso es a lo sumo 0.25)
+LIMITE_FLOAT32 = 2 ** 22
+
+
+def _compactar(valores):
+    """Arreglo numérico con la precisión que se muestra, o ``None`` si no cambia.
+
+    Los valores enteros se envían como enteros (Plotly los codifica con el tipo
+    más estrecho que los contiene). Los enteros que no caben en int32 y los
+    valores con decimales desde ``LIMITE_FLOAT32`` (como los daños en USD, que
+    se muestran con ``,.0f``) se dejan en float64 para no perder dígitos; los
+    demás se envían en float32.
+    """
+    if valores.dtype.kind != 'f' or valores.dtype == np.float32 or valores.size == 0:
+        return None
+    if not np.isfinite(valores).all():
+        return None
+    maximo = np.abs(valores).max()
+    if np.array_equal(valores, np.round(valores)):
+        if maximo <= np.iinfo(np.int32).max:
+            return valores.astype(np.int32)
+        return None
+    if maximo >= LIMITE_FLOAT32:
+        return None
+    return valores.astype(np.float32)
+
+
+def _rutas_arreglos(datos, prefijo=''):
+    for nombre, valor in datos.items():
+        if isinstance(valor, dict):
+            yield from _rutas_arreglos(valor, f"{prefijo}{nombre}.")
+        elif isinstance(valor, np.ndarray):
+            yield f"{prefijo}{nombre}", valor
+
+
+def adelgazar_figura(fig):
+    """Recorta la plantilla y compacta los arreglos numéricos de ``fig`` (in situ)."""
+    plantilla = fig.layout.template.to_plotly_json()
+    tipos = tuple(sorted({traza.type for traza in fig.data}))
+    fig.layout.template = _plantilla_recortada(json.dumps(plantilla, sort_keys=True), tipos)
+    for traza in fig.data:
+        for ruta, valores in _rutas_arreglos(traza.to_plotly_json()):
+            compacto = _compactar(valores)
+            if compacto is not None:
+                traza[ruta] = compacto
+    return fig
+
+
+def _bytes_arreglos(fig):
+    """Bytes de los arreglos numéricos de ``fig``: el peso de la figura en la caché, sin serializarla."""
+    return sum(valores.nbytes for traza in fig.data for _, valores in _rutas_arreglos(traza.to_plotly_json()))
+
+
+# Un candado por figura en construcción: si dos sesiones (o el precalentamiento) piden a la vez la misma
+# figura, la segunda espera a la primera y usa su resultado; figuras distintas se construyen en paralelo
+_construcciones = {}
+_candado_construcciones = threading.Lock()
+# Memoria aproximada de una figura sin contar sus arreglos numéricos
+TAM_BASE_FIGURA = 64 * 1024
+
+
+@dataclass(frozen=True)
+class FiguraCacheada:
+    """Figura adelgazada, lista para ``st.plotly_chart``."""
+
+    figura: go.Figure
+    extra: object = None    # datos adicionales del constructor (p. ej. InfoDispersion)
+
+
+@contextmanager
+def _construyendo(clave):
+    """Candado de la figura ``clave`` mientras se construye."""
+    with _candado_construcciones:
+        candado = _construcciones.setdefault(clave, threading.Lock())
+    try:
+        with candado:
+            yield
+    finally:
+        with _candado_construcciones:
+            if _construcciones.get(clave) is candado:
+                del _construcciones[clave]
+
+
+def _construir_figura(nombre, construir, adelgazada):
+    with perfilado.etapa(f"figura:{nombre}", cache='fallo'):
+        resultado = construir()
+    fig, extra = resultado if isinstance(resultado, tuple) else (resultado, None)
+    if not adelgazada:
+        with perfilado.etapa(f"adelgazar:{nombre}"):
+            adelgazar_figura(fig)
+    return FiguraCacheada(fig, extra)
+
+
+def figura_cacheada(nombre, clave, construir, cache=None, adelgazada=False):
+    """Devuelve la figura ``nombre`` para ``clave``, construyéndola solo si no está en caché.
+
+    ``clave`` debe identificar la versión de los datos y el filtro (y cualquier
+    otro parámetro que cambie la figura). ``construir()`` devuelve una figura o
+    una tupla ``(figura, extra)``; se devuelve lo mismo. Con ``adelgazada=True``
+    la figura ya viene adelgazada (como la de :func:`grafico_dispersion`) y no
+    se vuelve a adelgazar.
+
+    La figura no se serializa aquí: ``st.plotly_chart`` la serializa al
+    mostrarla (y el perfilado mide ahí sus bytes).
+    """
+    cache = cache_compartida() if cache is None else cache
+    clave_cache = ("figura", nombre, clave)
+    entrada = cache.obtener(clave_cache)
+    if entrada is None:
+        with _construyendo(clave_cache):
+            # Otro hilo pudo construirla mientras se esperaba (el fallo ya se contó)
+            entrada = cache.obtener(clave_cache, contar=False)
+            if entrada is None:
+                entrada = _construir_figura(nombre, construir, adelgazada)
+                # Los arreglos numéricos, más lo que ocupan el layout y los textos de la figura
+                cache.guardar(clave_cache, entrada, tam=2 * _bytes_arreglos(entrada.figura) + TAM_BASE_FIGURA)
+                return entrada.figura if entrada.extra is None else (entrada.figura, entrada.extra)
+    with perfilado.etapa(f"figura:{nombre}", cache='acierto'):
+        pass
+    return entrada.figura if entrada.extra is None else (entrada.figura, entrada.extra)
+
+
+def constructores(df_filtrado, agregados, anio_inicio, anio_fin):
+    """Funciones sin argumentos que construyen cada figura del dashboard, por nombre."""
+    return {
+        'tipos': lambda: grafico_tipos(agregados),
+        'danos': lambda: grafico_danos(agregados),
+        'evolucion': lambda: grafico_evolucion(agregados),
+        'afectados': lambda: grafico_afectados(agregados),
+        'muertes': lambda: grafico_muertes(agregados),
+        'dispersion': lambda: grafico_dispersion(df_filtrado, adelgazar=False)[0],
+        'mapa': lambda: grafico_mapa(agregados, anio_inicio, anio_fin),
+        'tabla_resumen': lambda: tabla_resumen(pagina_resumen(agregados))[0],
+        'tabla_detalle': lambda: tabla_detalle(
+            tablas.paginar(df_filtrado, 'Year', columnas=COLUMNAS_DETALLE))[0],
+    }
+
+
+def informe_bytes(df_filtrado, anio_inicio, anio_fin):
+    """Lista de ``(figura, bytes antes, bytes después)`` del JSON de cada figura."""
+    filas = []
+    for nombre, construir in constructores(df_filtrado, agregar(df_filtrado), anio_inicio, anio_fin).items():
+        fig = construir()
+        antes = len(fig.to_json())
+        filas.append((nombre, antes, len(adelgazar_figura(fig).to_json())))
+    return filas
+
+
+if __name__ == "__main__":
+    from desastres.cache_resultados import normalizar_filtro
+    from desastres.datos import TODOS_DESASTRES, TODOS_PAISES, cargar_datos_limpios
+    from desastres.filtros import IndiceFiltros
+
+    parser = argparse.ArgumentParser(description="Figuras del dashboard.")
+    parser.add_argument("--informe", action="store_true",
+                        help="muestra los bytes del JSON de cada figura antes y después de adelgazarla")
+    parser.add_argument("--pais", nargs="+", default=TODOS_PAISES)
+    parser.add_argument("--anio-inicio", type=int, default=2000)
+    parser.add_argument("--anio-fin", type=int, default=2024)
+    parser.add_argument("--tipo", nargs="+", default=TODOS_DESASTRES)
+    parser.add_argument("--subgrupo", nargs="+")
+    args = parser.parse_args()
+
+    if args.informe:
+        indice = IndiceFiltros(cargar_datos_limpios(compacto=True))
+        filtro = normalizar_filtro(args.pais, args.anio_inicio, args.anio_fin, args.tipo,
+                                   indice.anio_min, indice.anio_max, args.subgrupo)
+        filas = informe_bytes(indice.filtrar(*filtro), args.anio_inicio, args.anio_fin)
+        print(f"{'figura':<15}{'antes':>10}{'después':>10}{'ahorro':>9}")
+        for nombre, antes, despues in filas:
+            print(f"{nombre:<15}{antes:>10,}{despues:>10,}{1 - despues / antes:>9.0%}")
+        antes, despues = sum(f[1] for f in filas), sum(f[2] for f in filas)
+        print(f"{'total':<15}{antes:>10,}{despues:>10,}{1 - despues / antes:>9.0%}")
+    else:
+        parser.print_help()
@@ -0,0 +1,251 @@
+"""Ingesta de publicaciones de EM-DAT en un almacén Parquet de solo agregado.
+
+Cada publicación (un Excel o CSV de EM-DAT) se lee por bloques de filas, se
+limpia con :func:`~desastres.datos.limpiar_datos` y se escribe en su propia
+partición del almacén::
+
+    data/almacen/
+        _manifiesto.json
+        publicacion=2025-01-27/parte-00000.parquet
+        publicacion=2025-01-27/parte-00001.parquet
+        ...
+
+La columna ``publicacion`` sale del nombre del directorio al leer el almacén
+como dataset particionado (``hive``). Agregar una publicación nueva no toca las
+anteriores: se escribe en un directorio temporal que luego se renombra y se
+registra en el manifiesto. Una publicación que ya está en el almacén con el
+mismo contenido se omite.
+
+Uso::
+
+    python -m desastres.ingesta data/emdat-country-profiles_2025_01_27.xlsx
+    python -m desastres.ingesta emdat_2025_06.csv --publicacion 2025-06-30
+    python -m desastres.ingesta --listar
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from desastres.config import entero_env, texto_env
+from desastres.datos import COLUMNAS_NECESARIAS, compactar_tipos, limpiar_datos, version_datos
+
+DIR_ALMACEN = texto_env("DESASTRES_ALMACEN", "data/almacen")
+# Con "_" y "." delante los lectores de datasets ignoran el manifiesto y los temporales
+MANIFIESTO = "_manifiesto.json"
+# Filas por bloque: acota la memoria de la ingesta
+FILAS_POR_BLOQUE = entero_env("DESASTRES_INGESTA_FILAS_POR_BLOQUE", 50_000)
+
+_ENTEROS = ('Year', 'Total Events')
+_TEXTO = ('Country', 'ISO', 'Disaster Group', 'Disaster Subgroup', 'Disaster Type', 'Disaster Subtype')
+
+
+def _esquema():
+    """Esquema Arrow fijo, para que todos los bloques coincidan aunque alguno tenga columnas vacías."""
+    import pyarrow as pa
+
+    tipos = {**{c: pa.int64() for c in _ENTEROS}, **{c: pa.string() for c in _TEXTO}}
+    return pa.schema([(columna, tipos.get(columna, pa.float64())) for columna in COLUMNAS_NECESARIAS])
+
+
+# ----------------------------------------------------------------
+# 1) MANIFIESTO
+# ----------------------------------------------------------------
+def leer_manifiesto(dir_almacen=DIR_ALMACEN):
+    """``{publicacion: entrada}`` de las publicaciones del almacén."""
+    try:
+        with open(os.path.join(dir_almacen, MANIFIESTO), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _escribir_manifiesto(manifiesto, dir_almacen):
+    destino = os.path.join(dir_almacen, MANIFIESTO)
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temporal, destino)
+
+
+def publicaciones(dir_almacen=DIR_ALMACEN):
+    """Publicaciones del almacén, de la más reciente a la más antigua."""
+    return sorted(leer_manifiesto(dir_almacen), reverse=True)
+
+
+def ruta_publicacion(publicacion, dir_almacen=DIR_ALMACEN):
+    return os.path.join(dir_almacen, f"publicacion={publicacion}")
+
+
+def patron_publicacion(publicacion, dir_almacen=DIR_ALMACEN):
+    """Patrón glob de los archivos de una publicación (para DuckDB)."""
+    return os.path.join(ruta_publicacion(publicacion, dir_almacen), "*.parquet")
+
+
+def cargar_publicacion(publicacion, dir_almacen=DIR_ALMACEN, compacto=False):
+    """DataFrame limpio de una publicación, con las filas en el orden de origen."""
+    if publicacion not in leer_manifiesto(dir_almacen):
+        raise KeyError(f"La publicación {publicacion!r} no está en el almacén {dir_almacen}")
+    df = pd.read_parquet(ruta_publicacion(publicacion, dir_almacen), columns=COLUMNAS_NECESARIAS)
+    return compactar_tipos(df) if compacto else df
+
+
+# ----------------------------------------------------------------
+# 2) LECTURA POR BLOQUES
+# ----------------------------------------------------------------
+def publicacion_de(ruta, hoja=None):
+    """Fecha de publicación según la hoja ("EM-DAT Version 2025-01-27") o el nombre del archivo."""
+    for texto in (hoja or "", os.path.basename(ruta)):
+        encontrado = re.search(r"(\d{4})[-_](\d{2})[-_](\d{2})", texto)
+        if encontrado:
+            return "-".join(encontrado.groups())
+    raise ValueError(f"No se pudo deducir la publicación de {ruta}; indícala con --publicacion")
+
+
+def _bloques_excel(ruta, hoja, filas_por_bloque):
+    from openpyxl import load_workbook
+
+    # read_only recorre la hoja sin cargarla completa en memoria
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = libro[hoja].iter_rows(values_only=True)
+        encabezado = [str(c).strip() if c is not None else "" for c in next(filas)]
+        bloque = []
+        for fila in filas:
+            bloque.append(fila[:len(encabezado)])
+            if len(bloque) == filas_por_bloque:
+                yield pd.DataFrame(bloque, columns=encabezado)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=encabezado)
+    finally:
+        libro.close()
+
+
+def hoja_de(ruta, hoja=None):
+    """Hoja a leer: la indicada o la primera del libro."""
+    if hoja or not ruta.lower().endswith((".xlsx", ".xlsm")):
+        return hoja
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta, read_only=True)
+    try:
+        return libro.sheetnames[0]
+    finally:
+        libro.close()
+
+
+def leer_bloques(ruta, hoja=None, filas_por_bloque=FILAS_POR_BLOQUE):
+    """DataFrames limpios de ``filas_por_bloque`` filas como máximo, en el orden del archivo."""
+    if ruta.lower().endswith(".csv"):
+        bloques = pd.read_csv(ruta, chunksize=filas_por_bloque)
+    else:
+        bloques = _bloques_excel(ruta, hoja_de(ruta, hoja), filas_por_bloque)
+    for bloque in bloques:
+        bloque.columns = bloque.columns.str.strip()
+        faltantes = [c for c in COLUMNAS_NECESARIAS if c not in bloque.columns]
+        if faltantes:
+            raise ValueError(f"{ruta}: faltan las columnas {', '.join(faltantes)}")
+        yield limpiar_datos(bloque)
+
+
+# ----------------------------------------------------------------
+# 3) INGESTA
+# ----------------------------------------------------------------
+def ingerir(ruta, publicacion=None, hoja=None, dir_almacen=DIR_ALMACEN, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Agrega una publicación al almacén y devuelve su entrada del manifiesto.
+
+    Si la publicación ya está con el mismo contenido no se hace nada (la
+    entrada devuelta tiene ``omitida=True``); con otro contenido es un error,
+    porque el almacén es de solo agregado.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    hoja = hoja_de(ruta, hoja)
+    publicacion = publicacion or publicacion_de(ruta, hoja)
+    version = version_datos(ruta, hoja or "")
+    manifiesto = leer_manifiesto(dir_almacen)
+    if publicacion in manifiesto:
+        if manifiesto[publicacion]['version'] == version:
+            return {**manifiesto[publicacion], 'omitida': True}
+        raise ValueError(f"La publicación {publicacion} ya está en el almacén con otro contenido")
+
+    os.makedirs(dir_almacen, exist_ok=True)
+    destino = ruta_publicacion(publicacion, dir_almacen)
+    temporal = os.path.join(dir_almacen, f".publicacion={publicacion}.{os.getpid()}.tmp")
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    esquema = _esquema()
+    filas = partes = 0
+    try:
+        for bloque in leer_bloques(ruta, hoja, filas_por_bloque):
+            tabla = pa.Table.from_pandas(bloque[COLUMNAS_NECESARIAS], schema=esquema, preserve_index=False)
+            pq.write_table(tabla, os.path.join(temporal, f"parte-{partes:05d}.parquet"))
+            filas += len(bloque)
+            partes += 1
+        os.replace(temporal, destino)
+    except BaseException:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+    entrada = {
+        'publicacion': publicacion,
+        'origen': os.path.basename(ruta),
+        'hoja': hoja,
+        'version': version,
+        'filas': filas,
+        'partes': partes,
+        'ingerida': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    # Se relee por si otro proceso agregó una publicación mientras tanto
+    manifiesto = leer_manifiesto(dir_almacen)
+    manifiesto[publicacion] = entrada
+    _escribir_manifiesto(manifiesto, dir_almacen)
+    return entrada
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingesta de publicaciones de EM-DAT en el almacén Parquet.")
+    parser.add_argument("archivos", nargs="*", help="Excel (.xlsx) o CSV de EM-DAT")
+    parser.add_argument("--publicacion", help="Fecha de la publicación (por defecto, de la hoja o del archivo)")
+    parser.add_argument("--hoja", help="Hoja del Excel (por defecto, la primera)")
+    parser.add_argument("--dir", default=DIR_ALMACEN, help="Directorio del almacén")
+    parser.add_argument("--filas-por-bloque", type=int, default=FILAS_POR_BLOQUE)
+    parser.add_argument("--listar", action="store_true", help="Muestra las publicaciones del almacén")
+    args = parser.parse_args(argv)
+
+    if args.listar:
+        print(f"{'publicación':<14}{'filas':>10}{'partes':>8}  origen")
+        for publicacion in publicaciones(args.dir):
+            e = leer_manifiesto(args.dir)[publicacion]
+            print(f"{publicacion:<14}{e['filas']:>10,}{e['partes']:>8}  {e['origen']}")
+        return 0
+    if not args.archivos:
+        parser.print_help()
+        return 0
+    if args.publicacion and len(args.archivos) > 1:
+        parser.error("--publicacion solo se puede usar con un archivo")
+
+    for ruta in args.archivos:
+        inicio = time.perf_counter()
+        entrada = ingerir(ruta, args.publicacion, args.hoja, args.dir, args.filas_por_bloque)
+        if entrada.get('omitida'):
+            print(f"{entrada['publicacion']}: ya estaba en el almacén, se omite {ruta}")
+            continue
+        print(f"{entrada['publicacion']}: {entrada['filas']:,} filas en {entrada['partes']} partes "
+              f"desde {ruta} en {time.perf_counter() - inicio:.2f} s")
+    # ru_maxrss está en KB en Linux
+    print(f"Memoria máxima del proceso: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""Datos y estructuras precalculadas compartidos entre procesos con archivos mapeados en memoria.
+
+Con varios procesos de Streamlit en el mismo servidor, cada uno cargaba su
+propia copia del DataFrame, del índice de filtros y del cubo de totales. Con
+``DESASTRES_MEMORIA_COMPARTIDA=1`` el primer proceso los escribe una vez por
+versión de los datos como arreglos NumPy (``.npy``) en
+``data/.cache/compartida/<versión>/``, y todos los procesos los mapean en
+modo de solo lectura (``np.load(mmap_mode='r')``).
+
+Las columnas del DataFrame se envuelven sin copiar. Las categóricas se
+arman a partir de sus códigos y los enteros anulables a partir de valores y
+máscara. El sistema operativo comparte esas páginas entre procesos, así que
+cada proceso adicional apenas ocupa memoria propia para los datos.
+
+Memoria residente por proceso con y sin el modo compartido::
+
+    python -m desastres.memoria_compartida --medir --procesos 4 --escala 100
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from desastres.config import bool_env
+from desastres.cubo import CuboDesastres
+from desastres.datos import DIR_CACHE, compactar_tipos
+from desastres.filtros import IndiceFiltros
+
+ACTIVADA = bool_env("DESASTRES_MEMORIA_COMPARTIDA", False)
+DIR_COMPARTIDA = os.path.join(DIR_CACHE, "compartida")
+META = "meta.json"
+
+
+def ruta_version(version, dir_base=DIR_COMPARTIDA):
+    return os.path.join(dir_base, str(version))
+
+
+# ----------------------------------------------------------------
+# 1) ESCRITURA
+# ----------------------------------------------------------------
+def _guardar(directorio, nombre, arreglo):
+    np.save(os.path.join(directorio, nombre), np.ascontiguousarray(arreglo), allow_pickle=False)
+    return nombre
+
+
+def _guardar_df(df, directorio, prefijo):
+    """Guarda cada columna como uno o dos ``.npy``; devuelve la descripción para :func:`_mapear_df`."""
+    columnas = []
+    for i, (nombre, serie) in enumerate(df.items()):
+        base = f"{prefijo}.{i}"
+        if not isinstance(serie.dtype, pd.CategoricalDtype) and not pd.api.types.is_numeric_dtype(serie.dtype):
+            # El texto se guarda como categórica: los objetos de Python no se pueden mapear
+            serie = serie.astype('category')
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            columnas.append({
+                'nombre': nombre, 'tipo': 'categoria',
+                'codigos': _guardar(directorio, f"{base}.codigos.npy", serie.cat.codes.to_numpy()),
+                'categorias': [str(c) for c in serie.cat.categories],
+            })
+        elif pd.api.types.is_extension_array_dtype(serie.dtype):
+            # Enteros anulables: valores (0 en los nulos) y máscara de nulos
+            columnas.append({
+                'nombre': nombre, 'tipo': 'anulable',
+                'valores': _guardar(directorio, f"{base}.valores.npy",
+                                    serie.to_numpy(dtype=serie.dtype.numpy_dtype, na_value=0)),
+                'mascara': _guardar(directorio, f"{base}.mascara.npy", serie.isna().to_numpy()),
+            })
+        else:
+            columnas.append({'nombre': nombre, 'tipo': 'numpy',
+                             'valores': _guardar(directorio, f"{base}.npy", serie.to_numpy())})
+    indice = None
+    if not isinstance(df.index, pd.RangeIndex) or not df.index.equals(pd.RangeIndex(len(df))):
+        indice = _guardar(directorio, f"{prefijo}.indice.npy", df.index.to_numpy(dtype=np.int64))
+    return {'filas': len(df), 'columnas': columnas, 'indice': indice}
+
+
+def publicar(df, version, dir_base=DIR_COMPARTIDA):
+    """Escribe DataFrame, índice y cubo de una versión, si no están ya; devuelve su directorio.
+
+    Se escribe en un directorio temporal que luego se renombra: si otro
+    proceso publicó la misma versión mientras tanto, se conserva la suya.
+    """
+    destino = ruta_version(version, dir_base)
+    if os.path.exists(os.path.join(destino, META)):
+        return destino
+
+    os.makedirs(dir_base, exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix=f".{version}.", dir=dir_base)
+    try:
+        estado = IndiceFiltros.calcular_estado(df)
+        cubo = CuboDesastres.desde_df(df)
+        meta = {
+            'version': version,
+            'datos': _guardar_df(df, temporal, 'datos'),
+            'ordenado': _guardar_df(df.take(estado['orden']), temporal, 'ordenado'),
+            'indice': {
+                clave: (_guardar(temporal, f"indice.{clave}.npy", valor) if isinstance(valor, np.ndarray) else valor)
+                for clave, valor in estado.items()
+            },
+            'cubo': {
+                'paises': [str(p) for p in cubo.paises],
+                'tipos': [str(t) for t in cubo.tipos],
+                'anio_min': cubo.anio_min,
+                'anio_max': cubo.anio_max,
+                'subgrupo_por_tipo': cubo.subgrupo_por_tipo,
+                'acumulados': {medida: _guardar(temporal, f"cubo.{i}.npy", acumulado)
+                               for i, (medida, acumulado) in enumerate(cubo.acumulados.items())},
+            },
+        }
+        # meta.json es lo último que se escribe: su presencia indica una publicación completa
+        with open(os.path.join(temporal, META), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.rename(temporal, destino)
+    except BaseException as e:
+        # Incluye KeyboardInterrupt o MemoryError a mitad de la escritura: no queda el temporal
+        shutil.rmtree(temporal, ignore_errors=True)
+        # El renombrado falla si otro proceso ya publicó la versión: se usa la suya
+        if not isinstance(e, OSError) or not os.path.exists(os.path.join(destino, META)):
+            raise
+    return destino
+
+
+def liberar(version, dir_base=DIR_COMPARTIDA):
+    """Borra la publicación de una versión.
+
+    Los procesos que ya la mapearon la siguen leyendo: el sistema libera los
+    archivos cuando se cierra el último mapeo.
+    """
+    shutil.rmtree(ruta_version(version, dir_base), ignore_errors=True)
+
+
+# ----------------------------------------------------------------
+# 2) MAPEO
+# ----------------------------------------------------------------
+def _mapear(directorio, archivo):
+    # np.asarray quita la subclase memmap; el arreglo sigue apuntando al archivo mapeado
+    return np.asarray(np.load(os.path.join(directorio, archivo), mmap_mode='r'))
+
+
+def _mapear_df(directorio, descripcion):
+    columnas = {}
+    for columna in descripcion['columnas']:
+        if columna['tipo'] == 'categoria':
+            valores = pd.Categorical.from_codes(_mapear(directorio, columna['codigos']),
+                                                categories=columna['categorias'], validate=False)
+        elif columna['tipo'] == 'anulable':
+            valores = pd.arrays.IntegerArray(_mapear(directorio, columna['valores']),
+                                             _mapear(directorio, columna['mascara']), copy=False)
+        else:
+            valores = _mapear(directorio, columna['valores'])
+        columnas[columna['nombre']] = valores
+    if descripcion['indice'] is None:
+        indice = pd.RangeIndex(descripcion['filas'])
+    else:
+        indice = pd.Index(_mapear(directorio, descripcion['indice']), copy=False)
+    # copy=False: un bloque por columna, sin consolidar (consolidar copiaría)
+    return pd.DataFrame(columnas, index=indice, copy=False)
+
+
+def mapear(version, dir_base=DIR_COMPARTIDA):
+    """``(df, indice, cubo)`` mapeados desde disco, o ``None`` si la versión no está publicada."""
+    directorio = ruta_version(version, dir_base)
+    try:
+        with open(os.path.join(directorio, META), encoding="utf-8") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    df = _mapear_df(directorio, meta['datos'])
+    ordenado = _mapear_df(directorio, meta['ordenado'])
+    estado = {clave: _mapear(directorio, valor) if isinstance(valor, str) and valor.endswith(".npy") else valor
+              for clave, valor in meta['indice'].items()}
+    indice = IndiceFiltros.desde_estado(df, estado, ordenado)
+    datos_cubo = meta['cubo']
+    cubo = CuboDesastres(
+        datos_cubo['paises'], datos_cubo['tipos'], datos_cubo['anio_min'], datos_cubo['anio_max'],
+        {medida: _mapear(directorio, archivo) for medida, archivo in datos_cubo['acumulados'].items()},
+        datos_cubo['subgrupo_por_tipo'],
+    )
+    return df, indice, cubo
+
+
+# ----------------------------------------------------------------
+# 3) MEDICIÓN DE MEMORIA POR PROCESO
+# ----------------------------------------------------------------
+def memoria_proceso():
+    """``{'rss', 'pss', 'privada'}`` en MB del proceso actual (Linux, ``/proc/self/smaps_rollup``)."""
+    campos = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) >= 2 and partes[0].endswith(":") and partes[1].isdigit():
+                campos[partes[0][:-1]] = int(partes[1]) / 1024
+    return {
+        'rss': campos.get('Rss', 0.0),
+        'pss': campos.get('Pss', 0.0),
+        'privada': campos.get('Private_Clean', 0.0) + campos.get('Private_Dirty', 0.0),
+    }
+
+
+def _leer_paginas(motor):
+    """Recorre todos los datos del motor para que sus páginas queden residentes."""
+    for df in (motor.df, motor.indice.ordenado):
+        for _, serie in df.items():
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                serie.cat.codes.to_numpy().sum()
+            else:
+                serie.sum()
+    for valor in [*motor.indice.estado().values(), *motor.cubo.acumulados.values()]:
+        if isinstance(valor, np.ndarray):
+            valor.sum()
+
+
+def _trabajador(modo, ruta_parquet, version, dir_base, barrera, cola):
+    from desastres.motores import MotorPandas
+    from desastres.rendimiento import matriz_filtros
+
+    inicial = memoria_proceso()
+    if modo == 'compartida':
+        df, indice, cubo = mapear(version, dir_base)
+        motor = MotorPandas(df, version, indice, cubo)
+    else:
+        motor = MotorPandas(compactar_tipos(pd.read_parquet(ruta_parquet)), version)
+    _leer_paginas(motor)
+    # Todos los procesos vivos a la vez, para que la PSS reparta las páginas compartidas
+    barrera.wait()
+    datos = memoria_proceso()
+    barrera.wait()
+    # Consultas del dashboard: memoria de trabajo, que no se comparte
+    for filtro in matriz_filtros(motor.indice).values():
+        motor.metricas(filtro)
+        motor.agregar(filtro)
+    barrera.wait()
+    consultas = memoria_proceso()
+    cola.put({'modo': modo, 'pid': os.getpid(), **{k: datos[k] - inicial[k] for k in datos},
+              'consultas': consultas['privada'] - inicial['privada']})
+    barrera.wait()
+
+
+def medir(procesos, escala):
+    """Lanza ``procesos`` procesos por modo y devuelve la memoria que agrega cada uno.
+
+    ``rss``, ``pss`` y ``privada`` son la memoria de los datos ya leídos;
+    ``consultas`` es la memoria privada después de ejecutar la matriz de
+    filtros del benchmark.
+    """
+    from desastres.pipeline import cargar
+    from desastres.rendimiento import escalar_datos
+
+    df = compactar_tipos(escalar_datos(cargar(compacto=False), escala))
+    contexto = multiprocessing.get_context("spawn")
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_parquet = os.path.join(directorio, "datos.parquet")
+        df.to_parquet(ruta_parquet, index=False)
+        version = f"medicion-x{escala}"
+        publicar(df, version, directorio)
+        del df
+        for modo in ('independiente', 'compartida'):
+            barrera, cola = contexto.Barrier(procesos), contexto.Queue()
+            hijos = [contexto.Process(target=_trabajador, args=(modo, ruta_parquet, version, directorio, barrera, cola))
+                     for _ in range(procesos)]
+            for hijo in hijos:
+                hijo.start()
+            resultados += [cola.get() for _ in hijos]
+            for hijo in hijos:
+                hijo.join()
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Datos compartidos entre procesos con archivos mapeados.")
+    parser.add_argument("--medir", action="store_true",
+                        help="compara la memoria por proceso con y sin el modo compartido")
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--escala", type=int, default=100, help="factor de filas sobre los datos reales")
+    args = parser.parse_args(argv)
+
+    if not args.medir:
+        parser.print_help()
+        return 0
+
+    resultados = medir(args.procesos, args.escala)
+    print(f"Memoria que agrega cada proceso (datos ×{args.escala}), en MB")
+    print(f"{'modo':<15}{'pid':>8}{'RSS':>10}{'PSS':>10}{'privada':>10}{'+consultas':>12}")
+    for r in resultados:
+        print(f"{r['modo']:<15}{r['pid']:>8}{r['rss']:>10.1f}{r['pss']:>10.1f}{r['privada']:>10.1f}"
+              f"{r['consultas']:>12.1f}")
+    for modo in ('independiente', 'compartida'):
+        propios = [r['privada'] for r in resultados if r['modo'] == modo]
+        print(f"{modo}: {np.mean(propios):.1f} MB privados por proceso para los datos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
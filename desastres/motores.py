@@ -0,0 +1,543 @@
+"""Motores de consulta: de dónde salen las filas, las métricas y las agregaciones.
+
+El dashboard no consulta el DataFrame directamente sino un
+:class:`MotorConsultas`. Hay dos:
+
+* ``pandas`` (por defecto): el DataFrame completo en memoria, con el índice de
+  filtros y el cubo de totales (ver :mod:`desastres.pipeline`).
+* ``duckdb``: SQL embebido sobre archivos Parquet, sin servidor. Los filtros y
+  los ``GROUP BY`` se ejecutan en DuckDB y a Python solo llegan resultados
+  agregados: las sumas por (País, Tipo de desastre, Año), que
+  :func:`~desastres.agregados.agregar` re-agrupa como siempre, los totales de
+  las métricas y la página visible del detalle. Así se pueden usar exportaciones de
+  EM-DAT por evento que no caben en memoria.
+
+Se elige con ``DESASTRES_MOTOR``. Ambos pueden leer una publicación del
+almacén de :mod:`desastres.ingesta`. Para DuckDB, ``DESASTRES_MOTOR_PARQUET``
+es el archivo o patrón glob a consultar (por defecto la caché Parquet del
+Excel) y ``DESASTRES_MOTOR_ESQUEMA`` indica si tiene las columnas de los
+perfiles por país (``perfiles``) o las de la exportación por evento
+(``eventos``).
+
+Para comprobar que ambos motores dan los mismos resultados::
+
+    python -m desastres.motores --comparar
+"""
+import abc
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from desastres import ingesta, memoria_compartida, perfilado, pipeline, tablas
+from desastres.agregados import agregar
+from desastres.config import TIPOS_COMPACTOS, texto_env
+from desastres.datos import (DIR_CACHE, MEDIDAS, RUTA_DATOS, construir_cache, hash_archivo, ruta_cache,
+                             version_datos)
+from desastres.graficos import COLUMNAS_DETALLE
+
+MOTORES = ('pandas', 'duckdb')
+MOTOR = texto_env("DESASTRES_MOTOR", "pandas").lower()
+RUTA_PARQUET = texto_env("DESASTRES_MOTOR_PARQUET", "")
+ESQUEMA = texto_env("DESASTRES_MOTOR_ESQUEMA", "perfiles").lower()
+
+# Expresión SQL de cada columna del dashboard según el esquema del archivo.
+# En la exportación por evento cada fila es un evento y los daños están en miles de USD.
+_COLUMNAS = ['Country', 'ISO', 'Disaster Subgroup', 'Disaster Type', 'Year', *MEDIDAS]
+ESQUEMAS = {
+    'perfiles': {columna: f'"{columna}"' for columna in _COLUMNAS},
+    'eventos': {
+        'Country': '"Country"',
+        'ISO': '"ISO"',
+        'Disaster Subgroup': '"Disaster Subgroup"',
+        'Disaster Type': '"Disaster Type"',
+        'Year': '"Start Year"',
+        'Total Events': '1',
+        'Total Affected': '"Total Affected"',
+        'Total Deaths': '"Total Deaths"',
+        'Total Damage (USD, original)': '"Total Damage (\'000 US$)" * 1000',
+    },
+}
+
+
+class MotorConsultas(abc.ABC):
+    """Consultas que necesita el dashboard.
+
+    ``filtro`` es siempre un :class:`~desastres.cache_resultados.Filtro`
+    normalizado y ``version`` identifica los datos en las claves de caché.
+    """
+
+    nombre = None
+    version = None
+    filas_totales = 0
+    anio_min, anio_max = 0, -1
+
+    @abc.abstractmethod
+    def opciones(self):
+        """Opciones de los selectores: ``(países, años, tipos de desastre, subgrupos)``."""
+
+    @abc.abstractmethod
+    def filas(self, filtro, columnas=None):
+        """Filas del filtro en el orden original.
+
+        ``columnas`` son las que se van a usar; un motor puede devolver más.
+        """
+
+    def bloques(self, filtro, filas_por_bloque, columnas=None):
+        """Filas del filtro en el orden original, en DataFrames de hasta ``filas_por_bloque`` filas.
+
+        Sin ``columnas``, todas las del motor. Siempre hay al menos un bloque
+        (vacío si no hay filas), para conocer las columnas.
+        """
+        filas = self.filas(filtro, columnas)
+        if columnas is not None:
+            filas = filas[columnas]
+        for inicio in range(0, max(len(filas), 1), filas_por_bloque):
+            yield filas.iloc[inicio:inicio + filas_por_bloque]
+
+    @abc.abstractmethod
+    def metricas(self, filtro):
+        """``(actual, anterior)``, como :func:`desastres.pipeline.metricas`."""
+
+    @abc.abstractmethod
+    def agregar(self, filtro):
+        """:class:`~desastres.agregados.AgregadosFiltro` del filtro."""
+
+    @abc.abstractmethod
+    def pagina_detalle(self, filtro, orden='Year', descendente=True, pagina=0, tam=tablas.TAM_PAGINA):
+        """:class:`~desastres.tablas.Pagina` de las filas del filtro (columnas del detalle).
+
+        A igual valor de ``orden`` las filas siguen en el orden original.
+        """
+
+    def detalle(self, filtro, n=10):
+        """Las ``n`` filas más recientes del filtro (columnas del detalle)."""
+        return self.pagina_detalle(filtro, tam=n).filas
+
+
+# ----------------------------------------------------------------
+# 1) PANDAS
+# ----------------------------------------------------------------
+class MotorPandas(MotorConsultas):
+    """DataFrame en memoria con índice de filtros y cubo de totales."""
+
+    nombre = 'pandas'
+
+    def __init__(self, df, version=None, indice=None, cubo=None):
+        self.df = df
+        self.version = version
+        self.filas_totales = len(df)
+        # Índice y cubo ya construidos (por ejemplo, mapeados desde disco) o se preparan aquí
+        self.indice, self.cubo = (indice, cubo) if indice is not None else pipeline.preparar(df)
+        self.anio_min, self.anio_max = self.indice.anio_min, self.indice.anio_max
+        # Las filas de los últimos filtros, que piden la dispersión, las agregaciones y el detalle
+        self._filtrar = lru_cache(maxsize=4)(lambda filtro: pipeline.filtrar(self.indice, filtro))
+
+    def opciones(self):
+        return pipeline.opciones_filtros(self.df)
+
+    def filas(self, filtro, columnas=None):
+        # Sin copiar: las filas ya están en memoria con todas sus columnas
+        return self._filtrar(filtro)
+
+    def bloques(self, filtro, filas_por_bloque, columnas=None):
+        # Solo las posiciones del filtro (8 bytes por fila); cada bloque se copia al pedirlo
+        posiciones = self.indice.posiciones(*filtro)
+        for inicio in range(0, max(len(posiciones), 1), filas_por_bloque):
+            bloque = self.df.take(posiciones[inicio:inicio + filas_por_bloque])
+            yield bloque if columnas is None else bloque[columnas]
+
+    def metricas(self, filtro):
+        return pipeline.metricas(self.cubo, filtro)
+
+    def agregar(self, filtro):
+        return agregar(self._filtrar(filtro))
+
+    def pagina_detalle(self, filtro, orden='Year', descendente=True, pagina=0, tam=tablas.TAM_PAGINA):
+        return tablas.paginar(self._filtrar(filtro), orden, descendente, pagina, tam, columnas=COLUMNAS_DETALLE)
+
+
+# ----------------------------------------------------------------
+# 2) DUCKDB
+# ----------------------------------------------------------------
+def _literal(texto):
+    return "'" + str(texto).replace("'", "''") + "'"
+
+
+def _donde(filtro):
+    """Cláusula ``WHERE`` y parámetros de un filtro."""
+    condiciones = ['"Year" BETWEEN ? AND ?']
+    parametros = [filtro.anio_inicio, filtro.anio_fin]
+    for columna, seleccion in (('Country', filtro.paises), ('Disaster Type', filtro.tipos),
+                               ('Disaster Subgroup', filtro.subgrupos)):
+        if seleccion:
+            condiciones.append(f'"{columna}" IN ({", ".join("?" * len(seleccion))})')
+            parametros.extend(seleccion)
+    return " AND ".join(condiciones), parametros
+
+
+def _suma(medida, condicion=None):
+    valor = f'"{medida}"' if condicion is None else f'CASE WHEN {condicion} THEN "{medida}" END'
+    tipo = 'BIGINT' if medida == 'Total Events' else 'DOUBLE'
+    return f'CAST(COALESCE(SUM({valor}), 0) AS {tipo})'
+
+
+def _totales(valores):
+    return {medida: valor for medida, valor in zip(MEDIDAS, valores)}
+
+
+def version_archivos(patron):
+    """Identificador corto del contenido de un archivo o, si es un patrón glob, de sus archivos."""
+    rutas = sorted(glob.glob(patron))
+    if not rutas:
+        raise FileNotFoundError(f"No hay archivos Parquet en {patron}")
+    if len(rutas) == 1:
+        return hash_archivo(rutas[0])[:16]
+    h = hashlib.sha256()
+    for ruta in rutas:
+        estado = os.stat(ruta)
+        h.update(f"{ruta}|{estado.st_size}|{estado.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+class MotorDuckDB(MotorConsultas):
+    """SQL embebido de DuckDB sobre uno o varios archivos Parquet."""
+
+    nombre = 'duckdb'
+
+    def __init__(self, ruta, esquema='perfiles', version=None):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("DESASTRES_MOTOR=duckdb requiere el paquete duckdb (pip install duckdb)") from e
+        if esquema not in ESQUEMAS:
+            raise ValueError(f"Esquema desconocido: {esquema!r} (opciones: {', '.join(ESQUEMAS)})")
+
+        self.ruta = ruta
+        self.version = version or version_archivos(ruta)
+        self._con = duckdb.connect()
+        columnas = ", ".join(f'{expresion} AS "{columna}"' for columna, expresion in ESQUEMAS[esquema].items())
+        # filename y file_row_number conservan el orden original de las filas
+        self._con.execute(
+            f"CREATE VIEW eventos AS SELECT {columnas}, filename, file_row_number "
+            f"FROM read_parquet({_literal(ruta)}, filename = true, file_row_number = true)"
+        )
+        self.filas_totales, anio_min, anio_max = self._fila('SELECT COUNT(*), MIN("Year"), MAX("Year") FROM eventos')
+        if self.filas_totales:
+            self.anio_min, self.anio_max = int(anio_min), int(anio_max)
+
+    def _consultar(self, sql, parametros=()):
+        # Un cursor por consulta: cada sesión de Streamlit corre en su propio hilo
+        with self._con.cursor() as cursor:
+            return cursor.execute(sql, list(parametros)).df()
+
+    def _fila(self, sql, parametros=()):
+        with self._con.cursor() as cursor:
+            return cursor.execute(sql, list(parametros)).fetchone()
+
+    def _distintos(self, columna):
+        return self._consultar(
+            f'SELECT DISTINCT "{columna}" FROM eventos WHERE "{columna}" IS NOT NULL ORDER BY 1'
+        )[columna].tolist()
+
+    def opciones(self):
+        return tuple(self._distintos(c) for c in ('Country', 'Year', 'Disaster Type', 'Disaster Subgroup'))
+
+    def filas(self, filtro, columnas=None):
+        donde, parametros = _donde(filtro)
+        seleccion = ", ".join(f'"{c}"' for c in (columnas or _COLUMNAS))
+        with perfilado.etapa("duckdb.filas") as registro:
+            filas = self._consultar(
+                f"SELECT {seleccion} FROM eventos WHERE {donde} ORDER BY filename, file_row_number", parametros
+            )
+            registro['filas_salida'] = len(filas)
+        return filas
+
+    def bloques(self, filtro, filas_por_bloque, columnas=None):
+        donde, parametros = _donde(filtro)
+        seleccion = ", ".join(f'"{c}"' for c in (columnas or _COLUMNAS))
+        with self._con.cursor() as cursor:
+            # DuckDB entrega el resultado por lotes de Arrow; a Python nunca llega completo
+            lector = cursor.execute(
+                f"SELECT {seleccion} FROM eventos WHERE {donde} ORDER BY filename, file_row_number", list(parametros)
+            ).fetch_record_batch(filas_por_bloque)
+            vacio = True
+            for lote in lector:
+                vacio = False
+                yield lote.to_pandas()
+            if vacio:
+                yield lector.schema.empty_table().to_pandas()
+
+    def metricas(self, filtro):
+        donde, parametros = _donde(filtro)
+        # El rango anterior termina un año antes: una sola pasada calcula los dos
+        anterior = f'"Year" < {int(filtro.anio_fin)}'
+        columnas = [_suma(m) for m in MEDIDAS] + [_suma(m, anterior) for m in MEDIDAS]
+        with perfilado.etapa("duckdb.metricas"):
+            valores = self._fila(f"SELECT {', '.join(columnas)} FROM eventos WHERE {donde}", parametros)
+        actual = _totales(valores[:len(MEDIDAS)])
+        if filtro.anio_fin > filtro.anio_inicio:
+            return actual, _totales(valores[len(MEDIDAS):])
+        return actual, {medida: 0 for medida in actual}
+
+    def agregar(self, filtro):
+        donde, parametros = _donde(filtro)
+        # ISO y subgrupo dependen del país y del tipo: se toma uno por grupo
+        sumas = ", ".join(f'{_suma(m)} AS "{m}"' for m in MEDIDAS)
+        with perfilado.etapa("duckdb.resumen") as registro:
+            resumen = self._consultar(
+                f'SELECT "Country", "Disaster Type", "Year", MIN("ISO") AS "ISO", '
+                f'MIN("Disaster Subgroup") AS "Disaster Subgroup", {sumas} '
+                f'FROM eventos WHERE {donde} GROUP BY 1, 2, 3 ORDER BY 1, 2, 3',
+                parametros,
+            )
+            registro['filas_salida'] = len(resumen)
+        return agregar(resumen)
+
+    def pagina_detalle(self, filtro, orden='Year', descendente=True, pagina=0, tam=tablas.TAM_PAGINA):
+        if orden not in COLUMNAS_DETALLE:
+            raise ValueError(f"No se puede ordenar el detalle por {orden!r}")
+        donde, parametros = _donde(filtro)
+        seleccion = ", ".join(f'"{c}"' for c in COLUMNAS_DETALLE)
+        with perfilado.etapa("duckdb.detalle") as registro:
+            total, = self._fila(f"SELECT COUNT(*) FROM eventos WHERE {donde}", parametros)
+            pagina = tablas.ajustar_pagina(pagina, total, tam)
+            # Solo la página pedida sale de DuckDB; los nulos al final, como en pandas
+            filas = self._consultar(
+                f'SELECT {seleccion} FROM eventos WHERE {donde} '
+                f'ORDER BY "{orden}" {"DESC" if descendente else "ASC"} NULLS LAST, filename, file_row_number '
+                f'LIMIT {int(tam)} OFFSET {pagina * int(tam)}',
+                parametros,
+            )
+            registro['filas_salida'] = len(filas)
+        return tablas.Pagina(filas, int(total), pagina, tam, orden, descendente)
+
+
+# ----------------------------------------------------------------
+# 3) SELECCIÓN DEL MOTOR
+# ----------------------------------------------------------------
+def crear_motor(nombre=MOTOR, ruta_parquet=RUTA_PARQUET, esquema=ESQUEMA, publicacion=None,
+                dir_almacen=ingesta.DIR_ALMACEN, ruta_datos=RUTA_DATOS, dir_cache=DIR_CACHE, limpiar=True):
+    """Motor de consultas configurado (ver el docstring del módulo).
+
+    Con ``publicacion`` los datos salen de esa publicación del almacén; si no,
+    del Excel ``ruta_datos`` y su caché Parquet en ``dir_cache``. Con
+    ``limpiar=False`` construir la caché no borra las de otras versiones (ver
+    :func:`desastres.datos.construir_cache`).
+    """
+    if nombre not in MOTORES:
+        raise ValueError(f"Motor de consultas desconocido: {nombre!r} (opciones: {', '.join(MOTORES)})")
+    if publicacion is not None:
+        return _motor_publicacion(nombre, publicacion, dir_almacen)
+    if nombre == 'pandas':
+        with perfilado.etapa("version"):
+            version = version_datos(ruta_datos)
+        return _motor_pandas(version, lambda: pipeline.cargar(ruta=ruta_datos, dir_cache=dir_cache, limpiar=limpiar))
+    if ruta_parquet:
+        return MotorDuckDB(ruta_parquet, esquema)
+    # Sin archivo propio: la caché Parquet del Excel, que se construye si falta
+    version = version_datos(ruta_datos)
+    ruta_parquet = ruta_cache(version, dir_cache)
+    if not os.path.exists(ruta_parquet):
+        construir_cache(ruta_datos, dir_cache=dir_cache, version=version, limpiar=limpiar)
+    return MotorDuckDB(ruta_parquet, 'perfiles', version)
+
+
+def _motor_publicacion(nombre, publicacion, dir_almacen):
+    manifiesto = ingesta.leer_manifiesto(dir_almacen)
+    if publicacion not in manifiesto:
+        raise KeyError(f"La publicación {publicacion!r} no está en el almacén {dir_almacen}")
+    version = manifiesto[publicacion]['version']
+    if nombre == 'duckdb':
+        return MotorDuckDB(ingesta.patron_publicacion(publicacion, dir_almacen), 'perfiles', version)
+    return _motor_pandas(version, lambda: ingesta.cargar_publicacion(publicacion, dir_almacen, compacto=TIPOS_COMPACTOS))
+
+
+def _motor_pandas(version, cargar):
+    """:class:`MotorPandas` de una versión; ``cargar()`` devuelve su DataFrame.
+
+    Con ``DESASTRES_MEMORIA_COMPARTIDA=1`` los datos, el índice y el cubo se
+    mapean desde disco (ver :mod:`desastres.memoria_compartida`) y solo el
+    primer proceso los carga y los escribe.
+    """
+    if memoria_compartida.ACTIVADA:
+        with perfilado.etapa("mapear") as registro:
+            mapeado = memoria_compartida.mapear(version)
+            registro['cache'] = 'acierto' if mapeado is not None else 'fallo'
+        if mapeado is None:
+            with perfilado.etapa("cargar_datos") as registro:
+                df = cargar()
+                registro['filas_salida'] = len(df)
+            with perfilado.etapa("publicar"):
+                memoria_compartida.publicar(df, version)
+            mapeado = memoria_compartida.mapear(version)
+        df, indice, cubo = mapeado
+        return MotorPandas(df, version, indice, cubo)
+    with perfilado.etapa("cargar_datos") as registro:
+        df = cargar()
+        registro['filas_salida'] = len(df)
+    with perfilado.etapa("preparar"):
+        return MotorPandas(df, version)
+
+
+
+# Motores cargados en el proceso, por publicación (None: el Excel); se conservan los MAX_MOTORES más recientes
+MAX_MOTORES = 2
+_motores = OrderedDict()
+_cargas = {}
+_candado_motores = threading.Lock()
+
+
+def motor_compartido(publicacion=None, crear=crear_motor):
+    """Motor de ``publicacion`` para todo el proceso, cargado con ``crear(publicacion=...)``.
+
+    Se carga una sola vez aunque lo pidan a la vez varias sesiones y el hilo
+    de precalentamiento: los demás esperan esa carga. No usa Streamlit, así
+    que se puede llamar desde cualquier hilo.
+    """
+    with _candado_motores:
+        if publicacion in _motores:
+            _motores.move_to_end(publicacion)
+            return _motores[publicacion]
+        candado = _cargas.setdefault(publicacion, threading.Lock())
+    with candado:
+        with _candado_motores:
+            if publicacion in _motores:
+                return _motores[publicacion]
+        try:
+            motor = crear(publicacion=publicacion)
+        finally:
+            with _candado_motores:
+                _cargas.pop(publicacion, None)
+        with _candado_motores:
+            _motores[publicacion] = motor
+            while len(_motores) > MAX_MOTORES:
+                _motores.popitem(last=False)
+    return motor
+
+# ----------------------------------------------------------------
+# 4) COMPARACIÓN DE MOTORES
+# ----------------------------------------------------------------
+def _normalizar_tabla(tabla):
+    """Tabla comparable entre motores: índice nuevo, números como float y texto como objeto.
+
+    Las columnas vacías o sin valores también pasan a float, porque su tipo
+    depende del motor.
+    """
+    tabla = tabla.reset_index(drop=True)
+    columnas = {}
+    for columna in tabla.columns:
+        serie = tabla[columna]
+        if pd.api.types.is_numeric_dtype(serie) or serie.isna().all():
+            columnas[columna] = serie.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            columnas[columna] = serie.astype(object).to_numpy()
+    return pd.DataFrame(columnas)
+
+
+def _diferencias(a, b, nombre):
+    """Lista de descripciones de las diferencias entre dos resultados."""
+    if isinstance(a, dict):
+        return [f"{nombre}[{k}]: {a[k]} != {b[k]}" for k in a if not np.isclose(a[k], b[k], rtol=1e-9)]
+    if isinstance(a, pd.DataFrame):
+        try:
+            pd.testing.assert_frame_equal(_normalizar_tabla(a), _normalizar_tabla(b), rtol=1e-9)
+        except AssertionError as e:
+            return [f"{nombre}: {str(e).splitlines()[0]}"]
+        return []
+    # AgregadosFiltro
+    diferencias = [] if a.columna_subgrupo == b.columna_subgrupo else [f"{nombre}.columna_subgrupo"]
+    for campo, tabla in vars(a).items():
+        if isinstance(tabla, pd.DataFrame):
+            diferencias += _diferencias(tabla, getattr(b, campo), f"{nombre}.{campo}")
+    return diferencias
+
+
+def comparar(motor_a, motor_b, filtros):
+    """Compara opciones, métricas, agregaciones, detalle, páginas y filas en cada filtro.
+
+    Devuelve ``(diferencias, tiempos)``: una lista de textos (vacía si todo
+    coincide) y ``{motor: {consulta: ms totales}}``.
+    """
+    from desastres import dispersion
+
+    diferencias = [] if motor_a.opciones() == motor_b.opciones() else ["opciones"]
+    tiempos = {motor_a.nombre: {}, motor_b.nombre: {}}
+    consultas = {
+        'metricas': lambda motor, filtro: motor.metricas(filtro),
+        'agregar': lambda motor, filtro: motor.agregar(filtro),
+        'detalle': lambda motor, filtro: motor.detalle(filtro),
+        # Otro orden y una página que no es la primera (con nulos y empates)
+        'pagina': lambda motor, filtro: motor.pagina_detalle(filtro, 'Total Affected', False, 2).filas,
+        'filas': lambda motor, filtro: motor.filas(filtro, dispersion.COLUMNAS)[dispersion.COLUMNAS],
+    }
+    for nombre, filtro in filtros.items():
+        for consulta, ejecutar in consultas.items():
+            resultados = []
+            for motor in (motor_a, motor_b):
+                inicio = time.perf_counter()
+                resultados.append(ejecutar(motor, filtro))
+                acumulado = tiempos[motor.nombre].get(consulta, 0.0)
+                tiempos[motor.nombre][consulta] = acumulado + (time.perf_counter() - inicio) * 1000
+            if consulta == 'metricas':
+                for a, b, periodo in zip(*resultados, ('actual', 'anterior')):
+                    diferencias += _diferencias(a, b, f"{nombre}.metricas.{periodo}")
+            else:
+                diferencias += _diferencias(*resultados, f"{nombre}.{consulta}")
+    return diferencias, tiempos
+
+
+def filtros_comparacion(motor, multiples=50, semilla=0):
+    """Filtros de ``--comparar``: la matriz de :mod:`desastres.rendimiento` y ``multiples`` selecciones aleatorias."""
+    from desastres.cache_resultados import normalizar_filtro
+    from desastres.filtros import selecciones_multiples
+    from desastres.rendimiento import matriz_filtros
+
+    filtros = matriz_filtros(motor.indice)
+    seleccionados = selecciones_multiples(motor.indice, motor.anio_min, motor.anio_max, multiples, semilla)
+    for i, (pais, anio_inicio, anio_fin, tipo, subgrupo) in enumerate(seleccionados):
+        filtros[f"multiple_{i}"] = normalizar_filtro(pais, anio_inicio, anio_fin, tipo,
+                                                     motor.anio_min, motor.anio_max, subgrupo)
+    return filtros
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Motores de consulta del dashboard.")
+    parser.add_argument("--comparar", action="store_true",
+                        help="verifica que pandas y DuckDB dan los mismos resultados sobre la caché Parquet")
+    parser.add_argument("--multiples", type=int, default=50, help="selecciones múltiples aleatorias a comparar")
+    args = parser.parse_args(argv)
+
+    if not args.comparar:
+        parser.print_help()
+        return 0
+
+    try:
+        duck = crear_motor('duckdb')
+    except ImportError as e:
+        print(e, file=sys.stderr)
+        return 1
+    local = crear_motor('pandas')
+
+    filtros = filtros_comparacion(local, args.multiples)
+    diferencias, tiempos = comparar(local, duck, filtros)
+    print(f"{len(filtros)} filtros sobre {local.filas_totales:,} filas")
+    print(f"{'consulta':<12}" + "".join(f"{nombre + ' ms':>14}" for nombre in tiempos))
+    for consulta in tiempos[local.nombre]:
+        print(f"{consulta:<12}" + "".join(f"{t[consulta]:>14.1f}" for t in tiempos.values()))
+    for diferencia in diferencias[:20]:
+        print(f"DIFERENCIA {diferencia}")
+    print("Resultados idénticos." if not diferencias else f"{len(diferencias)} diferencias.")
+    return 0 if not diferencias else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Perfilado opcional por etapas de cada ejecución del dashboard.
+
+Se activa con ``DESASTRES_PERFILADO=1`` o con ``?perfilado=1`` en la URL. Cada
+etapa con nombre (carga, filtro, métricas, agregaciones, construcción y
+serialización de cada figura, ``st.plotly_chart``...) registra su duración,
+las filas de entrada y salida y, para las figuras, los bytes del JSON. Los
+registros de una ejecución se muestran en un panel plegable y se agregan como
+líneas JSON a ``DESASTRES_PERFILADO_ARCHIVO`` (``perfilado.jsonl`` por
+defecto; vacío para no escribir). Percentiles por etapa de ese archivo::
+
+    python -m desastres.perfilado perfilado.jsonl
+
+El módulo no depende de Streamlit: el perfil activo se guarda en una
+``ContextVar``, así que cada sesión (cada hilo de ejecución) registra solo lo
+suyo y, sin perfil activo, :func:`etapa` apenas cuesta una consulta.
+"""
+import argparse
+import json
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import numpy as np
+
+from desastres.config import bool_env, texto_env
+
+ACTIVADO = bool_env("DESASTRES_PERFILADO", False)
+ARCHIVO = texto_env("DESASTRES_PERFILADO_ARCHIVO", "perfilado.jsonl")
+
+_perfil_actual = ContextVar("perfil_actual", default=None)
+
+
+class Perfil:
+    """Registros de las etapas de una ejecución."""
+
+    def __init__(self, ejecucion):
+        self.ejecucion = ejecucion
+        self.id = uuid.uuid4().hex[:12]
+        self.inicio = time.time()
+        self.registros = []
+        self._nivel = 0
+
+    def total_ms(self):
+        return sum(r['ms'] for r in self.registros if r['nivel'] == 0)
+
+    def lineas_json(self):
+        for registro in self.registros:
+            yield json.dumps({'ejecucion': self.ejecucion, 'id': self.id, 'ts': round(self.inicio, 3), **registro},
+                             ensure_ascii=False)
+
+
+def activo():
+    """Indica si hay un perfil activo en el contexto actual."""
+    return _perfil_actual.get() is not None
+
+
+@contextmanager
+def perfilar(ejecucion, activar=True, archivo=ARCHIVO):
+    """Activa un perfil durante el bloque; al terminar agrega sus registros a ``archivo``.
+
+    Con ``activar=False`` no hace nada y devuelve ``None``.
+    """
+    if not activar:
+        yield None
+        return
+    perfil = Perfil(ejecucion)
+    token = _perfil_actual.set(perfil)
+    try:
+        yield perfil
+    finally:
+        _perfil_actual.reset(token)
+        escribir(perfil, archivo)
+
+
+@contextmanager
+def etapa(nombre, **campos):
+    """Mide una etapa del perfil activo.
+
+    Devuelve el registro (un diccionario) para que el bloque agregue campos
+    como ``filas_salida`` o ``bytes``; sin perfil activo devuelve un
+    diccionario descartable.
+    """
+    perfil = _perfil_actual.get()
+    if perfil is None:
+        yield {}
+        return
+    registro = {'etapa': nombre, 'nivel': perfil._nivel, 'ms': 0.0, **campos}
+    perfil.registros.append(registro)
+    perfil._nivel += 1
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro['ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+        perfil._nivel -= 1
+
+
+def escribir(perfil, archivo=ARCHIVO):
+    """Agrega los registros del perfil al archivo de líneas JSON."""
+    if not archivo or not perfil.registros:
+        return
+    try:
+        with open(archivo, "a", encoding="utf-8") as f:
+            f.write("\n".join(perfil.lineas_json()) + "\n")
+    except OSError:
+        # Sin permisos de escritura: el panel sigue funcionando
+        pass
+
+
+# ----------------------------------------------------------------
+# RESUMEN DEL ARCHIVO
+# ----------------------------------------------------------------
+def percentiles(registros):
+    """``{etapa: {'n', 'p50_ms', 'p99_ms', 'max_ms', 'bytes_p50'}}`` de una lista de registros."""
+    por_etapa = {}
+    for registro in registros:
+        por_etapa.setdefault(registro['etapa'], []).append(registro)
+    resumen = {}
+    for nombre, propios in por_etapa.items():
+        tiempos = np.array([r['ms'] for r in propios])
+        tamanos = [r['bytes'] for r in propios if r.get('bytes') is not None]
+        resumen[nombre] = {
+            'n': len(propios),
+            'p50_ms': float(np.percentile(tiempos, 50)),
+            'p99_ms': float(np.percentile(tiempos, 99)),
+            'max_ms': float(tiempos.max()),
+            'bytes_p50': int(np.percentile(tamanos, 50)) if tamanos else None,
+        }
+    return resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Percentiles por etapa de un archivo de perfilado.")
+    parser.add_argument("archivo", nargs="?", default=ARCHIVO or "perfilado.jsonl")
+    parser.add_argument("--ejecucion", help="Solo registros de este tipo de ejecución (p. ej. tablero)")
+    parser.add_argument("--json", action="store_true", help="Imprime el resumen como JSON")
+    args = parser.parse_args(argv)
+
+    with open(args.archivo, encoding="utf-8") as f:
+        registros = [json.loads(linea) for linea in f if linea.strip()]
+    if args.ejecucion:
+        registros = [r for r in registros if r.get('ejecucion') == args.ejecucion]
+    resumen = percentiles(registros)
+
+    if args.json:
+        print(json.dumps(resumen, ensure_ascii=False, indent=2))
+        return 0
+    print(f"{'etapa':<32}{'n':>7}{'p50 ms':>10}{'p99 ms':>10}{'máx ms':>10}{'bytes p50':>11}")
+    for nombre, r in sorted(resumen.items(), key=lambda item: -item[1]['p99_ms']):
+        tamano = f"{r['bytes_p50']:,}" if r['bytes_p50'] is not None else "-"
+        print(f"{nombre:<32}{r['n']:>7}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['max_ms']:>10.2f}{tamano:>11}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
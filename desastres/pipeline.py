@@ -0,0 +1,75 @@
+"""Etapas del dashboard como funciones importables, sin Streamlit.
+
+El dashboard encadena estas etapas en cada ejecución::
+
+    cargar → preparar (índice y cubo) → filtrar → métricas → agregar → figuras → serializar
+
+Tenerlas fuera de ``dashboard_streamlit.py`` permite medirlas por separado
+(ver :mod:`desastres.rendimiento`) sin levantar el servidor.
+"""
+from desastres import graficos
+from desastres.agregados import agregar
+from desastres.config import TIPOS_COMPACTOS
+from desastres.cubo import CuboDesastres
+from desastres.datos import cargar_datos_limpios
+from desastres.filtros import IndiceFiltros
+
+__all__ = [
+    'cargar', 'preparar', 'opciones_filtros', 'filtrar', 'metricas', 'agregar', 'figuras', 'serializar',
+]
+
+
+def cargar(compacto=TIPOS_COMPACTOS, **kwargs):
+    """Etapa 1: DataFrame limpio (caché Parquet o Excel)."""
+    return cargar_datos_limpios(compacto=compacto, **kwargs)
+
+
+def preparar(df):
+    """Etapa 2: estructuras que se construyen una vez por versión de los datos.
+
+    Devuelve ``(indice, cubo)``.
+    """
+    return IndiceFiltros(df), CuboDesastres.desde_df(df)
+
+
+def opciones_filtros(df):
+    """Opciones de los selectores: ``(países, años, tipos de desastre, subgrupos)``."""
+    subgrupos = df['Disaster Subgroup'].dropna().unique() if 'Disaster Subgroup' in df.columns else []
+    return (
+        sorted(df['Country'].unique()),
+        sorted(df['Year'].unique()),
+        sorted(df['Disaster Type'].unique()),
+        sorted(subgrupos),
+    )
+
+
+def filtrar(indice, filtro):
+    """Etapa 3: filas de un :class:`~desastres.cache_resultados.Filtro` normalizado."""
+    return indice.filtrar(*filtro)
+
+
+def metricas(cubo, filtro):
+    """Etapa 4: totales del rango elegido y del rango que termina un año antes.
+
+    Devuelve ``(actual, anterior)``, dos diccionarios ``{medida: total}``. Si
+    el rango es de un solo año no hay período anterior y sus totales son cero.
+    """
+    actual = cubo.totales(*filtro)
+    if filtro.anio_fin > filtro.anio_inicio:
+        anterior = cubo.totales(*filtro._replace(anio_fin=filtro.anio_fin - 1))
+    else:
+        anterior = {medida: 0 for medida in actual}
+    return actual, anterior
+
+
+# Etapa 5: agregar(df_filtrado), en desastres.agregados
+
+
+def figuras(df_filtrado, agregados, anio_inicio, anio_fin):
+    """Etapa 6: constructores de cada figura, por nombre (ver :func:`graficos.constructores`)."""
+    return graficos.constructores(df_filtrado, agregados, anio_inicio, anio_fin)
+
+
+def serializar(fig):
+    """Etapa 7: JSON adelgazado que se envía al navegador."""
+    return graficos.adelgazar_figura(fig).to_json()
@@ -0,0 +1,158 @@
+"""Precalentamiento en segundo plano de los filtros más pedidos.
+
+Después de un despliegue, el primer usuario pagaba la carga de los datos y
+todos los cálculos del filtro por defecto. Con el precalentamiento, la primera
+ejecución del dashboard en el proceso lanza un hilo que carga el motor de
+consultas (ver :func:`desastres.motores.motor_compartido`) y calcula, para cada
+filtro "caliente", las agregaciones y las figuras que el
+dashboard guarda en la caché de resultados compartida, con las mismas claves. Así la primera petición real ya las encuentra en caché.
+
+Los filtros calientes son el filtro por defecto (todos los países, 2000-2024,
+todos los desastres), el de cada uno de los ``DESASTRES_PRECALENTAR_TOP``
+países con más eventos y los del archivo JSON ``DESASTRES_PRECALENTAR_ARCHIVO``,
+una lista de objetos como::
+
+    [{"paises": ["Chile", "Peru"], "anio_inicio": 2010, "anio_fin": 2020,
+      "tipos": ["Flood"], "subgrupos": []}]
+
+Al terminar se registra con ``logging`` (``desastres.precalentamiento``)
+cuántos filtros se calcularon y cuánto tardó. Se desactiva con
+``DESASTRES_PRECALENTAR=0``.
+"""
+import json
+import logging
+import threading
+import time
+
+from desastres import dispersion, graficos, tablas
+from desastres.cache_resultados import cache_compartida, normalizar_filtro
+from desastres.config import bool_env, entero_env, texto_env
+
+logger = logging.getLogger("desastres.precalentamiento")
+
+ACTIVADO = bool_env("DESASTRES_PRECALENTAR", True)
+TOP_PAISES = entero_env("DESASTRES_PRECALENTAR_TOP", 10)
+ARCHIVO = texto_env("DESASTRES_PRECALENTAR_ARCHIVO")
+
+
+def anios_defecto(lista_anios):
+    """Rango por defecto del dashboard: 2000-2024, o los extremos si los datos no los incluyen."""
+    return (2000 if 2000 in lista_anios else lista_anios[0],
+            2024 if 2024 in lista_anios else lista_anios[-1])
+
+
+def filtros_calientes(motor, top=TOP_PAISES, archivo=ARCHIVO):
+    """``[(filtro, año inicio, año fin)]`` a precalentar, sin repetidos y en orden de prioridad."""
+    lista_anios = motor.opciones()[1]
+    if not lista_anios:
+        return []
+    anio_inicio, anio_fin = anios_defecto(lista_anios)
+    defecto = normalizar_filtro([], anio_inicio, anio_fin, [], motor.anio_min, motor.anio_max, [])
+    candidatos = [(defecto, anio_inicio, anio_fin)]
+
+    if top > 0:
+        # Los países con más eventos en el rango por defecto (la tabla de resumen ya viene ordenada)
+        resumen = cache_compartida().obtener_o_calcular(
+            ("agregados", motor.version, defecto), lambda: motor.agregar(defecto)
+        ).resumen_paises
+        for pais in resumen['Country'].head(top):
+            candidatos.append((normalizar_filtro([pais], anio_inicio, anio_fin, [], motor.anio_min,
+                                                 motor.anio_max, []), anio_inicio, anio_fin))
+
+    if archivo:
+        with open(archivo, encoding="utf-8") as f:
+            for entrada in json.load(f):
+                inicio, fin = entrada.get('anio_inicio', anio_inicio), entrada.get('anio_fin', anio_fin)
+                candidatos.append((normalizar_filtro(entrada.get('paises', []), inicio, fin, entrada.get('tipos', []),
+                                                     motor.anio_min, motor.anio_max, entrada.get('subgrupos', [])),
+                                   inicio, fin))
+
+    vistos = set()
+    return [c for c in candidatos if not (c in vistos or vistos.add(c))]
+
+
+def precalentar_filtro(motor, filtro, anio_inicio, anio_fin, cache=None):
+    """Calcula y guarda en caché lo que el dashboard pide para ``filtro``.
+
+    Las claves son las de ``dashboard_streamlit.py``: ``("agregados", versión,
+    filtro)`` y, para cada figura, ``(versión, filtro)`` más los años elegidos
+    en el mapa y el orden y la página por defecto en las tablas.
+    """
+    cache = cache_compartida() if cache is None else cache
+    agregados = cache.obtener_o_calcular(("agregados", motor.version, filtro), lambda: motor.agregar(filtro))
+    filas = motor.filas(filtro, dispersion.COLUMNAS)
+    deps = (motor.version, filtro)
+    for nombre, construir in (
+        ('tipos', lambda: graficos.grafico_tipos(agregados)),
+        ('danos', lambda: graficos.grafico_danos(agregados)),
+        ('evolucion', lambda: graficos.grafico_evolucion(agregados)),
+        ('afectados', lambda: graficos.grafico_afectados(agregados)),
+        ('muertes', lambda: graficos.grafico_muertes(agregados)),
+    ):
+        graficos.figura_cacheada(nombre, deps, construir, cache)
+    graficos.figura_cacheada('dispersion', deps, lambda: graficos.grafico_dispersion(filas), cache, adelgazada=True)
+    graficos.figura_cacheada('mapa', deps + (anio_inicio, anio_fin),
+                             lambda: graficos.grafico_mapa(agregados, anio_inicio, anio_fin), cache)
+    graficos.figura_cacheada('tabla_resumen', deps + ('Total Events', True, 0, tablas.TAM_PAGINA),
+                             lambda: graficos.tabla_resumen(graficos.pagina_resumen(agregados)), cache)
+    graficos.figura_cacheada('tabla_detalle', deps + ('Year', True, 0, tablas.TAM_PAGINA),
+                             lambda: graficos.tabla_detalle(motor.pagina_detalle(filtro)), cache)
+
+
+class Precalentamiento:
+    """Estado del hilo de precalentamiento (para mostrarlo o esperarlo)."""
+
+    def __init__(self, obtener_motor, top=TOP_PAISES, archivo=ARCHIVO):
+        self.estado = 'pendiente'      # pendiente, en curso, terminado o error
+        self.filtros = 0
+        self.total = 0
+        self.segundos_carga = None
+        self.segundos = None
+        self.error = None
+        self._hilo = threading.Thread(target=self._ejecutar, args=(obtener_motor, top, archivo),
+                                      name="precalentamiento", daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def esperar(self, timeout=None):
+        """Espera a que termine; devuelve ``True`` si terminó."""
+        self._hilo.join(timeout)
+        return not self._hilo.is_alive()
+
+    def _ejecutar(self, obtener_motor, top, archivo):
+        self.estado = 'en curso'
+        inicio = time.perf_counter()
+        try:
+            motor = obtener_motor()
+            self.segundos_carga = time.perf_counter() - inicio
+            filtros = filtros_calientes(motor, top, archivo)
+            self.total = len(filtros)
+            for filtro, anio_inicio, anio_fin in filtros:
+                precalentar_filtro(motor, filtro, anio_inicio, anio_fin)
+                self.filtros += 1
+        except Exception as e:
+            self.estado, self.error = 'error', e
+            logger.exception("Precalentamiento interrumpido tras %d filtros", self.filtros)
+        else:
+            self.estado = 'terminado'
+        finally:
+            self.segundos = time.perf_counter() - inicio
+        if self.estado == 'terminado':
+            logger.info("Precalentamiento terminado: %d filtros en %.1f s (carga de datos: %.1f s)",
+                        self.filtros, self.segundos, self.segundos_carga)
+
+    def resumen(self):
+        """Texto de una línea con el estado actual."""
+        if self.estado == 'terminado':
+            return (f"Precalentamiento terminado: {self.filtros} filtros en {self.segundos:.1f} s "
+                    f"(carga de datos: {self.segundos_carga:.1f} s).")
+        if self.estado == 'error':
+            return f"Precalentamiento interrumpido tras {self.filtros} filtros: {self.error}"
+        return f"Precalentamiento {self.estado}: {self.filtros} de {self.total or '?'} filtros."
+
+
+def iniciar(obtener_motor, top=TOP_PAISES, archivo=ARCHIVO):
+    """Lanza el precalentamiento en un hilo; ``obtener_motor()`` devuelve el motor del dashboard."""
+    return Precalentamiento(obtener_motor, top, archivo).iniciar()
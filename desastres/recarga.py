@@ -0,0 +1,182 @@
+"""Recarga de los datos cuando se reemplaza el Excel, sin reiniciar.
+
+El motor de consultas se carga una vez por proceso, así que reemplazar el
+Excel de ``data/`` no tenía efecto hasta reiniciar el dashboard (y reiniciar
+vacía todas las cachés). Con la recarga, un hilo revisa cada
+``DESASTRES_RECARGA_SEGUNDOS`` segundos el tamaño y la fecha del archivo. Cuando
+cambian y se mantienen entre dos revisiones (el archivo terminó de copiarse):
+
+1. carga y valida la versión nueva en segundo plano (mientras tanto se sigue
+   usando la anterior),
+2. precalienta los filtros más pedidos de la versión nueva (ver
+   :mod:`desastres.precalentamiento`),
+3. cambia el motor vigente de una sola vez,
+4. elimina de la caché de resultados solo las entradas de la versión
+   anterior (la versión forma parte de cada clave), y
+5. cuando ninguna sesión usa ya el motor anterior, borra su caché Parquet y
+   su publicación en memoria compartida (ver
+   :mod:`desastres.memoria_compartida`).
+
+Si la versión nueva no carga o no es válida se registra el error y se sigue
+con la anterior hasta que el archivo vuelva a cambiar. Se desactiva con
+``DESASTRES_RECARGA=0``.
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+
+from desastres import memoria_compartida, precalentamiento
+from desastres.cache_resultados import cache_compartida
+from desastres.config import bool_env, flotante_env
+from desastres.datos import DIR_CACHE, RUTA_DATOS, eliminar_cache
+
+logger = logging.getLogger("desastres.recarga")
+
+ACTIVADA = bool_env("DESASTRES_RECARGA", True)
+INTERVALO = flotante_env("DESASTRES_RECARGA_SEGUNDOS", 10.0)
+
+
+def firma_archivo(ruta):
+    """``(tamaño, fecha de modificación)`` de ``ruta``, o ``None`` si no existe."""
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return estado.st_size, estado.st_mtime_ns
+
+
+def validar(motor):
+    """Comprueba que el motor tenga filas, años y países; si no, lanza ``ValueError``."""
+    paises, anios = motor.opciones()[:2]
+    if not motor.filas_totales or not paises or not anios:
+        raise ValueError(f"La versión {motor.version} no tiene datos ({motor.filas_totales} filas)")
+
+
+class Recarga:
+    """Motor vigente y el hilo que lo reemplaza cuando cambia el archivo de datos.
+
+    ``crear()`` devuelve un motor con los datos actuales del archivo (por
+    ejemplo, :func:`desastres.motores.crear_motor`). Al recargar se llama con
+    ``limpiar=False``, para que la caché Parquet del motor anterior siga
+    existiendo hasta que se lo deje de usar.
+    """
+
+    def __init__(self, crear, ruta=RUTA_DATOS, intervalo=INTERVALO, precalentar=precalentamiento.ACTIVADO,
+                 cache=None, dir_cache=DIR_CACHE, dir_compartida=memoria_compartida.DIR_COMPARTIDA):
+        self._crear = crear
+        self.ruta = ruta
+        self.dir_cache = dir_cache
+        self.dir_compartida = dir_compartida
+        self.intervalo = intervalo
+        self.precalentar = precalentar
+        self._cache = cache
+        self._firma = firma_archivo(ruta)
+        self._pendiente = None      # firma nueva vista en la revisión anterior
+        self.motor = crear()
+        self.recargas = 0
+        self.error = None
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._vigilar, name="recarga", daemon=True)
+
+    @property
+    def version(self):
+        return self.motor.version
+
+    def iniciar(self):
+        if self.intervalo > 0:
+            self._hilo.start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo.is_alive():
+            self._hilo.join()
+
+    def _vigilar(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.revisar()
+            except Exception:
+                logger.exception("Error al revisar %s", self.ruta)
+
+    def revisar(self):
+        """Una revisión del archivo; devuelve ``True`` si cambió el motor vigente."""
+        firma = firma_archivo(self.ruta)
+        if firma is None or firma == self._firma:
+            self._pendiente = None
+            return False
+        if firma != self._pendiente:
+            # Todavía se puede estar copiando: se carga cuando no cambie entre dos revisiones
+            self._pendiente = firma
+            return False
+        self._firma, self._pendiente = firma, None
+        return self.recargar()
+
+    def recargar(self):
+        """Carga, valida, precalienta y cambia a la versión actual del archivo.
+
+        Devuelve ``True`` si cambió el motor vigente.
+        """
+        anterior = self.motor
+        inicio = time.perf_counter()
+        nuevo = None
+        try:
+            nuevo = self._crear(limpiar=False)
+            validar(nuevo)
+        except Exception as e:
+            self.error = e
+            logger.exception("No se pudo cargar la versión nueva de %s; se sigue con la versión %s",
+                             self.ruta, anterior.version)
+            if nuevo is not None and nuevo.version != anterior.version:
+                # Ninguna sesión llegó a usarlo
+                self._liberar(nuevo.version)
+            return False
+        self.error = None
+        if nuevo.version == anterior.version:
+            return False
+
+        if self.precalentar:
+            for filtro, anio_inicio, anio_fin in precalentamiento.filtros_calientes(nuevo):
+                precalentamiento.precalentar_filtro(nuevo, filtro, anio_inicio, anio_fin, self._cache)
+        self.motor = nuevo
+        self.recargas += 1
+
+        cache = cache_compartida() if self._cache is None else self._cache
+        eliminadas = cache.invalidar_version(anterior.version)
+        self._liberar_al_soltar(anterior)
+        logger.info("Datos recargados: versión %s -> %s en %.1f s (%d entradas de caché eliminadas)",
+                    anterior.version, nuevo.version, time.perf_counter() - inicio, eliminadas)
+        return True
+
+    def _liberar_al_soltar(self, motor):
+        # Las sesiones que todavía tienen el motor lo siguen consultando: sus archivos se borran
+        # cuando se libera el último que lo usa
+        weakref.finalize(motor, self._liberar, motor.version)
+
+    def _liberar(self, version):
+        if version == self.motor.version:
+            # El archivo volvió a esa versión
+            return
+        eliminar_cache(version, self.dir_cache)
+        memoria_compartida.liberar(version, self.dir_compartida)
+        logger.info("Archivos de la versión %s liberados", version)
+
+
+def iniciar(crear, ruta=RUTA_DATOS, intervalo=INTERVALO):
+    """Carga el motor con ``crear()`` y empieza a vigilar ``ruta`` en un hilo."""
+    return Recarga(crear, ruta, intervalo).iniciar()
+
+
+_recarga = None
+_candado_recarga = threading.Lock()
+
+
+def compartida(crear, ruta=RUTA_DATOS):
+    """:class:`Recarga` del proceso, iniciada por la primera llamada desde cualquier hilo (sin Streamlit)."""
+    global _recarga
+    with _candado_recarga:
+        if _recarga is None:
+            _recarga = iniciar(crear, ruta)
+        return _recarga
@@ -0,0 +1,282 @@
+"""Benchmark del pipeline del dashboard sin Streamlit.
+
+Mide cada etapa de :mod:`desastres.pipeline` (carga, índice y cubo, filtro,
+métricas, agregación, construcción y serialización de cada figura) sobre una
+matriz de filtros y sobre datos sintéticos de 10×, 100× y 1000× las filas del
+perfil de EM-DAT. Escribe una línea JSON por escala, filtro y etapa, con el
+commit actual, para poder comparar resultados entre commits::
+
+    python -m desastres.rendimiento --salida actual.jsonl
+    python -m desastres.rendimiento --escalas 1 10 --repeticiones 5
+    python -m desastres.rendimiento --comparar base.jsonl actual.jsonl
+
+Al final se indica, por escala, el filtro más lento y si la página completa
+supera ``--limite-ms``.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from desastres import pipeline
+from desastres.cache_resultados import normalizar_filtro
+from desastres.datos import MEDIDAS, TODOS_DESASTRES, TODOS_PAISES, compactar_tipos, memoria_df
+
+ESCALAS = (1, 10, 100, 1000)
+
+# Tiempo de servidor a partir del cual se considera que la página no responde
+LIMITE_PAGINA_MS = 1000
+
+# Etapas que se suman para el tiempo de la página de un filtro
+ETAPAS_PAGINA = ('filtrar', 'metricas', 'agregar')
+
+
+# ----------------------------------------------------------------
+# DATOS SINTÉTICOS Y FILTROS
+# ----------------------------------------------------------------
+def escalar_datos(df, factor, semilla=0):
+    """Conjunto sintético con ``factor`` veces las filas de ``df``.
+
+    Cada copia conserva país, tipo y año (como si hubiera más registros por
+    grupo) y multiplica afectados, muertes y daños por un factor aleatorio
+    entre 0.5 y 1.5, redondeado. La primera copia es ``df`` sin cambios.
+    """
+    if factor == 1:
+        return df
+    n = len(df)
+    escalado = df.take(np.tile(np.arange(n), factor)).reset_index(drop=True)
+    ruido = np.random.default_rng(semilla).uniform(0.5, 1.5, len(escalado))
+    ruido[:n] = 1.0
+    for medida in MEDIDAS:
+        if medida != 'Total Events':
+            valores = escalado[medida].to_numpy(dtype=np.float64, na_value=np.nan)
+            escalado[medida] = np.round(valores * ruido)
+    return compactar_tipos(escalado) if isinstance(df['Country'].dtype, pd.CategoricalDtype) else escalado
+
+
+def matriz_filtros(indice):
+    """Filtros representativos del dashboard: ``{nombre: filtro normalizado}``."""
+    anio_min, anio_max = indice.anio_min, indice.anio_max
+    filas = indice.df
+    paises = [str(p) for p in filas['Country'].value_counts().index]
+    tipos = [str(t) for t in filas['Disaster Type'].value_counts().index]
+    pais, tipo = paises[0], tipos[0]
+    combinaciones = {
+        'todo': (TODOS_PAISES, anio_min, anio_max, TODOS_DESASTRES),
+        'tipo': (TODOS_PAISES, anio_min, anio_max, tipo),
+        'ultimo_anio': (TODOS_PAISES, anio_max, anio_max, TODOS_DESASTRES),
+        'pais': (pais, anio_min, anio_max, TODOS_DESASTRES),
+        'pais_tipo_5_anios': (pais, anio_max - 4, anio_max, tipo),
+        # Selección múltiple: una "región" de 30 países y un grupo de 3 tipos
+        'region_tipos': (paises[:30], anio_min, anio_max, tipos[:3]),
+    }
+    filtros = {nombre: normalizar_filtro(*c, anio_min, anio_max) for nombre, c in combinaciones.items()}
+    if indice.subgrupos:
+        filtros['subgrupo'] = normalizar_filtro(TODOS_PAISES, anio_min, anio_max, TODOS_DESASTRES,
+                                                anio_min, anio_max, subgrupo=indice.subgrupos[0])
+    return filtros
+
+
+# ----------------------------------------------------------------
+# MEDICIÓN
+# ----------------------------------------------------------------
+def _medir(funcion, repeticiones):
+    """Devuelve ``(tiempos en ms, último resultado)``."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos, resultado
+
+
+def _registro(etapa, tiempos, **extra):
+    return {
+        'etapa': etapa,
+        'repeticiones': len(tiempos),
+        'min_ms': round(min(tiempos), 3),
+        'mediana_ms': round(statistics.median(tiempos), 3),
+        **extra,
+    }
+
+
+def _rss_max_mb():
+    # ru_maxrss está en KB en Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def medir_escala(df, repeticiones=3, dir_temporal=None):
+    """Mide todas las etapas para un conjunto de datos; devuelve la lista de registros."""
+    registros = []
+
+    # Carga: lectura del Parquet del conjunto, como la caché del dashboard
+    with tempfile.TemporaryDirectory(dir=dir_temporal) as directorio:
+        ruta = os.path.join(directorio, "datos.parquet")
+        df.to_parquet(ruta, index=False)
+        compacto = isinstance(df['Country'].dtype, pd.CategoricalDtype)
+        tiempos, _ = _medir(lambda: pd.read_parquet(ruta), repeticiones)
+        registros.append(_registro('cargar', tiempos, bytes=os.path.getsize(ruta)))
+
+    tiempos, (indice, cubo) = _medir(lambda: pipeline.preparar(df), repeticiones)
+    registros.append(_registro('preparar', tiempos, bytes=cubo.nbytes()))
+    tiempos, _ = _medir(lambda: pipeline.opciones_filtros(df), repeticiones)
+    registros.append(_registro('opciones', tiempos))
+
+    for nombre, filtro in matriz_filtros(indice).items():
+        anio_inicio, anio_fin = filtro.anio_inicio, filtro.anio_fin
+        por_filtro = []
+        tiempos, filas = _medir(lambda: pipeline.filtrar(indice, filtro), repeticiones)
+        por_filtro.append(_registro('filtrar', tiempos, filas_salida=len(filas)))
+        tiempos, _ = _medir(lambda: pipeline.metricas(cubo, filtro), repeticiones)
+        por_filtro.append(_registro('metricas', tiempos))
+        tiempos, agregados = _medir(lambda: pipeline.agregar(filas), repeticiones)
+        por_filtro.append(_registro('agregar', tiempos))
+
+        # Cada figura se construye y se serializa en la misma repetición
+        # (la serialización adelgaza la figura in situ)
+        for figura, construir in pipeline.figuras(filas, agregados, anio_inicio, anio_fin).items():
+            construccion, serializacion = [], []
+            for _ in range(repeticiones):
+                t0 = time.perf_counter()
+                fig = construir()
+                t1 = time.perf_counter()
+                spec = pipeline.serializar(fig)
+                t2 = time.perf_counter()
+                construccion.append((t1 - t0) * 1000)
+                serializacion.append((t2 - t1) * 1000)
+            por_filtro.append(_registro(f'figura:{figura}', construccion))
+            por_filtro.append(_registro(f'serializar:{figura}', serializacion, bytes=len(spec)))
+
+        pagina = sum(r['mediana_ms'] for r in por_filtro
+                     if r['etapa'] in ETAPAS_PAGINA or ':' in r['etapa'])
+        por_filtro.append({'etapa': 'pagina', 'mediana_ms': round(pagina, 3),
+                           'bytes': sum(r.get('bytes', 0) for r in por_filtro)})
+        for registro in por_filtro:
+            registro['filtro'] = nombre
+        registros.extend(por_filtro)
+
+    for registro in registros:
+        registro.setdefault('filtro', None)
+        registro['compacto'] = compacto
+    registros.append({'etapa': 'memoria', 'filtro': None, 'bytes': memoria_df(df), 'rss_max_mb': _rss_max_mb()})
+    return registros
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(df, escalas=ESCALAS, repeticiones=3, salida=sys.stdout, dir_temporal=None):
+    """Mide cada escala y escribe los registros como líneas JSON; devuelve todos los registros."""
+    commit = _commit()
+    todos = []
+    for escala in escalas:
+        base = {'commit': commit, 'escala': escala}
+        datos = None
+        try:
+            datos = escalar_datos(df, escala)
+            registros = [{**base, 'filas': len(datos), **r} for r in medir_escala(datos, repeticiones, dir_temporal)]
+        except MemoryError:
+            # Las escalas siguientes tampoco entrarían en memoria
+            registros = [{**base, 'filas': len(df) * escala, 'etapa': 'error', 'filtro': None,
+                          'error': 'MemoryError'}]
+        for registro in registros:
+            salida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        salida.flush()
+        todos.extend(registros)
+        del datos
+        if registros[-1]['etapa'] == 'error':
+            break
+    return todos
+
+
+# ----------------------------------------------------------------
+# RESÚMENES
+# ----------------------------------------------------------------
+def resumir(registros, limite_ms=LIMITE_PAGINA_MS, salida=sys.stderr):
+    """Por escala: filas, carga, preparación y la página más lenta de la matriz de filtros."""
+    print(f"{'escala':>7}{'filas':>12}{'cargar ms':>11}{'preparar ms':>13}"
+          f"{'página máx ms':>15}  filtro más lento", file=salida)
+    for escala in sorted({r['escala'] for r in registros}):
+        propios = [r for r in registros if r['escala'] == escala]
+        if propios[-1]['etapa'] == 'error':
+            print(f"{escala:>6}×{propios[-1]['filas']:>12,}  {propios[-1]['error']}", file=salida)
+            continue
+        etapa = {r['etapa']: r for r in propios if r['filtro'] is None}
+        paginas = [r for r in propios if r['etapa'] == 'pagina']
+        lenta = max(paginas, key=lambda r: r['mediana_ms'])
+        aviso = "  EXCEDE EL LÍMITE" if lenta['mediana_ms'] > limite_ms else ""
+        print(f"{escala:>6}×{propios[0]['filas']:>12,}{etapa['cargar']['mediana_ms']:>11.1f}"
+              f"{etapa['preparar']['mediana_ms']:>13.1f}{lenta['mediana_ms']:>15.1f}  {lenta['filtro']}{aviso}",
+              file=salida)
+
+
+def _leer(ruta):
+    with open(ruta) as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def comparar(ruta_base, ruta_nueva, umbral=1.2):
+    """Compara las medianas de dos ejecuciones; devuelve la cantidad de etapas más lentas que ``umbral``."""
+    def por_clave(registros):
+        return {(r['escala'], r['filtro'], r['etapa']): r['mediana_ms'] for r in registros if 'mediana_ms' in r}
+
+    base, nueva = por_clave(_leer(ruta_base)), por_clave(_leer(ruta_nueva))
+    comunes = sorted(set(base) & set(nueva), key=lambda c: (c[0], str(c[1]), c[2]))
+    lentas = 0
+    print(f"{'escala':>7} {'filtro':<18}{'etapa':<26}{'base ms':>10}{'nuevo ms':>10}{'razón':>8}")
+    for clave in comunes:
+        razon = nueva[clave] / base[clave] if base[clave] else float('inf')
+        marca = " <" if razon > umbral else ""
+        lentas += razon > umbral
+        escala, filtro, etapa = clave
+        print(f"{escala:>6}× {str(filtro or '-'):<18}{etapa:<26}{base[clave]:>10.2f}{nueva[clave]:>10.2f}"
+              f"{razon:>8.2f}{marca}")
+    print(f"{lentas} de {len(comunes)} etapas más de {umbral:.1f}× más lentas")
+    return lentas
+
+
+# ----------------------------------------------------------------
+# LÍNEA DE COMANDOS
+# ----------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline del dashboard de desastres.")
+    parser.add_argument("--escalas", type=int, nargs="+", default=list(ESCALAS),
+                        help="Veces las filas del perfil de EM-DAT (por defecto: 1 10 100 1000)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", help="Archivo de líneas JSON (por defecto, la salida estándar)")
+    parser.add_argument("--limite-ms", type=float, default=LIMITE_PAGINA_MS,
+                        help="Tiempo de página a partir del cual se marca la escala")
+    parser.add_argument("--sin-compactar", action="store_true", help="Usa el DataFrame sin tipos compactos")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"),
+                        help="Compara dos archivos de resultados en lugar de medir")
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return 0
+
+    df = pipeline.cargar(compacto=not args.sin_compactar)
+    if args.salida:
+        with open(args.salida, "w") as salida:
+            registros = ejecutar(df, args.escalas, args.repeticiones, salida)
+    else:
+        registros = ejecutar(df, args.escalas, args.repeticiones)
+    resumir(registros, args.limite_ms)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
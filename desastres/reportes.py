@@ -0,0 +1,243 @@
+"""Reportes HTML por país generados por lotes, sin Streamlit.
+
+Para cada país (todos o los indicados) y rango de años se escribe un archivo
+HTML con el contenido del dashboard: las cuatro métricas con su variación
+respecto del período anterior, los siete gráficos y las dos tablas. Además se
+escribe ``index.html`` con un enlace a cada reporte.
+
+El mapa no necesita red: su geometría viene de :mod:`desastres.geometria` y
+el TopoJSON que pide plotly.js se registra en cada página (en
+``world_110m.js``, junto a ``plotly.min.js``, o dentro de cada archivo).
+
+Los reportes se reparten entre un pool de procesos. El proceso principal
+carga los datos una sola vez y los publica como archivos mapeados en memoria
+(ver :mod:`desastres.memoria_compartida`) en un directorio temporal propio,
+que se borra al terminar; cada trabajador los mapea sin copiarlos, así que
+agregar trabajadores casi no agrega memoria.
+
+Uso::
+
+    python -m desastres.reportes --salida reportes/2025-01
+    python -m desastres.reportes --paises Chile Peru --anio-inicio 2010 --anio-fin 2020 --procesos 2
+"""
+import argparse
+import html
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from desastres import geometria, graficos, memoria_compartida, motores
+from desastres.cache_resultados import normalizar_filtro
+from desastres.datos import TODOS_DESASTRES
+
+# Gráficos del reporte, en el orden del dashboard
+GRAFICOS = ('tipos', 'danos', 'evolucion', 'afectados', 'muertes', 'dispersion', 'mapa')
+# Cómo se incluye plotly.js: una vez en el directorio de salida, en cada archivo o desde el CDN
+MODOS_PLOTLYJS = {'directorio': 'directory', 'incluido': True, 'cdn': 'cdn'}
+
+# Motor de cada trabajador (lo crea _iniciar_trabajador)
+_motor = None
+
+_PLANTILLA = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>{titulo}</title>
+{topojson}<style>
+body {{ font-family: sans-serif; margin: 2rem; }}
+.metricas {{ display: flex; gap: 2rem; }}
+.metrica .valor {{ font-size: 1.8rem; }}
+.graficos {{ display: grid; grid-template-columns: 1fr 1fr; gap: 1rem; }}
+table {{ border-collapse: collapse; font-size: 0.9rem; }}
+th, td {{ padding: 0.2rem 0.6rem; text-align: left; border-bottom: 1px solid #ddd; }}
+</style>
+</head>
+<body>
+<h1>{titulo}</h1>
+<div class="metricas">{metricas}</div>
+<div class="graficos">{graficos}</div>
+<h2>Resumen de Desastres por País</h2>
+{resumen}
+<h2>Detalle de Desastres</h2>
+{detalle}
+</body>
+</html>
+"""
+
+
+def nombre_archivo(pais):
+    """Nombre del archivo del reporte de ``pais``."""
+    return re.sub(r"[^\w-]+", "_", pais).strip("_") + ".html"
+
+
+def metricas_reporte(actual, anterior):
+    """``[(etiqueta, valor, variación)]`` con el mismo formato que las métricas del dashboard."""
+    danos, danos_prev = (t['Total Damage (USD, original)'] / 1e6 for t in (actual, anterior))
+    return [
+        ("Total de Eventos", f"{actual['Total Events']:,}",
+         f"{actual['Total Events'] - anterior['Total Events']:+,.0f}"),
+        ("Personas Afectadas", f"{int(actual['Total Affected']):,}",
+         f"{actual['Total Affected'] - anterior['Total Affected']:+,.0f}"),
+        ("Muertes Totales", f"{int(actual['Total Deaths']):,}",
+         f"{actual['Total Deaths'] - anterior['Total Deaths']:+,.0f}"),
+        ("Daños Totales (Millones USD)", f"{danos:.2f}", f"{danos - danos_prev:+.2f}"),
+    ]
+
+
+def _script_topojson(plotlyjs):
+    """Etiqueta que registra el TopoJSON del mapa (vacía si no está el archivo)."""
+    script = geometria.script_topojson()
+    if script is None:
+        return ""
+    if plotlyjs == 'directorio':
+        return f'<script src="{geometria.NOMBRE_TOPOJSON}.js"></script>\n'
+    return f"<script>{script}</script>\n"
+
+
+def _tabla_html(df):
+    return df.to_html(index=False, na_rep="", float_format=lambda v: f"{v:,.0f}", border=0)
+
+
+def reporte_html(motor, pais, anio_inicio, anio_fin, tipos=None, subgrupos=None, plotlyjs='directorio'):
+    """HTML completo del reporte de ``pais``."""
+    filtro = normalizar_filtro([pais], anio_inicio, anio_fin, tipos or [], motor.anio_min, motor.anio_max,
+                               subgrupos)
+    actual, anterior = motor.metricas(filtro)
+    filas = motor.filas(filtro)
+    agregados = motor.agregar(filtro)
+    constructores = graficos.constructores(filas, agregados, anio_inicio, anio_fin)
+
+    # plotly.js va solo con el primer gráfico; los demás llevan únicamente su figura
+    figuras = []
+    for i, nombre in enumerate(GRAFICOS):
+        fig = graficos.adelgazar_figura(constructores[nombre]())
+        figuras.append(fig.to_html(full_html=False, include_plotlyjs=MODOS_PLOTLYJS[plotlyjs] if i == 0 else False,
+                                   config={'displayModeBar': False}))
+
+    # Sin paginación: el detalle completo, del más reciente al más antiguo
+    detalle = motor.pagina_detalle(filtro, tam=max(motor.filas_totales, 1)).filas
+    return _PLANTILLA.format(
+        titulo=html.escape(f"Desastres de origen Natural: {pais}, {anio_inicio}-{anio_fin}"),
+        topojson=_script_topojson(plotlyjs),
+        metricas="".join(
+            f'<div class="metrica"><div>{html.escape(etiqueta)}</div>'
+            f'<div class="valor">{valor}</div><div>{variacion}</div></div>'
+            for etiqueta, valor, variacion in metricas_reporte(actual, anterior)
+        ),
+        graficos="".join(f"<div>{figura}</div>" for figura in figuras),
+        resumen=_tabla_html(agregados.resumen_paises),
+        detalle=_tabla_html(detalle),
+    )
+
+
+# ----------------------------------------------------------------
+# 1) TRABAJADORES
+# ----------------------------------------------------------------
+def _iniciar_trabajador(version, dir_compartida):
+    """Mapea los datos publicados por el proceso principal (sin copiarlos)."""
+    global _motor
+    df, indice, cubo = memoria_compartida.mapear(version, dir_compartida)
+    _motor = motores.MotorPandas(df, version, indice, cubo)
+
+
+def _escribir_reporte(pais, salida, anio_inicio, anio_fin, tipos, subgrupos, plotlyjs, motor=None):
+    """Escribe el reporte de ``pais``; devuelve ``(pais, archivo, ms)``."""
+    inicio = time.perf_counter()
+    contenido = reporte_html(motor or _motor, pais, anio_inicio, anio_fin, tipos, subgrupos, plotlyjs)
+    archivo = nombre_archivo(pais)
+    with open(os.path.join(salida, archivo), "w", encoding="utf-8") as f:
+        f.write(contenido)
+    return pais, archivo, (time.perf_counter() - inicio) * 1000
+
+
+# ----------------------------------------------------------------
+# 2) LOTE
+# ----------------------------------------------------------------
+def generar(paises, salida, anio_inicio, anio_fin, tipos=None, subgrupos=None, procesos=None,
+            plotlyjs='directorio', publicacion=None, progreso=print):
+    """Escribe los reportes de ``paises`` (todos si es ``None``) en ``salida``.
+
+    Devuelve ``({país: (archivo, ms)}, procesos usados)``. Con ``procesos=1``
+    todo corre en el proceso actual, sin pool.
+    """
+    motor = motores.crear_motor('pandas', publicacion=publicacion)
+    todos = motor.opciones()[0]
+    paises = list(paises or todos)
+    desconocidos = sorted(set(paises) - set(todos))
+    if desconocidos:
+        raise ValueError(f"Países desconocidos: {', '.join(desconocidos)}")
+    procesos = min(procesos or os.cpu_count() or 1, len(paises)) or 1
+
+    os.makedirs(salida, exist_ok=True)
+    if plotlyjs == 'directorio':
+        from plotly.offline import get_plotlyjs
+        with open(os.path.join(salida, "plotly.min.js"), "w", encoding="utf-8") as f:
+            f.write(get_plotlyjs())
+        script = geometria.script_topojson()
+        if script is not None:
+            with open(os.path.join(salida, f"{geometria.NOMBRE_TOPOJSON}.js"), "w", encoding="utf-8") as f:
+                f.write(script)
+
+    argumentos = (salida, anio_inicio, anio_fin, tipos, subgrupos, plotlyjs)
+    archivos = {}
+
+    def registrar(pais, archivo, ms):
+        archivos[pais] = (archivo, ms)
+        progreso(f"[{len(archivos):>{len(str(len(paises)))}}/{len(paises)}] {pais}: {ms:,.0f} ms")
+
+    if procesos == 1:
+        for pais in paises:
+            registrar(*_escribir_reporte(pais, *argumentos, motor=motor))
+    else:
+        # Directorio propio: el del dashboard se puede liberar en una recarga y este lote no debe dejar archivos
+        dir_compartida = tempfile.mkdtemp(prefix="desastres-reportes-")
+        try:
+            memoria_compartida.publicar(motor.df, motor.version, dir_compartida)
+            with ProcessPoolExecutor(procesos, initializer=_iniciar_trabajador,
+                                     initargs=(motor.version, dir_compartida)) as pool:
+                futuros = [pool.submit(_escribir_reporte, pais, *argumentos) for pais in paises]
+                for futuro in as_completed(futuros):
+                    registrar(*futuro.result())
+        finally:
+            shutil.rmtree(dir_compartida, ignore_errors=True)
+
+    enlaces = "".join(
+        f'<li><a href="{html.escape(archivos[pais][0])}">{html.escape(pais)}</a></li>' for pais in paises
+    )
+    with open(os.path.join(salida, "index.html"), "w", encoding="utf-8") as f:
+        f.write(f'<!DOCTYPE html>\n<html lang="es"><head><meta charset="utf-8"><title>Reportes {anio_inicio}-{anio_fin}'
+                f'</title></head><body><h1>Reportes por país, {anio_inicio}-{anio_fin}</h1><ul>{enlaces}</ul>'
+                f'</body></html>\n')
+    return archivos, procesos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reportes HTML del dashboard por país, en paralelo.")
+    parser.add_argument("--paises", nargs="+", help="Países a exportar (por defecto, todos)")
+    parser.add_argument("--anio-inicio", type=int, default=2000)
+    parser.add_argument("--anio-fin", type=int, default=2024)
+    parser.add_argument("--tipo", nargs="+", default=[], help=f"Tipos de desastre (por defecto, {TODOS_DESASTRES})")
+    parser.add_argument("--subgrupo", nargs="+")
+    parser.add_argument("--salida", default="reportes", help="Directorio de salida")
+    parser.add_argument("--procesos", type=int, help="Procesos del pool (por defecto, uno por núcleo)")
+    parser.add_argument("--plotlyjs", choices=list(MODOS_PLOTLYJS), default='directorio',
+                        help="plotly.js una vez en el directorio de salida (por defecto), en cada archivo o desde el CDN")
+    parser.add_argument("--publicacion", help="Publicación del almacén (por defecto, el Excel)")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    archivos, procesos = generar(args.paises, args.salida, args.anio_inicio, args.anio_fin, args.tipo, args.subgrupo,
+                       args.procesos, args.plotlyjs, args.publicacion)
+    total = time.perf_counter() - inicio
+    # Cada reporte usa un núcleo: con N procesos el tiempo total debería bajar cerca de N veces
+    print(f"{len(archivos):,} reportes en {args.salida} en {total:.1f} s con {procesos} "
+          f"procesos ({len(archivos) / total:.1f} reportes/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
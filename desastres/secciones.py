@@ -0,0 +1,117 @@
+"""Secciones del dashboard con dependencias explícitas y medición de tiempos.
+
+La parte interactiva del dashboard corre dentro de un ``st.fragment``: al
+cambiar un filtro solo se vuelve a ejecutar ese fragmento, y el encabezado y
+la documentación (que no dependen de los filtros) no se recalculan.
+
+Dentro del fragmento, cada sección declara de qué depende (versión de los
+datos, filtro normalizado, años...) con :func:`memo`. Si esas dependencias
+no cambiaron desde la ejecución anterior de la sesión, se reutilizan las
+figuras ya construidas en lugar de volver a generarlas.
+
+Con ``?tiempos=1`` en la URL se muestra el tiempo de servidor de cada
+ejecución y de cada sección; los mismos datos se registran con ``logging``.
+Las secciones medidas también son etapas del perfilado opcional (ver
+:mod:`desastres.perfilado`), que se muestra con :func:`mostrar_perfil`.
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from desastres import perfilado
+
+logger = logging.getLogger("desastres.tiempos")
+
+# Cantidad de ejecuciones que se conservan por sesión para calcular promedios
+HISTORIAL_EJECUCIONES = 50
+
+
+@contextmanager
+def medir_ejecucion(nombre):
+    """Mide el tiempo total de una ejecución (de la página o de un fragmento)."""
+    st.session_state['_tiempos_actual'] = {}
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        total = (time.perf_counter() - inicio) * 1000
+        secciones = st.session_state.pop('_tiempos_actual', {})
+        historial = st.session_state.setdefault('_tiempos_historial', [])
+        historial.append({'ejecucion': nombre, 'total_ms': total, 'secciones': secciones})
+        del historial[:-HISTORIAL_EJECUCIONES]
+        logger.info("%s: %.1f ms %s", nombre, total,
+                    " ".join(f"{k}={v:.1f}" for k, v in secciones.items()))
+
+
+@contextmanager
+def medir(nombre, **campos):
+    """Mide el tiempo de una sección dentro de la ejecución actual.
+
+    Devuelve el registro de perfilado de la sección (ver :func:`perfilado.etapa`).
+    """
+    inicio = time.perf_counter()
+    try:
+        with perfilado.etapa(nombre, **campos) as registro:
+            yield registro
+    finally:
+        tiempos = st.session_state.get('_tiempos_actual')
+        if tiempos is not None:
+            tiempos[nombre] = tiempos.get(nombre, 0.0) + (time.perf_counter() - inicio) * 1000
+
+
+def memo(nombre, dependencias, construir):
+    """Devuelve ``construir()``, reutilizando el resultado anterior si las dependencias no cambiaron."""
+    clave = f'_seccion_{nombre}'
+    guardado = st.session_state.get(clave)
+    if guardado is not None and guardado[0] == dependencias:
+        return guardado[1]
+    with medir(nombre):
+        resultado = construir()
+    st.session_state[clave] = (dependencias, resultado)
+    return resultado
+
+
+def mostrar_tiempos():
+    """Muestra el tiempo de la última ejecución y el promedio de la sesión."""
+    historial = st.session_state.get('_tiempos_historial', [])
+    if not historial:
+        return
+    ultima = historial[-1]
+    promedio = sum(e['total_ms'] for e in historial) / len(historial)
+    detalle = ", ".join(f"{k}: {v:.1f} ms" for k, v in ultima['secciones'].items()) or "todo reutilizado"
+    st.caption(
+        f"Tiempo de servidor ({ultima['ejecucion']}): {ultima['total_ms']:.1f} ms "
+        f"(promedio de {len(historial)} ejecuciones: {promedio:.1f} ms). Secciones recalculadas: {detalle}"
+    )
+
+
+def perfilado_solicitado():
+    """Perfilado activado por variable de entorno o con ``?perfilado=1``."""
+    return perfilado.ACTIVADO or bool(st.query_params.get("perfilado"))
+
+
+def mostrar_perfil(*perfiles):
+    """Panel plegable con las etapas de los perfiles indicados."""
+    perfiles = [p for p in perfiles if p is not None and p.registros]
+    if not perfiles:
+        return
+    with st.expander("Perfilado por etapas"):
+        for perfil in perfiles:
+            st.caption(f"{perfil.ejecucion}: {perfil.total_ms():.1f} ms")
+            tabla = pd.DataFrame([
+                {
+                    'etapa': "\u00a0\u00a0" * r['nivel'] + r['etapa'],
+                    'ms': r['ms'],
+                    'filas entrada': r.get('filas_entrada'),
+                    'filas salida': r.get('filas_salida'),
+                    'bytes': r.get('bytes'),
+                    'caché': r.get('cache'),
+                }
+                for r in perfil.registros
+            ])
+            st.dataframe(tabla, hide_index=True, use_container_width=True)
+        if perfilado.ARCHIVO:
+            st.caption(f"Registros agregados a `{perfilado.ARCHIVO}` (percentiles: `python -m desastres.perfilado`).")
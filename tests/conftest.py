@@ -0,0 +1,31 @@
+import os
+import socket
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+@pytest.fixture(autouse=True)
+def en_la_raiz(monkeypatch):
+    """Las rutas de los datos son relativas a la raíz del repositorio."""
+    monkeypatch.chdir(RAIZ)
+
+
+@pytest.fixture
+def sin_red(monkeypatch):
+    """Cualquier conexión de red falla."""
+    def conectar(*args, **kwargs):
+        raise OSError("red desactivada en la prueba")
+
+    monkeypatch.setattr(socket.socket, "connect", conectar)
+    monkeypatch.setattr(socket, "create_connection", conectar)
+
+
+@pytest.fixture(scope="session")
+def df_compacto():
+    from desastres.datos import cargar_datos_limpios
+    os.chdir(RAIZ)
+    return cargar_datos_limpios(compacto=True)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from desastres.agregados import agregar
+from desastres.datos import MEDIDAS, TODOS_DESASTRES, TODOS_PAISES
+from desastres.filtros import filtrar_df
+
+
+def _referencia(df):
+    """Las agrupaciones de pandas que usaba cada gráfico antes de :func:`agregar`."""
+    def suma(claves, columnas):
+        return df.groupby(claves, as_index=False, observed=True)[columnas].sum()
+
+    return {
+        'eventos_por_tipo': suma('Disaster Type', ['Total Events'])
+        .sort_values('Total Events', ascending=False, kind='stable'),
+        'danos_por_tipo': suma('Disaster Type', ['Total Damage (USD, original)'])
+        .sort_values('Total Damage (USD, original)', ascending=False, kind='stable'),
+        'eventos_por_anio': suma('Year', ['Total Events']),
+        'afectados_por_anio': suma('Year', ['Total Affected']),
+        'afectados_por_anio_subgrupo': suma(['Year', 'Disaster Subgroup'], ['Total Affected']),
+        'muertes_subgrupo_tipo': suma(['Disaster Subgroup', 'Disaster Type'], ['Total Deaths']),
+        'eventos_por_iso': suma('ISO', ['Total Events']),
+        'resumen_paises': suma('Country', MEDIDAS).sort_values('Total Events', ascending=False, kind='stable'),
+    }
+
+
+def _filtros(df, cantidad=40, semilla=0):
+    rng = np.random.default_rng(semilla)
+    paises = sorted(df['Country'].unique())
+    tipos = sorted(df['Disaster Type'].unique())
+    filtros = [(TODOS_PAISES, 1900, 2100, TODOS_DESASTRES), (TODOS_PAISES, 2000, 2024, TODOS_DESASTRES),
+               ("Chile", 1900, 2100, TODOS_DESASTRES), (TODOS_PAISES, 2024, 2024, "Flood")]
+    for _ in range(cantidad):
+        inicio, fin = sorted(int(a) for a in rng.integers(1990, 2025, size=2))
+        seleccion = list(rng.choice(paises, size=rng.integers(1, 30), replace=False))
+        tipo = list(rng.choice(tipos, size=rng.integers(1, 4), replace=False)) if rng.random() < 0.5 else []
+        filtros.append((seleccion, inicio, fin, tipo or TODOS_DESASTRES))
+    return filtros
+
+
+@pytest.fixture(scope="module")
+def filtros(df_compacto):
+    return _filtros(df_compacto)
+
+
+def test_agregados_igual_a_groupby(df_compacto, filtros):
+    for filtro in filtros:
+        filtrado = filtrar_df(df_compacto, *filtro)
+        agregados = agregar(filtrado)
+        assert agregados.columna_subgrupo == 'Disaster Subgroup'
+        for nombre, esperado in _referencia(filtrado).items():
+            obtenido = getattr(agregados, nombre)[list(esperado.columns)]
+            pd.testing.assert_frame_equal(
+                obtenido.reset_index(drop=True), esperado.reset_index(drop=True),
+                check_dtype=False, check_categorical=False, obj=f"{nombre} {filtro}",
+            )
+
+
+def test_eventos_por_iso_con_el_nombre_del_pais(df_compacto):
+    agregados = agregar(df_compacto)
+    pais_por_iso = df_compacto.groupby('ISO', observed=True)['Country'].first()
+    assert dict(zip(agregados.eventos_por_iso['ISO'], agregados.eventos_por_iso['Country'])) == \
+        {str(iso): str(pais) for iso, pais in pais_por_iso.items()}
+
+
+def test_filtro_vacio(df_compacto):
+    agregados = agregar(filtrar_df(df_compacto, ["Chile"], 3000, 3001, TODOS_DESASTRES))
+    assert all(len(getattr(agregados, nombre)) == 0 for nombre in _referencia(df_compacto.iloc[0:0]))
@@ -0,0 +1,84 @@
+import os
+import stat
+import threading
+
+from desastres.cache_resultados import CacheResultados, normalizar_filtro
+
+
+def test_desaloja_la_menos_usada_por_numero_de_entradas():
+    cache = CacheResultados(max_entradas=2, max_bytes=10_000)
+    cache.guardar("a", 1, tam=10)
+    cache.guardar("b", 2, tam=10)
+    # Usar "a" la deja como la más reciente: se desaloja "b"
+    assert cache.obtener("a") == 1
+    cache.guardar("c", 3, tam=10)
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.desalojos == 1
+
+
+def test_desaloja_por_bytes_y_no_guarda_lo_que_no_cabe():
+    cache = CacheResultados(max_entradas=10, max_bytes=100)
+    cache.guardar("a", "x", tam=40)
+    cache.guardar("b", "y", tam=40)
+    cache.guardar("c", "z", tam=40)
+    assert list(cache._entradas) == ["b", "c"]
+    assert cache.estadisticas()['bytes'] == 80
+    # Reemplazar una clave descuenta su tamaño anterior
+    cache.guardar("c", "w", tam=10)
+    assert cache.estadisticas()['bytes'] == 50
+    cache.guardar("enorme", "v", tam=101)
+    assert "enorme" not in cache and len(cache) == 2
+    assert cache.desalojos == 1
+
+
+def test_contadores_de_aciertos_y_fallos():
+    cache = CacheResultados()
+    calculos = []
+    for _ in range(3):
+        cache.obtener_o_calcular("a", lambda: calculos.append(1) or "valor")
+    assert calculos == [1]
+    assert cache.obtener("falta", "defecto") == "defecto"
+    assert cache.obtener("a", contar=False) == "valor"
+    e = cache.estadisticas()
+    assert (e['aciertos'], e['fallos'], e['desalojos'], e['entradas']) == (2, 2, 0, 1)
+    assert "desastres_cache_resultados_aciertos_total 2" in cache.metricas_prometheus()
+
+
+def test_invalidar_version_solo_borra_esa_version():
+    cache = CacheResultados()
+    filtro = normalizar_filtro(["Chile"], 2000, 2020, [])
+    cache.guardar(("agregados", "v1", filtro), 1, tam=1)
+    cache.guardar(("figura", "mapa", (("v1", filtro), 2000, 2020)), 2, tam=1)
+    cache.guardar(("agregados", "v2", filtro), 3, tam=1)
+    assert cache.invalidar_version("v1") == 2
+    assert list(cache._entradas) == [("agregados", "v2", filtro)]
+    assert cache.estadisticas()['bytes'] == 1
+
+
+def test_escribir_metricas_concurrente_y_espaciado(tmp_path):
+    ruta = str(tmp_path / "desastres.prom")
+    cache = CacheResultados()
+    errores = []
+
+    def escribir():
+        try:
+            for _ in range(50):
+                cache.escribir_metricas(ruta, intervalo=0)
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=escribir) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert errores == []
+    assert os.listdir(tmp_path) == ["desastres.prom"]
+    assert stat.S_IMODE(os.stat(ruta).st_mode) == 0o644
+    with open(ruta) as f:
+        assert f.read() == cache.metricas_prometheus()
+
+    # Con intervalo, la siguiente escritura se omite
+    otra = CacheResultados()
+    assert otra.escribir_metricas(ruta, intervalo=3600) is True
+    assert otra.escribir_metricas(ruta, intervalo=3600) is False
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from desastres.datos import (
+    COLUMNAS_CATEGORICAS, COLUMNAS_ENTERAS_ANULABLES, TODOS_DESASTRES, TODOS_PAISES, cargar_datos_limpios,
+    compactar_tipos, comparar_representaciones, memoria_df,
+)
+
+
+@pytest.fixture(scope="module")
+def df_limpio():
+    return cargar_datos_limpios()
+
+
+@pytest.fixture(scope="module")
+def compacto(df_limpio):
+    return compactar_tipos(df_limpio)
+
+
+def _combinaciones(df, cantidad=50, semilla=0):
+    """Todos los países y tipos con todos los años, más filtros aleatorios sobre una semilla fija."""
+    rng = np.random.default_rng(semilla)
+    anios = (int(df['Year'].min()), int(df['Year'].max()))
+    paises = sorted(df['Country'].unique())
+    tipos = sorted(df['Disaster Type'].unique())
+    combinaciones = [(TODOS_PAISES, *anios, TODOS_DESASTRES), (TODOS_PAISES, 2000, 2024, TODOS_DESASTRES)]
+    combinaciones += [(pais, *anios, TODOS_DESASTRES) for pais in paises]
+    combinaciones += [(TODOS_PAISES, *anios, tipo) for tipo in tipos]
+    for _ in range(cantidad):
+        inicio, fin = sorted(rng.integers(anios[0], anios[1] + 1, size=2))
+        pais = TODOS_PAISES if rng.random() < 0.2 else str(rng.choice(paises))
+        tipo = TODOS_DESASTRES if rng.random() < 0.5 else str(rng.choice(tipos))
+        combinaciones.append((pais, int(inicio), int(fin), tipo))
+    return combinaciones
+
+
+def test_tipos_compactos(df_limpio, compacto):
+    for col in COLUMNAS_CATEGORICAS:
+        assert isinstance(compacto[col].dtype, pd.CategoricalDtype), col
+    assert compacto['Year'].dtype == np.int16
+    assert compacto['Total Events'].dtype == np.int8
+    for col in COLUMNAS_ENTERAS_ANULABLES:
+        assert pd.api.types.is_extension_array_dtype(compacto[col].dtype), col
+        assert compacto[col].isna().sum() == df_limpio[col].isna().sum()
+    assert memoria_df(compacto) < memoria_df(df_limpio) / 2
+    # El original no cambia
+    assert df_limpio['Year'].dtype == np.int64
+
+
+def test_compacto_da_los_mismos_numeros(df_limpio, compacto):
+    combinaciones = _combinaciones(df_limpio)
+    assert comparar_representaciones(df_limpio, compacto, combinaciones) == []
+
+
+def test_comparar_representaciones_detecta_diferencias(df_limpio, compacto):
+    alterado = compacto.copy()
+    fila = alterado.index[alterado['Country'] == "Chile"][0]
+    alterado.loc[fila, 'Total Deaths'] += 1
+    combinaciones = [("Chile", 1900, 2100, TODOS_DESASTRES), ("Peru", 1900, 2100, TODOS_DESASTRES)]
+    assert comparar_representaciones(df_limpio, alterado, combinaciones) == combinaciones[:1]
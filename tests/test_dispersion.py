@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from desastres import dispersion, graficos
+
+
+def test_atipicos_acotados_a_los_mas_extremos():
+    rng = np.random.default_rng(0)
+    lx = rng.normal(3, 0.5, 1000)
+    lx[:100] = 20 + np.arange(100)
+    mascara = dispersion._atipicos(lx, rng.normal(3, 0.5, 1000), max_atipicos=10)
+    assert mascara.sum() == 10
+    assert set(np.flatnonzero(mascara)) == set(range(90, 100))
+
+
+def test_eje_sin_rango_intercuartilico_no_marca_atipicos():
+    rng = np.random.default_rng(0)
+    ly = np.zeros(1000)
+    ly[:150] = rng.uniform(1, 9, 150)
+    # Sin la regla, los 150 puntos distintos de la mediana serían atípicos
+    assert not dispersion._atipicos(rng.uniform(2, 4, 1000), ly, max_atipicos=1000).any()
+
+
+def test_bins_sin_puntos_normales():
+    df = dispersion._normalizar(pd.DataFrame({columna: [] for columna in dispersion.COLUMNAS}))
+    vacio = np.empty(0)
+    agrupado = dispersion._agrupar_en_bins(df, vacio, vacio, 100)
+    assert agrupado.empty
+    assert dispersion.REGISTROS in agrupado
+
+
+def test_puntos_agrupados_con_su_propio_hover(df_compacto):
+    fig, info = graficos.grafico_dispersion(df_compacto, max_puntos=300, metodo='bins')
+    assert info.metodo == 'bins' and info.puntos <= 300
+    agrupadas = [t for t in fig.data if dispersion.REGISTROS in t.hovertemplate]
+    originales = [t for t in fig.data if dispersion.REGISTROS not in t.hovertemplate]
+    assert agrupadas and originales
+    assert all('Country' not in t.hovertemplate for t in agrupadas)
+
+    # Cada fila con ambos valores está en un punto original o en un punto agrupado
+    con_valores = df_compacto[dispersion.COLUMNAS].dropna(subset=[dispersion.X, dispersion.Y])
+    registros = sum(int(np.sum(t.customdata[:, 1])) for t in agrupadas)
+    assert registros + sum(len(t.x) for t in originales) == len(con_valores)
+
+    # Un color y una entrada de la leyenda por tipo, con la misma escala de tamaños
+    colores = {}
+    for traza in fig.data:
+        assert colores.setdefault(traza.name, traza.marker.color) == traza.marker.color
+    leyenda = [t.name for t in fig.data if t.showlegend is not False]
+    assert sorted(leyenda) == sorted(colores)
+    assert len({t.marker.sizeref for t in fig.data}) == 1
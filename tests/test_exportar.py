@@ -0,0 +1,90 @@
+import io
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from desastres import exportar, motores
+from desastres.cache_resultados import normalizar_filtro
+from desastres.filtros import filtrar_df
+
+
+@pytest.fixture(scope="module", params=['pandas', 'duckdb'])
+def motor(request, tmp_path_factory):
+    if request.param == 'duckdb':
+        pytest.importorskip("duckdb")
+    return motores.crear_motor(request.param, ruta_parquet=None, dir_cache=str(tmp_path_factory.mktemp("cache")))
+
+
+@pytest.fixture(scope="module")
+def df_referencia(tmp_path_factory):
+    return motores.crear_motor('pandas', dir_cache=str(tmp_path_factory.mktemp("cache"))).df
+
+
+def _leer(contenido, formato):
+    return pd.read_csv(contenido) if formato == 'csv' else pd.read_parquet(contenido)
+
+
+@pytest.mark.parametrize("formato", list(exportar.FORMATOS))
+@pytest.mark.parametrize("paises, anio_inicio, anio_fin", [
+    (["Chile", "Peru", "Japan"], 1990, 2020),
+    ([], 2000, 2024),
+    (["Chile"], 3000, 3001),
+])
+def test_filas_por_bloques_igual_a_filtrar_df(motor, df_referencia, formato, paises, anio_inicio, anio_fin):
+    filtro = normalizar_filtro(paises, anio_inicio, anio_fin, [], motor.anio_min, motor.anio_max)
+    destino = io.BytesIO()
+    # Bloques pequeños: la exportación cruza muchos límites de bloque
+    filas = exportar.escribir(exportar.bloques(motor, filtro, 'filas', filas_por_bloque=97), destino, formato)
+    destino.seek(0)
+    obtenido = _leer(destino, formato)
+
+    # DuckDB exporta las columnas del dashboard; pandas, todas las del DataFrame
+    esperado = filtrar_df(df_referencia, *filtro)[list(obtenido.columns)].reset_index(drop=True)
+    assert filas == len(esperado) == len(obtenido)
+    assert set(obtenido.columns) >= {'Country', 'Year', 'Disaster Type', 'Total Events'}
+    # Mismo contenido que el DataFrame de referencia escrito de una vez en el mismo formato
+    completo = io.BytesIO()
+    if formato == 'csv':
+        completo.write(esperado.to_csv(index=False).encode("utf-8"))
+    else:
+        esperado.to_parquet(completo, index=False)
+    completo.seek(0)
+    pd.testing.assert_frame_equal(obtenido, _leer(completo, formato), check_dtype=False, check_categorical=False)
+
+
+@pytest.mark.parametrize("datos", ['resumen', 'anual'])
+def test_agregaciones_por_bloques(motor, datos):
+    filtro = normalizar_filtro([], 2000, 2020, [], motor.anio_min, motor.anio_max)
+    agregados = motor.agregar(filtro)
+    tabla = agregados.resumen_paises if datos == 'resumen' else exportar.serie_anual(agregados)
+    destino = io.BytesIO()
+    filas = exportar.escribir(exportar.bloques(motor, filtro, datos, agregados, filas_por_bloque=10), destino, 'csv')
+    destino.seek(0)
+    assert filas == len(tabla)
+    assert destino.read().decode("utf-8") == tabla.to_csv(index=False)
+
+
+def test_exportacion_en_disco_y_limite(motor, tmp_path):
+    filtro = normalizar_filtro([], motor.anio_min, motor.anio_max, [], motor.anio_min, motor.anio_max)
+    directorio = str(tmp_path / "exportaciones")
+
+    ruta = exportar.exportar(motor, filtro, 'filas', 'parquet', directorio=directorio)
+    assert len(pd.read_parquet(ruta)) == motor.filas_totales
+    assert os.path.basename(ruta) == exportar.nombre_archivo('filas', filtro, 'parquet')
+    subdirectorio = os.path.basename(os.path.dirname(ruta))
+    assert exportar.url_descarga(ruta, directorio, "app/static/x/") == \
+        f"app/static/x/{subdirectorio}/{os.path.basename(ruta)}"
+
+    # Una exportación que supera el límite se interrumpe y no deja el archivo
+    with pytest.raises(ValueError):
+        exportar.exportar(motor, filtro, 'filas', 'csv', filas_por_bloque=100, directorio=directorio,
+                          max_bytes=10_000)
+    assert os.listdir(directorio) == [subdirectorio]
+
+    # Las exportaciones vencidas se borran
+    antes = time.time() - 3600
+    os.utime(os.path.dirname(ruta), (antes, antes))
+    exportar.limpiar_vencidas(directorio, minutos=30)
+    assert os.listdir(directorio) == []
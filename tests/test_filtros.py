@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from desastres.cubo import CuboDesastres
+from desastres.datos import MEDIDAS, TODOS_DESASTRES, TODOS_PAISES
+from desastres.filtros import IndiceFiltros, filtrar_df, selecciones_multiples
+
+
+@pytest.fixture(scope="module")
+def indice(df_compacto):
+    return IndiceFiltros(df_compacto)
+
+
+@pytest.fixture(scope="module")
+def cubo(df_compacto):
+    return CuboDesastres.desde_df(df_compacto)
+
+
+def test_el_indice_no_guarda_mapas_por_anio(indice):
+    estado = indice.estado()
+    assert set(k for k in estado if k.startswith('bits_')) == {'bits_tipo', 'bits_subgrupo'}
+    assert indice.nbytes_mapas() == estado['bits_tipo'].nbytes + estado['bits_subgrupo'].nbytes
+
+
+@pytest.mark.parametrize("anio_inicio, anio_fin", [(None, None), (2000, 2024), (2010, 2015), (2024, 2024),
+                                                   (2015, 2010), (3000, 3001)])
+def test_selecciones_multiples_igual_a_filtrar_df(df_compacto, indice, cubo, anio_inicio, anio_fin):
+    anio_inicio = indice.anio_min if anio_inicio is None else anio_inicio
+    anio_fin = indice.anio_max if anio_fin is None else anio_fin
+    combinaciones = selecciones_multiples(indice, anio_inicio, anio_fin, 60, semilla=7)
+    # También los casos límite: todos, un país y varios tipos, países inexistentes
+    combinaciones += [
+        (TODOS_PAISES, anio_inicio, anio_fin, TODOS_DESASTRES, None),
+        (["Chile"], anio_inicio, anio_fin, ["Flood", "Earthquake"], None),
+        (["Chile", "Atlántida"], anio_inicio, anio_fin, TODOS_DESASTRES, None),
+        (["Atlántida", "Lemuria"], anio_inicio, anio_fin, TODOS_DESASTRES, None),
+    ]
+    for combinacion in combinaciones:
+        esperado = filtrar_df(df_compacto, *combinacion)
+        posiciones = indice.posiciones(*combinacion)
+        np.testing.assert_array_equal(df_compacto.index[posiciones], esperado.index)
+        pd.testing.assert_frame_equal(indice.filtrar(*combinacion), esperado)
+
+        totales = cubo.totales(*combinacion)
+        for medida in MEDIDAS:
+            assert float(totales[medida]) == float(esperado[medida].sum()), (combinacion, medida)
+
+
+def _combinaciones_simples(indice, cantidad=150, semilla=0):
+    """Cada país y cada tipo por separado, más pares (país, tipo) tomados con una semilla fija."""
+    rng = np.random.default_rng(semilla)
+    combinaciones = [(TODOS_PAISES, TODOS_DESASTRES)]
+    combinaciones += [(pais, TODOS_DESASTRES) for pais in indice.paises]
+    combinaciones += [(TODOS_PAISES, tipo) for tipo in indice.tipos]
+    combinaciones += [(str(rng.choice(indice.paises)), str(rng.choice(indice.tipos))) for _ in range(cantidad)]
+    return combinaciones
+
+
+@pytest.mark.parametrize("anio_inicio, anio_fin", [(2000, 2024), (1900, 2100), (2024, 2024)])
+def test_indice_igual_a_filtrar_df(df_compacto, indice, anio_inicio, anio_fin):
+    for pais, tipo in _combinaciones_simples(indice):
+        combinacion = (pais, anio_inicio, anio_fin, tipo)
+        pd.testing.assert_frame_equal(indice.filtrar(*combinacion), filtrar_df(df_compacto, *combinacion))
+
+
+@pytest.mark.parametrize("anio_inicio, anio_fin", [(1900, 2100), (2000, 2024), (2010, 2015), (2024, 2024),
+                                                   (2015, 2010)])
+def test_totales_del_cubo_igual_a_groupby(df_compacto, cubo, anio_inicio, anio_fin):
+    sel = filtrar_df(df_compacto, TODOS_PAISES, anio_inicio, anio_fin, TODOS_DESASTRES)
+    por_grupo = sel.groupby(['Country', 'Disaster Type'], observed=True)[MEDIDAS].sum().to_dict('index')
+    por_pais = sel.groupby('Country', observed=True)[MEDIDAS].sum().to_dict('index')
+    por_tipo = sel.groupby('Disaster Type', observed=True)[MEDIDAS].sum().to_dict('index')
+    paises = sorted(df_compacto['Country'].unique())
+    tipos = sorted(df_compacto['Disaster Type'].unique())
+    esperados = [((TODOS_PAISES, TODOS_DESASTRES), sel[MEDIDAS].sum())]
+    esperados += [((pais, TODOS_DESASTRES), por_pais.get(pais)) for pais in paises]
+    esperados += [((TODOS_PAISES, tipo), por_tipo.get(tipo)) for tipo in tipos]
+    esperados += [((pais, tipo), por_grupo.get((pais, tipo))) for pais in paises for tipo in tipos]
+    for (pais, tipo), esperado in esperados:
+        obtenido = cubo.totales(pais, anio_inicio, anio_fin, tipo)
+        for medida in MEDIDAS:
+            valor = 0 if esperado is None else esperado[medida]
+            assert float(obtenido[medida]) == float(valor), (pais, tipo, medida)
@@ -0,0 +1,53 @@
+import json
+
+import numpy as np
+
+from desastres import geometria, graficos
+from desastres.agregados import agregar
+from desastres.filtros import filtrar_df
+
+
+def test_mapa_mundial_sin_geometria_en_la_figura(sin_red, df_compacto):
+    fig = graficos.grafico_mapa(agregar(df_compacto), 2000, 2024)
+
+    # Los países salen del TopoJSON servido por el dashboard (topojsonURL), no de la figura
+    assert [traza.type for traza in fig.data] == ['choropleth']
+    assert fig.data[0].geojson is None
+    assert fig.layout.geo.showland and fig.layout.geo.lonaxis.range is None
+    assert graficos.CONFIG_MAPA['topojsonURL'] == geometria.URL_TOPOJSON
+
+
+def test_mapa_acercado_con_la_geometria_de_sus_paises(sin_red, df_compacto):
+    agregados = agregar(filtrar_df(df_compacto, ["Chile", "Peru"], 2000, 2024, []))
+    fig = graficos.grafico_mapa(agregados, 2000, 2024)
+
+    assert len(fig.data) == 1
+    traza = fig.data[0]
+    assert traza.locationmode in (None, 'geojson-id')
+    assert {f['id'] for f in traza.geojson['features']} == {'CHL', 'PER'}
+    # Las capas base del TopoJSON dibujan el resto de la vista
+    assert fig.layout.geo.showland and fig.layout.geo.visible is not False
+    lon = fig.layout.geo.lonaxis.range
+    assert lon is not None and lon[1] - lon[0] < 60
+
+
+def test_topojson_incluido_para_plotly():
+    with open(geometria.ruta_topojson(), encoding="utf-8") as f:
+        topo = json.load(f)
+    paises = topo['objects']['countries']['geometries']
+    baja = geometria.cargar('baja')
+    assert {p['id'] for p in paises} == set(baja)
+    # Cada anillo es un arco con las mismas coordenadas del GeoJSON
+    chile = next(p for p in paises if p['id'] == 'CHL')
+    anillos = [topo['arcs'][arco[0]] for poligono in chile['arcs'] for arco in poligono]
+    geometria_chile = baja['CHL']['geometry']
+    poligonos = ([geometria_chile['coordinates']] if geometria_chile['type'] == 'Polygon'
+                 else geometria_chile['coordinates'])
+    assert anillos == [anillo for poligono in poligonos for anillo in poligono]
+    assert "world_110m" in geometria.script_topojson()
+
+
+def test_douglas_peucker_conserva_extremos_y_vertices_lejanos():
+    puntos = np.array([[0, 0], [1, 0.01], [2, 0], [3, 5], [4, 0]], dtype=float)
+    conservar = geometria.douglas_peucker(puntos, 0.1)
+    assert conservar.tolist() == [True, False, True, True, True]
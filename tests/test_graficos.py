@@ -0,0 +1,112 @@
+import threading
+
+import numpy as np
+import plotly.graph_objects as go
+
+from desastres import graficos
+from desastres.cache_resultados import CacheResultados
+
+
+def test_compactar_conserva_la_precision_mostrada():
+    # Daños en USD con decimales (p. ej. promedios): se muestran con ,.0f y no pasan a float32
+    danos = np.array([123_456_789.4, 98_765_432_101.6, 5_000_000.2])
+    assert graficos._compactar(danos) is None
+    assert graficos._compactar(np.array([1.5, 2.25, 1e6 + 0.5])).dtype == np.float32
+    assert graficos._compactar(np.array([1.0, 2.0, 3.0])).dtype == np.int32
+    assert graficos._compactar(np.array([1e10, 2.0])) is None
+
+
+def test_figura_cacheada_no_serializa(monkeypatch, df_compacto):
+    from desastres.agregados import agregar
+
+    agregados = agregar(df_compacto)
+    cache = CacheResultados()
+    # La figura se serializa solo al mostrarla
+    monkeypatch.setattr(graficos.go.Figure, "to_json", lambda self, *args, **kwargs: _no_llamar())
+    fig = graficos.figura_cacheada("tipos", ("v", 1), lambda: graficos.grafico_tipos(agregados), cache)
+    assert graficos.figura_cacheada("tipos", ("v", 1), lambda: _no_llamar(), cache) is fig
+    entrada = cache.obtener(("figura", "tipos", ("v", 1)))
+    assert not hasattr(entrada, "spec")
+
+
+def _no_llamar():
+    raise AssertionError("no se debía llamar")
+
+
+def test_figuras_en_paralelo(df_compacto):
+    from desastres.agregados import agregar
+
+    agregados = agregar(df_compacto)
+    errores = []
+
+    def construir_todas():
+        try:
+            for construir in graficos.constructores(df_compacto, agregados, 2000, 2024).values():
+                graficos.adelgazar_figura(construir())
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=construir_todas) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert errores == []
+
+
+def test_una_construccion_por_clave_y_claves_en_paralelo():
+    cache = CacheResultados()
+    construcciones = []
+    otra_empezo = threading.Event()
+
+    def construir(nombre):
+        def construir_figura():
+            construcciones.append(nombre)
+            if nombre == "a":
+                # Con un candado global "b" no podría empezar mientras se construye "a"
+                assert otra_empezo.wait(5)
+            else:
+                otra_empezo.set()
+            return go.Figure()
+        return construir_figura
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda n=n: resultados.append(
+        graficos.figura_cacheada(n, ("v",), construir(n), cache))) for n in ("a", "a", "a", "b")]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert sorted(construcciones) == ["a", "b"]
+    assert len(resultados) == 4
+    assert graficos._construcciones == {}
+
+
+def test_construccion_cuenta_un_fallo_y_luego_aciertos():
+    cache = CacheResultados()
+    graficos.figura_cacheada("a", ("v",), go.Figure, cache)
+    assert (cache.aciertos, cache.fallos) == (0, 1)
+    graficos.figura_cacheada("a", ("v",), go.Figure, cache)
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+
+
+def test_dispersion_se_adelgaza_una_vez(monkeypatch, df_compacto):
+    llamadas = []
+    adelgazar = graficos.adelgazar_figura
+    monkeypatch.setattr(graficos, "adelgazar_figura", lambda fig: llamadas.append(fig) or adelgazar(fig))
+    filas = df_compacto[df_compacto['Year'].between(2000, 2024)]
+    construidas = []
+
+    def construir():
+        resultado = graficos.grafico_dispersion(filas)
+        construidas.append(len(llamadas))
+        return resultado
+
+    fig, _ = graficos.figura_cacheada("dispersion", ("v", 1), construir, CacheResultados(), adelgazada=True)
+    # Se adelgaza dentro del ajuste al presupuesto de bytes y no otra vez al guardarla
+    assert construidas == [len(llamadas)] and llamadas[-1] is fig
+
+    # Sin adelgazar (para el informe) se mide sobre una copia: la figura devuelta pesa más
+    sin_adelgazar, _ = graficos.grafico_dispersion(filas, adelgazar=False)
+    assert llamadas[-1] is not sin_adelgazar
+    assert len(sin_adelgazar.to_json()) > len(fig.to_json())
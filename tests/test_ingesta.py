@@ -0,0 +1,94 @@
+import os
+
+import pandas as pd
+import pytest
+
+from desastres import ingesta
+from desastres.datos import COLUMNAS_NECESARIAS, HOJA_DATOS, RUTA_DATOS, cargar_datos_limpios, version_datos
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture(scope="module")
+def df_limpio():
+    return cargar_datos_limpios(compacto=True)[COLUMNAS_NECESARIAS]
+
+
+@pytest.fixture(scope="module")
+def almacen(tmp_path_factory):
+    """Almacén con la publicación del Excel del repositorio, en bloques de 1000 filas."""
+    dir_almacen = str(tmp_path_factory.mktemp("almacen"))
+    entrada = ingesta.ingerir(RUTA_DATOS, dir_almacen=dir_almacen, filas_por_bloque=1000)
+    return dir_almacen, entrada
+
+
+@pytest.fixture(scope="module")
+def csv_publicacion(tmp_path_factory):
+    """La misma publicación exportada a CSV con sus columnas originales."""
+    ruta = str(tmp_path_factory.mktemp("csv") / "emdat_2025_06_30.csv")
+    pd.read_excel(RUTA_DATOS, sheet_name=HOJA_DATOS).to_csv(ruta, index=False)
+    return ruta
+
+
+def _partes(dir_almacen, publicacion):
+    return sorted(os.listdir(ingesta.ruta_publicacion(publicacion, dir_almacen)))
+
+
+def test_manifiesto_y_particiones_igual_a_cargar_datos(almacen, df_limpio):
+    dir_almacen, entrada = almacen
+    assert entrada['publicacion'] == "2025-01-27"
+    assert entrada['hoja'] == HOJA_DATOS
+    assert entrada['version'] == version_datos(RUTA_DATOS, HOJA_DATOS)
+    # Con bloques más pequeños que el archivo se escribe una parte por bloque
+    assert entrada['filas'] == len(df_limpio)
+    assert entrada['partes'] == -(-len(df_limpio) // 1000) > 1
+    assert _partes(dir_almacen, "2025-01-27") == [f"parte-{i:05d}.parquet" for i in range(entrada['partes'])]
+    assert ingesta.leer_manifiesto(dir_almacen) == {"2025-01-27": entrada}
+
+    cargado = ingesta.cargar_publicacion("2025-01-27", dir_almacen, compacto=True)
+    pd.testing.assert_frame_equal(cargado.reset_index(drop=True), df_limpio.reset_index(drop=True),
+                                  check_dtype=False, check_categorical=False)
+
+
+def test_ingerir_dos_veces_omite_la_misma_version(almacen):
+    dir_almacen, entrada = almacen
+    antes = {nombre: os.stat(os.path.join(ingesta.ruta_publicacion("2025-01-27", dir_almacen), nombre)).st_mtime_ns
+             for nombre in _partes(dir_almacen, "2025-01-27")}
+    repetida = ingesta.ingerir(RUTA_DATOS, dir_almacen=dir_almacen, filas_por_bloque=1000)
+    assert repetida == {**entrada, 'omitida': True}
+    assert ingesta.leer_manifiesto(dir_almacen) == {"2025-01-27": entrada}
+    assert {nombre: os.stat(os.path.join(ingesta.ruta_publicacion("2025-01-27", dir_almacen), nombre)).st_mtime_ns
+            for nombre in _partes(dir_almacen, "2025-01-27")} == antes
+
+
+def test_segunda_publicacion_desde_csv_solo_agrega(almacen, csv_publicacion, df_limpio):
+    dir_almacen, primera = almacen
+    partes_primera = _partes(dir_almacen, "2025-01-27")
+
+    # La publicación se deduce del nombre del CSV
+    segunda = ingesta.ingerir(csv_publicacion, dir_almacen=dir_almacen, filas_por_bloque=2500)
+    assert segunda['publicacion'] == "2025-06-30" and segunda['hoja'] is None
+    assert (segunda['filas'], segunda['partes']) == (len(df_limpio), 3)
+    assert ingesta.publicaciones(dir_almacen) == ["2025-06-30", "2025-01-27"]
+    assert ingesta.leer_manifiesto(dir_almacen) == {"2025-01-27": primera, "2025-06-30": segunda}
+    # La publicación anterior queda intacta y no hay temporales
+    assert _partes(dir_almacen, "2025-01-27") == partes_primera
+    assert sorted(os.listdir(dir_almacen)) == [ingesta.MANIFIESTO, "publicacion=2025-01-27", "publicacion=2025-06-30"]
+
+    cargado = ingesta.cargar_publicacion("2025-06-30", dir_almacen, compacto=True)
+    pd.testing.assert_frame_equal(cargado.reset_index(drop=True), df_limpio.reset_index(drop=True),
+                                  check_dtype=False, check_categorical=False)
+
+    # Otro contenido con la misma publicación es un error: el almacén es de solo agregado
+    with pytest.raises(ValueError):
+        ingesta.ingerir(csv_publicacion, "2025-01-27", dir_almacen=dir_almacen)
+    assert ingesta.leer_manifiesto(dir_almacen)["2025-01-27"] == primera
+
+
+def test_csv_sin_columnas_necesarias_no_deja_temporales(tmp_path):
+    ruta = str(tmp_path / "emdat_2025_07_01.csv")
+    pd.DataFrame({'Country': ["Chile"], 'Year': [2020]}).to_csv(ruta, index=False)
+    dir_almacen = str(tmp_path / "almacen")
+    with pytest.raises(ValueError, match="faltan las columnas"):
+        ingesta.ingerir(ruta, dir_almacen=dir_almacen)
+    assert os.listdir(dir_almacen) == []
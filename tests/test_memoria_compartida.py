@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+from desastres import memoria_compartida
+
+
+@pytest.mark.parametrize("error", [KeyboardInterrupt, RuntimeError, OSError])
+def test_publicacion_interrumpida_no_deja_temporales(monkeypatch, tmp_path, df_compacto, error):
+    guardar = memoria_compartida._guardar_df
+
+    def guardar_y_fallar(df, directorio, nombre):
+        guardar(df, directorio, nombre)
+        raise error
+
+    monkeypatch.setattr(memoria_compartida, "_guardar_df", guardar_y_fallar)
+    with pytest.raises(error):
+        memoria_compartida.publicar(df_compacto, "v1", str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+    # Se puede volver a publicar la misma versión
+    monkeypatch.setattr(memoria_compartida, "_guardar_df", guardar)
+    memoria_compartida.publicar(df_compacto, "v1", str(tmp_path))
+    assert memoria_compartida.mapear("v1", str(tmp_path)) is not None
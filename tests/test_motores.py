@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from desastres import motores
+
+
+@pytest.fixture(scope="module")
+def motores_comparados(tmp_path_factory):
+    pytest.importorskip("duckdb")
+    dir_cache = str(tmp_path_factory.mktemp("cache"))
+    local = motores.crear_motor('pandas', dir_cache=dir_cache)
+    duck = motores.crear_motor('duckdb', ruta_parquet=None, dir_cache=dir_cache)
+    return local, duck
+
+
+def test_duckdb_igual_a_pandas_en_la_matriz_de_filtros(motores_comparados):
+    local, duck = motores_comparados
+    assert local.version == duck.version
+    diferencias, tiempos = motores.comparar(local, duck, motores.filtros_comparacion(local))
+    assert diferencias == []
+    assert set(tiempos) == {'pandas', 'duckdb'}
+
+
+def test_motor_sin_consultas_no_se_instancia():
+    class Incompleto(motores.MotorConsultas):
+        def opciones(self):
+            return [], [], [], []
+
+    with pytest.raises(TypeError):
+        Incompleto()
+
+
+def test_motor_compartido_se_carga_una_vez_por_publicacion(monkeypatch):
+    monkeypatch.setattr(motores, "_motores", OrderedDict())
+    cargas = []
+
+    def crear(publicacion=None):
+        cargas.append(publicacion)
+        time.sleep(0.05)
+        return object()
+
+    with ThreadPoolExecutor(4) as pool:
+        obtenidos = list(pool.map(lambda _: motores.motor_compartido("2025-01", crear), range(8)))
+    assert cargas == ["2025-01"]
+    assert all(motor is obtenidos[0] for motor in obtenidos)
+
+    # Se conservan los MAX_MOTORES más recientes
+    for publicacion in ("2025-06", "2025-12"):
+        motores.motor_compartido(publicacion, crear)
+    assert list(motores._motores) == ["2025-06", "2025-12"]
+    motores.motor_compartido("2025-01", crear)
+    assert cargas == ["2025-01", "2025-06", "2025-12", "2025-01"]
+
+
+def test_motor_compartido_reintenta_si_la_carga_falla(monkeypatch):
+    monkeypatch.setattr(motores, "_motores", OrderedDict())
+
+    def fallar(publicacion=None):
+        raise OSError("sin datos")
+
+    with pytest.raises(OSError):
+        motores.motor_compartido(None, fallar)
+    motor = motores.motor_compartido(None, lambda publicacion=None: "motor")
+    assert motor == "motor" and motores._cargas == {}
@@ -0,0 +1,99 @@
+import gc
+import importlib.util
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from desastres import datos, memoria_compartida, motores, recarga
+from desastres.cache_resultados import CacheResultados, normalizar_filtro
+
+MOTORES = ['pandas', pytest.param('duckdb', marks=pytest.mark.skipif(
+    importlib.util.find_spec("duckdb") is None, reason="duckdb no está instalado"))]
+
+
+@pytest.fixture
+def excel(tmp_path):
+    ruta = tmp_path / "emdat.xlsx"
+    shutil.copy(datos.RUTA_DATOS, ruta)
+    return str(ruta)
+
+
+def _reemplazar(ruta, df):
+    temporal = f"{ruta}.nuevo.xlsx"
+    df.to_excel(temporal, sheet_name=datos.HOJA_DATOS, index=False)
+    os.replace(temporal, ruta)
+
+
+def _recarga(nombre, excel, tmp_path):
+    dir_cache = str(tmp_path / "cache")
+
+    def crear(limpiar=True):
+        return motores.crear_motor(nombre, ruta_parquet=None, ruta_datos=excel, dir_cache=dir_cache,
+                                   limpiar=limpiar)
+
+    return recarga.Recarga(crear, excel, intervalo=0, precalentar=False, cache=CacheResultados(),
+                           dir_cache=dir_cache, dir_compartida=str(tmp_path / "compartida"))
+
+
+def _filtro(motor):
+    return normalizar_filtro(["Chile"], 2000, 2020, [], motor.anio_min, motor.anio_max)
+
+
+@pytest.mark.parametrize("nombre", MOTORES)
+def test_recarga_fallida_conserva_el_motor_anterior(nombre, excel, tmp_path):
+    r = _recarga(nombre, excel, tmp_path)
+    anterior = r.motor
+    esperado = anterior.metricas(_filtro(anterior))
+
+    # Hoja con las columnas pero sin filas: la caché nueva se escribe y la validación falla
+    _reemplazar(excel, pd.read_excel(datos.RUTA_DATOS, sheet_name=datos.HOJA_DATOS, nrows=0))
+    assert r.recargar() is False
+    assert isinstance(r.error, ValueError)
+    assert r.motor is anterior
+    # La caché de la versión anterior no se borró al construir la nueva
+    assert os.path.exists(datos.ruta_cache(anterior.version, r.dir_cache))
+    assert r.motor.metricas(_filtro(r.motor)) == esperado
+
+    # La caché de la versión que no se pudo usar se borra
+    version_fallida = datos.version_datos(excel)
+    assert not os.path.exists(datos.ruta_cache(version_fallida, r.dir_cache))
+    assert os.path.exists(datos.ruta_cache(anterior.version, r.dir_cache))
+
+
+@pytest.mark.parametrize("nombre", MOTORES)
+def test_recarga_libera_la_version_anterior_al_soltarla(nombre, excel, tmp_path):
+    r = _recarga(nombre, excel, tmp_path)
+    anterior = r.motor
+    version = anterior.version
+    memoria_compartida.publicar(datos.cargar_datos_limpios(excel, dir_cache=r.dir_cache, compacto=True), version,
+                                r.dir_compartida)
+    esperado = anterior.metricas(_filtro(anterior))
+
+    df = pd.read_excel(datos.RUTA_DATOS, sheet_name=datos.HOJA_DATOS)
+    _reemplazar(excel, df[df['Year'] >= 2015])
+    assert r.recargar() is True
+    assert r.motor.version != version
+
+    # Una sesión que todavía tiene el motor anterior lo sigue consultando
+    gc.collect()
+    assert anterior.metricas(_filtro(anterior)) == esperado
+    assert os.path.exists(datos.ruta_cache(version, r.dir_cache))
+    assert memoria_compartida.mapear(version, r.dir_compartida) is not None
+
+    del anterior
+    gc.collect()
+    assert not os.path.exists(datos.ruta_cache(version, r.dir_cache))
+    assert not os.path.exists(memoria_compartida.ruta_version(version, r.dir_compartida))
+    assert os.path.exists(datos.ruta_cache(r.motor.version, r.dir_cache))
+
+
+def test_liberar_publicacion_mapeada(tmp_path, df_compacto):
+    memoria_compartida.publicar(df_compacto, "v1", str(tmp_path))
+    df, _, _ = memoria_compartida.mapear("v1", str(tmp_path))
+    memoria_compartida.liberar("v1", str(tmp_path))
+    assert memoria_compartida.mapear("v1", str(tmp_path)) is None
+    # Lo ya mapeado se sigue leyendo
+    assert len(df) == len(df_compacto)
+    assert df['Country'].tolist() == df_compacto['Country'].astype(str).tolist()
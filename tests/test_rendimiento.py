@@ -0,0 +1,24 @@
+import io
+import json
+
+from desastres import rendimiento
+
+
+def test_memoria_insuficiente_registra_el_error_y_termina(monkeypatch, df_compacto):
+    escalas = []
+
+    def escalar(df, escala):
+        escalas.append(escala)
+        raise MemoryError
+
+    monkeypatch.setattr(rendimiento, "escalar_datos", escalar)
+    salida = io.StringIO()
+    registros = rendimiento.ejecutar(df_compacto, escalas=(10, 100), salida=salida)
+
+    # Las escalas mayores no se intentan
+    assert escalas == [10]
+    assert len(registros) == 1
+    registro = registros[0]
+    assert registro['etapa'] == 'error' and registro['error'] == 'MemoryError'
+    assert registro['escala'] == 10 and registro['filas'] == len(df_compacto) * 10
+    assert json.loads(salida.getvalue()) == registro
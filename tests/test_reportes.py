@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+import pytest
+
+from desastres import geometria, memoria_compartida, reportes
+
+
+def _contenido(directorio):
+    return sorted(os.listdir(directorio)) if os.path.isdir(directorio) else []
+
+
+@pytest.mark.parametrize("plotlyjs", ['directorio', 'incluido'])
+def test_reporte_autocontenido(tmp_path, sin_red, plotlyjs, monkeypatch):
+    temporales = tmp_path / "tmp"
+    temporales.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(temporales))
+    compartida_antes = _contenido(memoria_compartida.DIR_COMPARTIDA)
+
+    archivos, procesos = reportes.generar(["Chile", "Peru"], str(tmp_path), 2000, 2020, procesos=8,
+                                          plotlyjs=plotlyjs, progreso=lambda mensaje: None)
+    # El pool no tiene más procesos que reportes
+    assert procesos == 2
+    # Los datos se publicaron en un directorio propio, borrado al terminar
+    assert os.listdir(temporales) == []
+    assert _contenido(memoria_compartida.DIR_COMPARTIDA) == compartida_antes
+    assert set(archivos) == {"Chile", "Peru"}
+
+    with open(tmp_path / archivos["Chile"][0], encoding="utf-8") as f:
+        contenido = f.read()
+    if plotlyjs == 'directorio':
+        nombre = f"{geometria.NOMBRE_TOPOJSON}.js"
+        assert f'<script src="{nombre}"></script>' in contenido
+        with open(tmp_path / nombre, encoding="utf-8") as f:
+            contenido = f.read()
+    # plotly.js encuentra el TopoJSON registrado y no lo pide a la red
+    assert "window.PlotlyGeoAssets" in contenido
+    assert f'topojson["{geometria.NOMBRE_TOPOJSON}"]' in contenido
+
+
+def test_un_proceso_sin_pool(tmp_path):
+    archivos, procesos = reportes.generar(["Chile"], str(tmp_path), 2010, 2020, procesos=1,
+                                          progreso=lambda mensaje: None)
+    assert procesos == 1
+    assert os.path.exists(tmp_path / archivos["Chile"][0])
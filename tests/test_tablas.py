@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from desastres import motores, tablas
+from desastres.cache_resultados import normalizar_filtro
+from desastres.filtros import filtrar_df
+from desastres.graficos import COLUMNAS_DETALLE
+
+
+def _esperado(df, orden, descendente):
+    return df.sort_values(orden, ascending=not descendente, kind='stable', na_position='last')
+
+
+@pytest.fixture(scope="module")
+def df_empates():
+    rng = np.random.default_rng(3)
+    n = 500
+    # Pocos valores distintos: muchos empates, y nulos en las columnas numéricas
+    eventos = rng.integers(0, 6, n).astype(np.float64)
+    eventos[rng.random(n) < 0.1] = np.nan
+    afectados = pd.array(rng.integers(0, 4, n), dtype="Int32")
+    afectados[rng.random(n) < 0.2] = pd.NA
+    paises = pd.Categorical(rng.choice(["Chile", "Peru", "Japan", "Haiti"], n))
+    return pd.DataFrame({'Eventos': eventos, 'Afectados': afectados, 'Pais': paises, 'Fila': np.arange(n)})
+
+
+@pytest.mark.parametrize("descendente", [True, False])
+@pytest.mark.parametrize("orden", ['Eventos', 'Afectados', 'Pais'])
+def test_posiciones_primeras_igual_a_sort_estable(df_empates, orden, descendente):
+    esperado = _esperado(df_empates, orden, descendente)['Fila'].to_numpy()
+    valores = tablas.clave_orden(df_empates[orden])
+    for k in (0, 1, 7, 10, 73, 449, 450, 451, 499, 500, 600):
+        np.testing.assert_array_equal(tablas.posiciones_primeras(valores, k, descendente), esperado[:k])
+
+
+@pytest.mark.parametrize("descendente", [True, False])
+@pytest.mark.parametrize("tam", [10, 7, 13])
+def test_paginas_igual_a_sort_estable(df_empates, descendente, tam):
+    esperado = _esperado(df_empates, 'Eventos', descendente)
+    paginas = -(-len(df_empates) // tam)
+    for pagina in range(paginas):
+        obtenido = tablas.paginar(df_empates, 'Eventos', descendente, pagina, tam)
+        # Cada página cruza el límite de la selección parcial en algún empate
+        pd.testing.assert_frame_equal(obtenido.filas, esperado.iloc[pagina * tam:(pagina + 1) * tam])
+        assert (obtenido.total, obtenido.paginas, obtenido.pagina) == (len(df_empates), paginas, pagina)
+    # Fuera de rango se ajusta a la primera o la última página
+    assert tablas.paginar(df_empates, 'Eventos', descendente, paginas + 5, tam).pagina == paginas - 1
+    assert tablas.paginar(df_empates, 'Eventos', descendente, -1, tam).pagina == 0
+
+
+@pytest.fixture(scope="module", params=['pandas', 'duckdb'])
+def motor(request, tmp_path_factory):
+    if request.param == 'duckdb':
+        pytest.importorskip("duckdb")
+    return motores.crear_motor(request.param, ruta_parquet=None, dir_cache=str(tmp_path_factory.mktemp("cache")))
+
+
+@pytest.fixture(scope="module")
+def df_referencia(tmp_path_factory):
+    return motores.crear_motor('pandas', dir_cache=str(tmp_path_factory.mktemp("cache"))).df
+
+
+@pytest.mark.parametrize("descendente", [True, False])
+@pytest.mark.parametrize("orden", ['Year', 'Total Affected', 'Total Events', 'Country'])
+def test_pagina_detalle_de_ambos_motores(motor, df_referencia, orden, descendente):
+    filtro = normalizar_filtro([], 2000, 2024, [], motor.anio_min, motor.anio_max)
+    esperado = _esperado(filtrar_df(df_referencia, *filtro)[COLUMNAS_DETALLE], orden, descendente)
+    total_paginas = -(-len(esperado) // 10)
+    # Primeras páginas, una en medio y la última (con nulos en 'Total Affected')
+    for pagina in (0, 1, 2, total_paginas // 2, total_paginas - 1):
+        obtenido = motor.pagina_detalle(filtro, orden, descendente, pagina, tam=10)
+        assert obtenido.total == len(esperado)
+        pd.testing.assert_frame_equal(
+            obtenido.filas.reset_index(drop=True), esperado.iloc[pagina * 10:(pagina + 1) * 10].reset_index(drop=True),
+            check_dtype=False, check_categorical=False,
+        )